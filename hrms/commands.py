@@ -0,0 +1,102 @@
+import click
+
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-payroll-period-running-totals")
+@click.option("--company", help="Rebuild totals of payroll periods of this company")
+@click.option("--payroll-period", help="Rebuild totals of this payroll period")
+@click.option("--employee", help="Rebuild totals of this employee")
+@pass_context
+def rebuild_payroll_period_running_totals(context, company=None, payroll_period=None, employee=None):
+	"Rebuild payroll period running totals of employees from submitted salary slips"
+	import frappe
+
+	from hrms.payroll.doctype.payroll_period_running_total.payroll_period_running_total import (
+		rebuild_payroll_period_running_totals,
+	)
+
+	site = get_site(context)
+	try:
+		frappe.init(site=site)
+		frappe.connect()
+		rebuilt = rebuild_payroll_period_running_totals(
+			company=company, payroll_period=payroll_period, employee=employee
+		)
+		frappe.db.commit()
+		click.echo(f"Rebuilt {rebuilt} payroll period running totals")
+	finally:
+		frappe.destroy()
+
+
+@click.command("run-payroll-benchmark")
+@click.option("--employees", default=100, help="Number of employees to generate")
+@click.option("--salary-structures", default=5, help="Number of salary structures to generate")
+@click.option("--start-date", help="A date in the payroll month, defaults to today")
+@click.option("--company", help="Name of the company to generate, must not exist")
+@click.option("--seed", default=42, help="Seed for the generated data")
+@click.option("--no-memory", is_flag=True, default=False, help="Do not trace peak memory")
+@click.option("--output", help="Path of the JSON file to save results to")
+@click.option("--compare", help="Path of a JSON file with results to compare against")
+@pass_context
+def run_payroll_benchmark(
+	context,
+	employees=100,
+	salary_structures=5,
+	start_date=None,
+	company=None,
+	seed=42,
+	no_memory=False,
+	output=None,
+	compare=None,
+):
+	"Generate a synthetic workforce and time each phase of a payroll run on it"
+	import json
+
+	import frappe
+
+	from hrms.payroll.benchmark import compare_results, dump_result
+	from hrms.payroll.benchmark import run_payroll_benchmark as _run_payroll_benchmark
+
+	site = get_site(context)
+	try:
+		frappe.init(site=site)
+		frappe.connect()
+		result = _run_payroll_benchmark(
+			employees=employees,
+			salary_structures=salary_structures,
+			start_date=start_date,
+			company=company,
+			seed=seed,
+			measure_memory=not no_memory,
+		)
+	finally:
+		frappe.destroy()
+
+	for phase, measurements in result["phases"].items():
+		if not measurements:
+			continue
+
+		click.echo(
+			f"{phase:<25} {measurements['wall_time']:>10.3f}s {measurements['queries']:>10} queries"
+			+ (
+				f" {measurements['peak_memory'] / 1024 / 1024:>10.2f} MiB"
+				if measurements["peak_memory"] is not None
+				else ""
+			)
+		)
+
+	output = output or f"payroll-benchmark-{result['timestamp'].replace(' ', '-')}.json"
+	dump_result(result, output)
+	click.echo(f"Results saved to {output}")
+
+	if compare:
+		with open(compare) as f:
+			baseline = json.load(f)
+
+		for phase, metric, previous, current, change in compare_results(result, baseline):
+			change = f"{change:+.2f}%" if change is not None else "-"
+			click.echo(f"{phase:<25} {metric:<12} {previous:>14} -> {current:<14} {change}")
+
+
+commands = [rebuild_payroll_period_running_totals, run_payroll_benchmark]
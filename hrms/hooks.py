@@ -164,7 +164,15 @@ doc_events = {
 			"hrms.overrides.company.set_default_hr_accounts",
 		],
 	},
-	"Timesheet": {"validate": "hrms.hr.utils.validate_active_employee"},
+	"Timesheet": {
+		"validate": "hrms.hr.utils.validate_active_employee",
+		"on_submit": "hrms.payroll.doctype.salary_slip.salary_slip.mark_salary_slips_as_stale",
+		"on_cancel": "hrms.payroll.doctype.salary_slip.salary_slip.mark_salary_slips_as_stale",
+	},
+	"Holiday List": {
+		"on_update": "hrms.hr.doctype.leave_ledger_entry.leave_balance_cache.clear_all_leave_balance_cache",
+		"on_trash": "hrms.hr.doctype.leave_ledger_entry.leave_balance_cache.clear_all_leave_balance_cache",
+	},
 	"Payment Entry": {
 		"on_submit": "hrms.hr.doctype.expense_claim.expense_claim.update_payment_for_expense_claim",
 		"on_cancel": "hrms.hr.doctype.expense_claim.expense_claim.update_payment_for_expense_claim",
@@ -18,6 +18,7 @@ from frappe.utils import (
 
 from hrms.hr.doctype.shift_assignment.shift_assignment import has_overlapping_timings
 from hrms.hr.utils import get_holiday_dates_for_employee, validate_active_employee
+from hrms.payroll.doctype.salary_slip.salary_slip import mark_salary_slips_as_stale
 
 
 class DuplicateAttendanceError(frappe.ValidationError):
@@ -49,8 +50,12 @@ class Attendance(Document):
 		self.validate_employee_status()
 		self.check_leave_record()
 
+	def on_submit(self):
+		mark_salary_slips_as_stale(self)
+
 	def on_cancel(self):
 		self.unlink_attendance_from_checkins()
+		mark_salary_slips_as_stale(self)
 
 	def validate_attendance_date(self):
 		date_of_joining = frappe.db.get_value("Employee", self.employee, "date_of_joining")
@@ -8,6 +8,7 @@ from frappe.utils import add_days, add_months, today
 
 from hrms.hr.doctype.attendance_request.test_attendance_request import get_employee
 from hrms.hr.doctype.leave_application.leave_application import get_leave_balance_on
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_period.test_leave_period import create_leave_period
 
 test_dependencies = ["Employee"]
@@ -18,6 +19,7 @@ class TestCompensatoryLeaveRequest(unittest.TestCase):
 		frappe.db.sql(""" delete from `tabCompensatory Leave Request`""")
 		frappe.db.sql(""" delete from `tabLeave Ledger Entry`""")
 		frappe.db.sql(""" delete from `tabLeave Allocation`""")
+		clear_all_leave_balance_cache()
 		frappe.db.sql(
 			""" delete from `tabAttendance` where attendance_date in {0} """.format(
 				(today(), add_days(today(), -1))
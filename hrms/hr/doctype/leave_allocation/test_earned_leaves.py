@@ -20,6 +20,7 @@ from hrms.hr.doctype.leave_application.leave_application import (
 	get_leave_details,
 )
 from hrms.hr.doctype.leave_application.test_leave_application import make_leave_application
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
 	calculate_pro_rated_leaves,
 	create_assignment_for_multiple_employees,
@@ -39,6 +40,7 @@ class TestLeaveAllocation(FrappeTestCase):
 			"Leave Ledger Entry",
 		]:
 			frappe.db.delete(doctype)
+		clear_all_leave_balance_cache()
 
 		employee = frappe.get_doc("Employee", "_T-Employee-00001")
 		self.original_doj = employee.date_of_joining
@@ -11,6 +11,7 @@ from hrms.hr.doctype.leave_allocation.leave_allocation import (
 	BackDatedAllocationError,
 	OverAllocationError,
 )
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import process_expired_allocation
 from hrms.hr.doctype.leave_type.test_leave_type import create_leave_type
 
@@ -20,6 +21,7 @@ class TestLeaveAllocation(FrappeTestCase):
 		frappe.db.delete("Leave Period")
 		frappe.db.delete("Leave Allocation")
 		frappe.db.delete("Leave Ledger Entry")
+		clear_all_leave_balance_cache()
 
 		emp_id = make_employee("test_leave_allocation@salary.com", company="_Test Company")
 		self.employee = frappe.get_doc("Employee", emp_id)
@@ -2,6 +2,7 @@
 # License: GNU General Public License v3. See license.txt
 
 import datetime
+from bisect import bisect_left, bisect_right
 from typing import Dict, Optional, Tuple, Union
 
 import frappe
@@ -26,6 +27,11 @@ from erpnext.buying.doctype.supplier_scorecard.supplier_scorecard import dateran
 from erpnext.setup.doctype.employee.employee import get_holiday_list_for_employee
 
 from hrms.hr.doctype.leave_block_list.leave_block_list import get_applicable_block_dates
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import (
+	clear_leave_balance_cache,
+	get_cached_leave_balance,
+	get_cached_leave_details,
+)
 from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import create_leave_ledger_entry
 from hrms.hr.utils import (
 	get_holiday_dates_for_employee,
@@ -34,6 +40,7 @@ from hrms.hr.utils import (
 	share_doc_with_approver,
 	validate_active_employee,
 )
+from hrms.payroll.doctype.salary_slip.salary_slip import mark_salary_slips_as_stale
 from hrms.utils import get_employee_email
 
 
@@ -91,6 +98,7 @@ class LeaveApplication(Document):
 				self.notify_leave_approver()
 
 		share_doc_with_approver(self, self.leave_approver)
+		self.clear_leave_balance_cache()
 
 	def on_submit(self):
 		if self.status in ["Open", "Cancelled"]:
@@ -106,6 +114,7 @@ class LeaveApplication(Document):
 			self.notify_employee()
 
 		self.create_leave_ledger_entry()
+		mark_salary_slips_as_stale(self)
 		self.reload()
 
 	def before_cancel(self):
@@ -117,6 +126,18 @@ class LeaveApplication(Document):
 		if frappe.db.get_single_value("HR Settings", "send_leave_notification"):
 			self.notify_employee()
 		self.cancel_attendance()
+		mark_salary_slips_as_stale(self)
+
+	def on_trash(self):
+		self.clear_leave_balance_cache()
+
+	def clear_leave_balance_cache(self):
+		"""Clears cached balances affected by leaves pending approval, other changes to balances
+		are made through the leave ledger"""
+		previous = self.get_doc_before_save()
+		for doc in filter(None, [previous, self]):
+			if "Open" in (self.status, previous and previous.status):
+				clear_leave_balance_cache(doc.employee, doc.leave_type, doc.from_date, doc.to_date)
 
 	def validate_applicable_after(self):
 		if self.leave_type:
@@ -763,17 +784,9 @@ def get_number_of_leave_days(
 	if has_been_calculated:
 		return number_of_days
 
-	if cint(half_day) == 1:
-		if getdate(from_date) == getdate(to_date):
-			number_of_days = 0.5
-		elif half_day_date and getdate(from_date) <= getdate(half_day_date) <= getdate(to_date):
-			number_of_days = date_diff(to_date, from_date) + 0.5
-		else:
-			number_of_days = date_diff(to_date, from_date) + 1
-	else:
-		number_of_days = date_diff(to_date, from_date) + 1
+	number_of_days = get_number_of_days_with_half_day(from_date, to_date, half_day, half_day_date)
 
-	if not frappe.db.get_value("Leave Type", leave_type, "include_holiday"):
+	if not frappe.get_cached_value("Leave Type", leave_type, "include_holiday"):
 		number_of_days = flt(number_of_days) - flt(
 			get_holidays(employee, from_date, to_date, holiday_list=holiday_list)
 		)
@@ -781,6 +794,22 @@ def get_number_of_leave_days(
 	return number_of_days
 
 
+def get_number_of_days_with_half_day(
+	from_date: datetime.date,
+	to_date: datetime.date,
+	half_day: Union[int, str, None] = None,
+	half_day_date: Union[datetime.date, str, None] = None,
+) -> float:
+	"""Returns number of days between 2 dates after considering half day, including holidays"""
+	if cint(half_day) == 1:
+		if getdate(from_date) == getdate(to_date):
+			return 0.5
+		elif half_day_date and getdate(from_date) <= getdate(half_day_date) <= getdate(to_date):
+			return date_diff(to_date, from_date) + 0.5
+
+	return date_diff(to_date, from_date) + 1
+
+
 @erpnext.allow_regional
 def get_regional_number_of_leave_days(
 	employee: str,
@@ -796,31 +825,7 @@ def get_regional_number_of_leave_days(
 
 @frappe.whitelist()
 def get_leave_details(employee, date):
-	allocation_records = get_leave_allocation_records(employee, date)
-	leave_allocation = {}
-	precision = cint(frappe.db.get_single_value("System Settings", "float_precision", cache=True))
-
-	for d in allocation_records:
-		allocation = allocation_records.get(d, frappe._dict())
-
-		remaining_leaves = get_leave_balance_on(
-			employee, d, date, to_date=allocation.to_date, consider_all_leaves_in_the_allocation_period=True
-		)
-
-		end_date = allocation.to_date
-		leaves_taken = get_leaves_for_period(employee, d, allocation.from_date, end_date) * -1
-		leaves_pending = get_leaves_pending_approval_for_period(
-			employee, d, allocation.from_date, end_date
-		)
-		expired_leaves = allocation.total_leaves_allocated - (remaining_leaves + leaves_taken)
-
-		leave_allocation[d] = {
-			"total_leaves": flt(allocation.total_leaves_allocated, precision),
-			"expired_leaves": flt(expired_leaves, precision) if expired_leaves > 0 else 0,
-			"leaves_taken": flt(leaves_taken, precision),
-			"leaves_pending_approval": flt(leaves_pending, precision),
-			"remaining_leaves": flt(remaining_leaves, precision),
-		}
+	leave_allocation = get_cached_leave_details(employee, date)
 
 	# For leaves allocated from contracts, a leave allocation may not be present the first month
 	if not leave_allocation and cint(
@@ -877,18 +882,10 @@ def get_leave_balance_on(
 	if not to_date:
 		to_date = nowdate()
 
-	allocation_records = get_leave_allocation_records(employee, date, leave_type)
-	allocation = allocation_records.get(leave_type, frappe._dict())
-
-	end_date = allocation.to_date if cint(consider_all_leaves_in_the_allocation_period) else date
-	cf_expiry = get_allocation_expiry_for_cf_leaves(
-		employee, leave_type, to_date, allocation.from_date
+	remaining_leaves = get_cached_leave_balance(
+		employee, leave_type, date, to_date, consider_all_leaves_in_the_allocation_period
 	)
 
-	leaves_taken = get_leaves_for_period(employee, leave_type, allocation.from_date, end_date)
-
-	remaining_leaves = get_remaining_leaves(allocation, leaves_taken, date, cf_expiry)
-
 	if for_consumption:
 		return remaining_leaves
 	else:
@@ -987,11 +984,12 @@ def get_leaves_pending_approval_for_period(
 
 
 def get_remaining_leaves(
-	allocation: Dict, leaves_taken: float, date: str, cf_expiry: str
+	allocation: Dict, leaves_taken: float, date: str, cf_expiry: str, ledger=None
 ) -> Dict[str, float]:
 	"""Returns a dict of leave_balance and leave_balance_for_consumption
 	leave_balance returns the available leave balance
 	leave_balance_for_consumption returns the minimum leaves remaining after comparing with remaining days for allocation expiry
+	ledger (LeaveLedgerReplay) if passed, is used to compute leaves taken instead of querying the ledger
 	"""
 
 	def _get_remaining_leaves(remaining_leaves, end_date):
@@ -1005,7 +1003,7 @@ def get_remaining_leaves(
 	# balance for carry forwarded leaves
 	if cf_expiry and allocation.unused_leaves:
 		# allocation contains both carry forwarded and new leaves
-		new_leaves_taken, cf_leaves_taken = get_new_and_cf_leaves_taken(allocation, cf_expiry)
+		new_leaves_taken, cf_leaves_taken = get_new_and_cf_leaves_taken(allocation, cf_expiry, ledger)
 
 		if getdate(date) > getdate(cf_expiry):
 			# carry forwarded leaves have expired
@@ -1030,14 +1028,24 @@ def get_remaining_leaves(
 	return frappe._dict(leave_balance=leave_balance, leave_balance_for_consumption=remaining_leaves)
 
 
-def get_new_and_cf_leaves_taken(allocation: Dict, cf_expiry: str) -> Tuple[float, float]:
+def get_new_and_cf_leaves_taken(
+	allocation: Dict, cf_expiry: str, ledger=None
+) -> Tuple[float, float]:
 	"""returns new leaves taken and carry forwarded leaves taken within an allocation period based on cf leave expiry"""
-	cf_leaves_taken = get_leaves_for_period(
-		allocation.employee, allocation.leave_type, allocation.from_date, cf_expiry
-	)
-	new_leaves_taken = get_leaves_for_period(
-		allocation.employee, allocation.leave_type, add_days(cf_expiry, 1), allocation.to_date
-	)
+	if ledger:
+		cf_leaves_taken = ledger.get_leaves_for_period(
+			allocation.leave_type, allocation.from_date, cf_expiry
+		)
+		new_leaves_taken = ledger.get_leaves_for_period(
+			allocation.leave_type, add_days(cf_expiry, 1), allocation.to_date
+		)
+	else:
+		cf_leaves_taken = get_leaves_for_period(
+			allocation.employee, allocation.leave_type, allocation.from_date, cf_expiry
+		)
+		new_leaves_taken = get_leaves_for_period(
+			allocation.employee, allocation.leave_type, add_days(cf_expiry, 1), allocation.to_date
+		)
 
 	# using abs because leaves taken is a -ve number in the ledger
 	if abs(cf_leaves_taken) > allocation.unused_leaves:
@@ -1056,12 +1064,25 @@ def get_leaves_for_period(
 	skip_expired_leaves: bool = True,
 ) -> float:
 	leave_entries = get_leave_entries(employee, leave_type, from_date, to_date)
+	return get_leave_days_from_entries(leave_entries, from_date, to_date, skip_expired_leaves)
+
+
+def get_leave_days_from_entries(
+	leave_entries: list[dict],
+	from_date: datetime.date,
+	to_date: datetime.date,
+	skip_expired_leaves: bool = True,
+	holidays: Optional["HolidaysForLeaveEntries"] = None,
+) -> float:
+	"""Returns leave days of the ledger entries within the period, leaves taken being -ve.
+	Holidays loaded for other entries can be passed to count holidays from"""
+	from_date, to_date = getdate(from_date), getdate(to_date)
+	if not holidays:
+		holidays = get_holidays_for_leave_entries(leave_entries, from_date, to_date)
 	leave_days = 0
 
 	for leave_entry in leave_entries:
-		inclusive_period = leave_entry.from_date >= getdate(
-			from_date
-		) and leave_entry.to_date <= getdate(to_date)
+		inclusive_period = leave_entry.from_date >= from_date and leave_entry.to_date <= to_date
 
 		if inclusive_period and leave_entry.transaction_type == "Leave Encashment":
 			leave_days += leave_entry.leaves
@@ -1075,51 +1096,130 @@ def get_leaves_for_period(
 			leave_days += leave_entry.leaves
 
 		elif leave_entry.transaction_type == "Leave Application":
-			if leave_entry.from_date < getdate(from_date):
-				leave_entry.from_date = from_date
-			if leave_entry.to_date > getdate(to_date):
-				leave_entry.to_date = to_date
+			# entries are not updated as they may be shared across periods
+			entry_from_date = max(leave_entry.from_date, from_date)
+			entry_to_date = min(leave_entry.to_date, to_date)
 
 			half_day = 0
 			half_day_date = None
-			# fetch half day date for leaves with half days
+			# half day date is only considered for leaves with half days
 			if leave_entry.leaves % 1:
 				half_day = 1
-				half_day_date = frappe.db.get_value(
-					"Leave Application", {"name": leave_entry.transaction_name}, ["half_day_date"]
-				)
+				half_day_date = leave_entry.half_day_date
+
+			number_of_days, has_been_calculated = get_regional_number_of_leave_days(
+				leave_entry.employee,
+				leave_entry.leave_type,
+				entry_from_date,
+				entry_to_date,
+				half_day,
+				half_day_date,
+				leave_entry.holiday_list,
+			)
 
-			leave_days += (
-				get_number_of_leave_days(
-					employee,
-					leave_type,
-					leave_entry.from_date,
-					leave_entry.to_date,
-					half_day,
-					half_day_date,
-					holiday_list=leave_entry.holiday_list,
+			if not has_been_calculated:
+				number_of_days = get_number_of_days_with_half_day(
+					entry_from_date, entry_to_date, half_day, half_day_date
 				)
-				* -1
-			)
+				if not frappe.get_cached_value("Leave Type", leave_entry.leave_type, "include_holiday"):
+					number_of_days -= holidays.count(
+						leave_entry.holiday_list or holidays.get_holiday_list(leave_entry.employee),
+						entry_from_date,
+						entry_to_date,
+					)
+
+			leave_days -= flt(number_of_days)
 
 	return leave_days
 
 
+class HolidaysForLeaveEntries:
+	"""Holidays of the holiday lists used by leave application ledger entries within a period,
+	loaded with one query to count the holidays within each entry with lookups"""
+
+	def __init__(self, from_date: datetime.date, to_date: datetime.date):
+		self.from_date = getdate(from_date)
+		self.to_date = getdate(to_date)
+		# {holiday list: sorted holiday dates}
+		self.holidays = {}
+		# {employee: holiday list}
+		self.holiday_lists = {}
+
+	def get_holiday_list(self, employee: str) -> str:
+		if employee not in self.holiday_lists:
+			self.holiday_lists[employee] = get_holiday_list_for_employee(employee)
+
+		return self.holiday_lists[employee]
+
+	def load(self, holiday_lists: set[str]) -> None:
+		holiday_lists = [d for d in holiday_lists if d and d not in self.holidays]
+		if not holiday_lists:
+			return
+
+		self.holidays.update({holiday_list: [] for holiday_list in holiday_lists})
+
+		Holiday = frappe.qb.DocType("Holiday")
+		holidays = (
+			frappe.qb.from_(Holiday)
+			.select(Holiday.parent, Holiday.holiday_date)
+			.distinct()
+			.where(
+				(Holiday.parent.isin(holiday_lists))
+				& (Holiday.holiday_date.between(self.from_date, self.to_date))
+			)
+			.orderby(Holiday.holiday_date)
+		).run(as_dict=True)
+
+		for holiday in holidays:
+			self.holidays[holiday.parent].append(getdate(holiday.holiday_date))
+
+	def count(self, holiday_list: str, from_date: datetime.date, to_date: datetime.date) -> int:
+		from_date, to_date = getdate(from_date), getdate(to_date)
+		if from_date < self.from_date or to_date > self.to_date:
+			# holidays are loaded again for a period covering the dates
+			self.from_date, self.to_date = min(from_date, self.from_date), max(to_date, self.to_date)
+			self.holidays = {}
+
+		self.load({holiday_list})
+		holidays = self.holidays.get(holiday_list) or []
+		return bisect_right(holidays, to_date) - bisect_left(holidays, from_date)
+
+
+def get_holidays_for_leave_entries(
+	leave_entries: list[dict], from_date: datetime.date, to_date: datetime.date
+) -> HolidaysForLeaveEntries:
+	holidays = HolidaysForLeaveEntries(from_date, to_date)
+
+	leave_types = {d.leave_type for d in leave_entries if d.transaction_type == "Leave Application"}
+	if any(not frappe.get_cached_value("Leave Type", d, "include_holiday") for d in leave_types):
+		holidays.load(
+			{
+				d.holiday_list or holidays.get_holiday_list(d.employee)
+				for d in leave_entries
+				if d.transaction_type == "Leave Application"
+			}
+		)
+
+	return holidays
+
+
 def get_leave_entries(employee, leave_type, from_date, to_date):
 	"""Returns leave entries between from_date and to_date."""
 	return frappe.db.sql(
 		"""
 		SELECT
-			employee, leave_type, from_date, to_date, leaves, transaction_name, transaction_type, holiday_list,
-			is_carry_forward, is_expired
-		FROM `tabLeave Ledger Entry`
-		WHERE employee=%(employee)s AND leave_type=%(leave_type)s
-			AND docstatus=1
-			AND (leaves<0
-				OR is_expired=1)
-			AND (from_date between %(from_date)s AND %(to_date)s
-				OR to_date between %(from_date)s AND %(to_date)s
-				OR (from_date < %(from_date)s AND to_date > %(to_date)s))
+			l.employee, l.leave_type, l.from_date, l.to_date, l.leaves, l.transaction_name,
+			l.transaction_type, l.holiday_list, l.is_carry_forward, l.is_expired, la.half_day_date
+		FROM `tabLeave Ledger Entry` l
+		LEFT JOIN `tabLeave Application` la
+			ON l.transaction_type='Leave Application' AND l.transaction_name=la.name
+		WHERE l.employee=%(employee)s AND l.leave_type=%(leave_type)s
+			AND l.docstatus=1
+			AND (l.leaves<0
+				OR l.is_expired=1)
+			AND (l.from_date between %(from_date)s AND %(to_date)s
+				OR l.to_date between %(from_date)s AND %(to_date)s
+				OR (l.from_date < %(from_date)s AND l.to_date > %(to_date)s))
 	""",
 		{"from_date": from_date, "to_date": to_date, "employee": employee, "leave_type": leave_type},
 		as_dict=1,
@@ -0,0 +1,369 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import datetime
+
+import frappe
+from frappe.utils import cint, flt, getdate, nowdate
+
+from hrms.hr.doctype.leave_application.leave_application import (
+	HolidaysForLeaveEntries,
+	get_holidays_for_leave_entries,
+	get_leave_days_from_entries,
+	get_remaining_leaves,
+)
+from hrms.hr.doctype.leave_period_closing_entry.leave_period_closing_entry import get_closing_dates
+
+
+class LeaveLedgerReplay:
+	"""Answers leave balances of an employee by replaying their Leave Ledger in memory.
+
+	Ledger entries of the employee, along with the period of their Leave Allocation and the half day
+	date of their Leave Application, and the employee's open Leave Applications are loaded with one
+	query each. Allocations, carry forwarded leave expiry, leaves taken, encashed, expired and pending
+	approval for any leave type and date are then computed from the loaded rows, the same way
+	`get_leave_allocation_records`, `get_leaves_for_period` and co. compute them from the database.
+
+	If `from_date` is passed, balances are only asked for on or after it, and ledger entries of leave
+	periods closed before it are skipped: allocations can not continue past a closed period, so they
+	can not affect balances after it.
+
+	Ledgers of several employees can be loaded together with `LeaveLedgerReplay.for_employees`.
+	"""
+
+	def __init__(
+		self,
+		employee: str,
+		leave_types: list[str] | None = None,
+		from_date: datetime.date | None = None,
+		load: bool = True,
+	):
+		self.employee = employee
+		self.leave_types = leave_types
+		# {leave type: end of the latest leave period closed before `from_date`}
+		self.closing_dates = get_closing_dates(employee, from_date, leave_types) if from_date else {}
+
+		# {leave type: ledger entries in the order of their modification}
+		self.entries = {}
+		self.open_applications = []
+		# {date: allocation records on the date}
+		self.allocation_records = {}
+		# holidays to count the days of leave applications with
+		self.holidays = None
+
+		if load:
+			self.load_ledger_entries()
+			self.load_open_applications()
+
+	@classmethod
+	def for_employees(
+		cls,
+		employees: list[str],
+		leave_types: list[str] | None = None,
+		since: datetime.date | None = None,
+	) -> dict[str, "LeaveLedgerReplay"]:
+		"""Returns the ledger of each employee, loading the ledger entries and open leave applications
+		of all the employees with one query each.
+
+		If `since` is passed, ledger entries ending before it are not loaded, so balances can only be
+		asked for dates whose allocations start on or after it."""
+		ledgers = {employee: cls(employee, leave_types, load=False) for employee in employees}
+		if not ledgers:
+			return ledgers
+
+		entries = get_ledger_entries_query(list(ledgers), leave_types, since).run(as_dict=True)
+		holidays = get_holidays(entries)
+		for ledger in ledgers.values():
+			ledger.holidays = holidays
+
+		for entry in entries:
+			ledgers[entry.employee].add_entry(entry)
+
+		for application in get_open_applications(list(ledgers), leave_types):
+			ledgers[application.employee].open_applications.append(application)
+
+		return ledgers
+
+	def load_ledger_entries(self) -> None:
+		Ledger = frappe.qb.DocType("Leave Ledger Entry")
+		query = get_ledger_entries_query([self.employee], self.leave_types)
+
+		if self.closing_dates:
+			condition = Ledger.leave_type.notin(list(self.closing_dates))
+			for leave_type, closing_date in self.closing_dates.items():
+				condition |= (Ledger.leave_type == leave_type) & (Ledger.to_date > closing_date)
+
+			query = query.where(condition)
+
+		entries = query.run(as_dict=True)
+		self.holidays = get_holidays(entries)
+		for entry in entries:
+			self.add_entry(entry)
+
+	def add_entry(self, entry: dict) -> None:
+		entry.from_date = getdate(entry.from_date)
+		entry.to_date = getdate(entry.to_date)
+		self.entries.setdefault(entry.leave_type, []).append(entry)
+
+	def load_open_applications(self) -> None:
+		self.open_applications = get_open_applications([self.employee], self.leave_types)
+
+	def get_leave_details(self, date: datetime.date) -> dict:
+		"""Returns total, expired, taken, pending and remaining leaves of each allocated leave type"""
+		precision = cint(frappe.db.get_single_value("System Settings", "float_precision", cache=True))
+		leave_allocation = {}
+
+		for leave_type, allocation in self.get_allocation_records(date).items():
+			remaining_leaves = self.get_leave_balance_on(
+				leave_type,
+				date,
+				to_date=allocation.to_date,
+				consider_all_leaves_in_the_allocation_period=True,
+			)
+
+			end_date = allocation.to_date
+			leaves_taken = self.get_leaves_for_period(leave_type, allocation.from_date, end_date) * -1
+			leaves_pending = self.get_leaves_pending_approval_for_period(
+				leave_type, allocation.from_date, end_date
+			)
+			expired_leaves = allocation.total_leaves_allocated - (remaining_leaves + leaves_taken)
+
+			leave_allocation[leave_type] = {
+				"total_leaves": flt(allocation.total_leaves_allocated, precision),
+				"expired_leaves": flt(expired_leaves, precision) if expired_leaves > 0 else 0,
+				"leaves_taken": flt(leaves_taken, precision),
+				"leaves_pending_approval": flt(leaves_pending, precision),
+				"remaining_leaves": flt(remaining_leaves, precision),
+			}
+
+		return leave_allocation
+
+	def get_leave_balance_on(
+		self,
+		leave_type: str,
+		date: datetime.date,
+		to_date: datetime.date | None = None,
+		consider_all_leaves_in_the_allocation_period: bool = False,
+		for_consumption: bool = False,
+	) -> float | dict:
+		"""Returns leave balance till date, see `leave_application.get_leave_balance_on`"""
+		if not to_date:
+			to_date = nowdate()
+
+		allocation = self.get_allocation_records(date, leave_type).get(leave_type, frappe._dict())
+		end_date = allocation.to_date if cint(consider_all_leaves_in_the_allocation_period) else date
+		cf_expiry = self.get_allocation_expiry_for_cf_leaves(leave_type, to_date, allocation.from_date)
+		leaves_taken = self.get_leaves_for_period(leave_type, allocation.from_date, end_date)
+
+		remaining_leaves = get_remaining_leaves(allocation, leaves_taken, date, cf_expiry, ledger=self)
+
+		if for_consumption:
+			return remaining_leaves
+		else:
+			return remaining_leaves.get("leave_balance")
+
+	def get_allocation_records(self, date: datetime.date, leave_type: str | None = None) -> dict:
+		"""Returns the total allocated and carry forwarded leaves on the date like
+		`leave_application.get_leave_allocation_records`"""
+		date = getdate(date)
+		if date not in self.allocation_records:
+			self.allocation_records[date] = self._get_allocation_records(date)
+
+		records = self.allocation_records[date]
+		if leave_type:
+			return frappe._dict({leave_type: records[leave_type]} if leave_type in records else {})
+
+		return records
+
+	def _get_allocation_records(self, date: datetime.date) -> frappe._dict:
+		allocated_leaves = frappe._dict()
+
+		for leave_type in sorted(self.entries):
+			allocation = None
+			for entry in self.entries[leave_type]:
+				if not self.is_allocated_on(entry, date):
+					continue
+
+				if not allocation:
+					allocation = frappe._dict(
+						from_date=entry.from_date, to_date=entry.to_date, cf_leaves=0.0, new_leaves=0.0
+					)
+
+				allocation.from_date = min(allocation.from_date, entry.from_date)
+				allocation.to_date = max(allocation.to_date, entry.to_date)
+				if entry.is_carry_forward:
+					allocation.cf_leaves += flt(entry.leaves)
+				else:
+					allocation.new_leaves += flt(entry.leaves)
+
+			if allocation:
+				allocated_leaves[leave_type] = frappe._dict(
+					{
+						"from_date": allocation.from_date,
+						"to_date": allocation.to_date,
+						"total_leaves_allocated": allocation.cf_leaves + allocation.new_leaves,
+						"unused_leaves": allocation.cf_leaves,
+						"new_leaves_allocated": allocation.new_leaves,
+						"leave_type": leave_type,
+						"employee": self.employee,
+					}
+				)
+
+		return allocated_leaves
+
+	@staticmethod
+	def is_allocated_on(entry: dict, date: datetime.date) -> bool:
+		if (
+			entry.transaction_type != "Leave Allocation"
+			# entries of deleted allocations are ignored
+			or not entry.allocation_from_date
+			or entry.is_expired
+			or entry.is_lwp
+			or entry.from_date > date
+		):
+			return False
+
+		if not entry.is_carry_forward:
+			# newly allocated leave's end date is same as the leave allocation's to date
+			return entry.to_date >= date
+
+		# only consider cf leaves from current allocation
+		allocation_from_date = getdate(entry.allocation_from_date)
+		allocation_to_date = getdate(entry.allocation_to_date)
+		return (
+			allocation_from_date <= entry.to_date <= allocation_to_date
+			and allocation_from_date <= date <= allocation_to_date
+		)
+
+	def get_allocation_expiry_for_cf_leaves(
+		self, leave_type: str, to_date: datetime.date, from_date: datetime.date
+	) -> datetime.date | str:
+		"""Returns expiry of carry forward allocation in leave ledger entry"""
+		if not (from_date and to_date):
+			return ""
+
+		from_date, to_date = getdate(from_date), getdate(to_date)
+		for entry in self.entries.get(leave_type, []):
+			if (
+				entry.transaction_type == "Leave Allocation"
+				and entry.is_carry_forward
+				and from_date <= entry.to_date <= to_date
+			):
+				return entry.to_date
+
+		return ""
+
+	def get_leaves_for_period(
+		self,
+		leave_type: str,
+		from_date: datetime.date,
+		to_date: datetime.date,
+		skip_expired_leaves: bool = True,
+	) -> float:
+		"""Returns leaves taken (-ve) within the period like `leave_application.get_leaves_for_period`"""
+		if not (from_date and to_date):
+			return 0
+
+		from_date, to_date = getdate(from_date), getdate(to_date)
+		leave_entries = [
+			entry
+			for entry in self.entries.get(leave_type, [])
+			if (entry.leaves < 0 or entry.is_expired)
+			and entry.from_date <= to_date
+			and entry.to_date >= from_date
+		]
+
+		return get_leave_days_from_entries(
+			leave_entries, from_date, to_date, skip_expired_leaves, holidays=self.holidays
+		)
+
+	def get_leaves_pending_approval_for_period(
+		self, leave_type: str, from_date: datetime.date, to_date: datetime.date
+	) -> float:
+		"""Returns leaves that are pending for approval"""
+		from_date, to_date = getdate(from_date), getdate(to_date)
+
+		return flt(
+			sum(
+				flt(application.total_leave_days)
+				for application in self.open_applications
+				if application.leave_type == leave_type
+				and (
+					from_date <= getdate(application.from_date) <= to_date
+					or from_date <= getdate(application.to_date) <= to_date
+				)
+			)
+		)
+
+
+def get_ledger_entries_query(
+	employees: list[str], leave_types: list[str] | None = None, since: datetime.date | None = None
+):
+	"""Returns the query for submitted ledger entries of the employees, along with the period of their
+	Leave Allocation and the half day date of their Leave Application"""
+	Ledger = frappe.qb.DocType("Leave Ledger Entry")
+	LeaveAllocation = frappe.qb.DocType("Leave Allocation")
+	LeaveApplication = frappe.qb.DocType("Leave Application")
+
+	query = (
+		frappe.qb.from_(Ledger)
+		.left_join(LeaveAllocation)
+		.on(
+			(Ledger.transaction_type == "Leave Allocation")
+			& (Ledger.transaction_name == LeaveAllocation.name)
+		)
+		.left_join(LeaveApplication)
+		.on(
+			(Ledger.transaction_type == "Leave Application")
+			& (Ledger.transaction_name == LeaveApplication.name)
+		)
+		.select(
+			Ledger.employee,
+			Ledger.leave_type,
+			Ledger.from_date,
+			Ledger.to_date,
+			Ledger.leaves,
+			Ledger.transaction_name,
+			Ledger.transaction_type,
+			Ledger.holiday_list,
+			Ledger.is_carry_forward,
+			Ledger.is_expired,
+			Ledger.is_lwp,
+			LeaveAllocation.from_date.as_("allocation_from_date"),
+			LeaveAllocation.to_date.as_("allocation_to_date"),
+			LeaveApplication.half_day_date,
+		)
+		.where((Ledger.employee.isin(employees)) & (Ledger.docstatus == 1))
+		.orderby(Ledger.modified)
+	)
+
+	if leave_types:
+		query = query.where(Ledger.leave_type.isin(leave_types))
+
+	if since:
+		query = query.where(Ledger.to_date >= since)
+
+	return query
+
+
+def get_open_applications(
+	employees: list[str], leave_types: list[str] | None = None
+) -> list[dict]:
+	filters = {"employee": ("in", employees), "status": "Open"}
+	if leave_types:
+		filters["leave_type"] = ("in", leave_types)
+
+	return frappe.get_all(
+		"Leave Application",
+		filters=filters,
+		fields=["employee", "leave_type", "from_date", "to_date", "total_leave_days"],
+	)
+
+
+def get_holidays(entries: list[dict]) -> HolidaysForLeaveEntries:
+	"""Returns holidays of the leave applications, loaded for the period covered by the entries"""
+	dates = [getdate(date) for entry in entries for date in (entry.from_date, entry.to_date)]
+	if not dates:
+		dates = [getdate()]
+
+	return get_holidays_for_leave_entries(entries, min(dates), max(dates))
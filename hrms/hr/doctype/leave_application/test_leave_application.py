@@ -29,8 +29,11 @@ from hrms.hr.doctype.leave_application.leave_application import (
 	get_leave_allocation_records,
 	get_leave_balance_on,
 	get_leave_details,
+	get_leaves_for_period,
 	get_new_and_cf_leaves_taken,
+	get_number_of_leave_days,
 )
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
 	create_assignment_for_multiple_employees,
 )
@@ -88,6 +91,7 @@ class TestLeaveApplication(unittest.TestCase):
 			"Leave Policy Assignment",
 		]:
 			frappe.db.delete(dt)
+		clear_all_leave_balance_cache()
 
 		frappe.set_user("Administrator")
 		set_leave_approver()
@@ -119,6 +123,7 @@ class TestLeaveApplication(unittest.TestCase):
 
 	def _clear_applications(self):
 		frappe.db.sql("""delete from `tabLeave Application`""")
+		clear_all_leave_balance_cache()
 
 	def get_application(self, doc):
 		application = frappe.copy_doc(doc)
@@ -1127,6 +1132,102 @@ class TestLeaveApplication(unittest.TestCase):
 		# filters out old CF leaves (15 i.e total 45)
 		self.assertEqual(details[leave_type.name]["total_leaves_allocated"], 30.0)
 
+	@set_holiday_list("Holiday List w/o Weekly Offs", "_Test Company")
+	def test_leave_ledger_replay(self):
+		"""Tests if balances replayed from the loaded ledger match the ones computed with queries"""
+		from hrms.hr.doctype.leave_application.leave_ledger_replay import LeaveLedgerReplay
+
+		employee = get_employee()
+		leave_type = create_leave_type(
+			leave_type_name="_Test_CF_leave_expiry",
+			is_carry_forward=1,
+			expire_carry_forwarded_leaves_after_days=90,
+		)
+		leave_alloc = create_carry_forwarded_allocation(employee, leave_type)
+		cf_expiry = frappe.db.get_value(
+			"Leave Ledger Entry", {"transaction_name": leave_alloc.name, "is_carry_forward": 1}, "to_date"
+		)
+
+		# leave application across cf expiry and a half day leave pending approval
+		make_leave_application(employee.name, cf_expiry, add_days(cf_expiry, 3), leave_type.name)
+		application = make_leave_application(
+			employee.name, add_days(cf_expiry, 6), add_days(cf_expiry, 7), leave_type.name, submit=False
+		)
+		application.update({"status": "Open", "half_day": 1, "half_day_date": add_days(cf_expiry, 7)})
+		application.save()
+
+		ledger = LeaveLedgerReplay(employee.name)
+		for date in [add_days(cf_expiry, -1), cf_expiry, add_days(cf_expiry, 4)]:
+			allocation = get_leave_allocation_records(employee.name, date, leave_type.name)
+			self.assertEqual(ledger.get_allocation_records(date, leave_type.name), allocation)
+
+			allocation = allocation[leave_type.name]
+			self.assertEqual(
+				ledger.get_leaves_for_period(leave_type.name, allocation.from_date, date),
+				get_leaves_for_period(employee.name, leave_type.name, allocation.from_date, date),
+			)
+			self.assertEqual(
+				ledger.get_leave_balance_on(leave_type.name, date, for_consumption=True),
+				get_leave_balance_on(employee.name, leave_type.name, date, for_consumption=True),
+			)
+
+		self.assertEqual(
+			ledger.get_leaves_pending_approval_for_period(
+				leave_type.name, leave_alloc.from_date, leave_alloc.to_date
+			),
+			1.5,
+		)
+
+		leave_details = ledger.get_leave_details(add_days(cf_expiry, 4))
+		self.assertEqual(
+			leave_details[leave_type.name],
+			{
+				"total_leaves": 30.0,
+				"expired_leaves": 14.0,
+				"leaves_taken": 4.0,
+				"leaves_pending_approval": 1.5,
+				"remaining_leaves": 12.0,
+			},
+		)
+
+	@set_holiday_list("Salary Slip Test Holiday List", "_Test Company")
+	def test_leaves_for_period_with_half_days_and_holidays(self):
+		from hrms.payroll.doctype.payroll_run_log.payroll_run_log import QueryCounter
+
+		employee = get_employee()
+		leave_type = "_Test Leave Type Excluding Holidays"
+		if not frappe.db.exists("Leave Type", leave_type):
+			frappe.get_doc(
+				dict(leave_type_name=leave_type, doctype="Leave Type", include_holiday=0)
+			).insert()
+
+		year_start = getdate(get_year_start(getdate()))
+		year_end = getdate(get_year_ending(getdate()))
+		make_allocation_record(
+			employee=employee.name, leave_type=leave_type, from_date=year_start, to_date=year_end
+		)
+
+		# week long half day leaves including the weekly off
+		first_sunday = get_first_sunday(self.holiday_list)
+		expected_leaves = 0
+		for week in range(2):
+			from_date = add_days(first_sunday, 7 * week + 1)
+			to_date = add_days(from_date, 6)
+			make_leave_application(
+				employee.name, from_date, to_date, leave_type, half_day=1, half_day_date=from_date
+			)
+			expected_leaves += get_number_of_leave_days(
+				employee.name, leave_type, from_date, to_date, 1, from_date
+			)
+
+		self.assertEqual(expected_leaves, 11)
+		with QueryCounter() as queries:
+			leaves = get_leaves_for_period(employee.name, leave_type, year_start, year_end)
+
+		self.assertEqual(leaves, -expected_leaves)
+		# ledger entries with half day dates and holidays, queries don't grow with leave applications
+		self.assertLessEqual(queries.count, 2)
+
 
 def create_carry_forwarded_allocation(employee, leave_type, date=None):
 	date = date or nowdate()
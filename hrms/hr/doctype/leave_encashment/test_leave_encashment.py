@@ -10,6 +10,7 @@ from frappe.utils import add_days, get_year_ending, get_year_start, getdate
 from erpnext.setup.doctype.employee.test_employee import make_employee
 from erpnext.setup.doctype.holiday_list.test_holiday_list import set_holiday_list
 
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_period.test_leave_period import create_leave_period
 from hrms.hr.doctype.leave_policy.test_leave_policy import create_leave_policy
 from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
@@ -32,6 +33,7 @@ class TestLeaveEncashment(FrappeTestCase):
 		frappe.db.delete("Leave Ledger Entry")
 		frappe.db.delete("Additional Salary")
 		frappe.db.delete("Leave Encashment")
+		clear_all_leave_balance_cache()
 
 		if not frappe.db.exists("Leave Type", "_Test Leave Type Encashment"):
 			frappe.get_doc(test_records[2]).insert()
@@ -0,0 +1,203 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+"""Cache of leave balances computed from the Leave Ledger.
+
+Balances are cached per employee, with each value recording the leave types and allocation periods
+it was computed from. Changes to the ledger or to open Leave Applications clear the values of the
+employee's leave type whose allocation overlaps the changed dates, right away and again once the
+transaction is committed or rolled back, so that values computed from uncommitted or outdated rows
+do not outlive it. Changes to Holiday Lists and to the holidays of Leave Types clear all values.
+
+Each value is also stamped with the version of the employee's values it was computed from, and
+values of an older version are recomputed on read: a value computed from a snapshot taken before a
+concurrent change can be written after the change has cleared the cache. The version is a token in
+the cache replaced whenever the employee's values are cleared, so reading a value does not query
+the database. Changes made to the ledger directly in the database, eg: by tests deleting ledger
+entries, do not replace it and must clear the cache with `clear_leave_balance_cache` or
+`clear_all_leave_balance_cache`. Values of an employee expire `CACHE_TTL` seconds after the first
+of them is cached, as they are keyed by date.
+"""
+
+import copy
+from functools import partial
+
+import frappe
+from frappe.utils import cint, cstr, getdate
+
+CACHE_KEY = "leave_balance"
+CACHE_TTL = 24 * 60 * 60
+# {employee: version of the employee's values}, the version of all employees' values under "*"
+VERSION_KEY = "leave_balance_version"
+ALL_EMPLOYEES = "*"
+
+
+def get_cached_leave_balance(
+	employee: str,
+	leave_type: str,
+	date,
+	to_date,
+	consider_all_leaves_in_the_allocation_period: bool = False,
+) -> dict:
+	"""Returns leave_balance and leave_balance_for_consumption of the leave type on the date"""
+	args = frappe._dict(
+		leave_type=leave_type,
+		date=getdate(date),
+		to_date=getdate(to_date),
+		consider_all_leaves_in_the_allocation_period=cint(consider_all_leaves_in_the_allocation_period),
+	)
+	field = "balance|{leave_type}|{date}|{to_date}|{consider_all_leaves_in_the_allocation_period}"
+
+	return get_or_compute(employee, field.format(**args), "balance", args)
+
+
+def get_cached_leave_details(employee: str, date) -> dict:
+	"""Returns total, expired, taken, pending and remaining leaves of each allocated leave type"""
+	args = frappe._dict(date=getdate(date))
+	return get_or_compute(employee, f"details|{args.date}", "details", args)
+
+
+def get_or_compute(employee: str, field: str, kind: str, args: dict):
+	key = get_cache_key(employee)
+	version = get_ledger_version(employee)
+	cached = frappe.cache().hget(key, field)
+	if not cached or cached.version != version:
+		cached = compute(employee, kind, args)
+		cached.version = version
+		set_cached_value(key, field, cached)
+
+	# callers may update the returned value
+	return copy.deepcopy(cached.value)
+
+
+def compute(employee: str, kind: str, args: dict) -> frappe._dict:
+	"""Computes the value from the ledger along with the allocation periods it depends on"""
+	from hrms.hr.doctype.leave_application.leave_ledger_replay import LeaveLedgerReplay
+
+	if kind == "balance":
+		leave_types = [args.leave_type]
+		ledger = LeaveLedgerReplay(employee, leave_types, from_date=args.date)
+		value = ledger.get_leave_balance_on(
+			args.leave_type,
+			args.date,
+			to_date=args.to_date,
+			consider_all_leaves_in_the_allocation_period=args.consider_all_leaves_in_the_allocation_period,
+			for_consumption=True,
+		)
+	else:
+		# depends on all leave types, as allocations of any of them can be added
+		leave_types = None
+		ledger = LeaveLedgerReplay(employee, from_date=args.date)
+		value = ledger.get_leave_details(args.date)
+
+	allocations = {
+		leave_type: (allocation.from_date, allocation.to_date)
+		for leave_type, allocation in ledger.get_allocation_records(args.date).items()
+	}
+
+	return frappe._dict(
+		kind=kind, args=args, leave_types=leave_types, allocations=allocations, value=value
+	)
+
+
+def set_cached_value(key: str, field: str, cached: dict) -> None:
+	frappe.cache().hset(key, field, cached)
+
+	# the expiry is not extended by later values, so values of past dates do not pile up
+	name = frappe.cache().make_key(key)
+	if frappe.cache().ttl(name) < 0:
+		frappe.cache().expire(name, CACHE_TTL)
+
+
+def get_ledger_version(employee: str) -> str:
+	"""Returns the version of the employee's cached values, replaced whenever they are cleared"""
+	return "|".join(
+		cstr(frappe.cache().hget(VERSION_KEY, name)) for name in (ALL_EMPLOYEES, employee)
+	)
+
+
+def set_new_version(employee: str = ALL_EMPLOYEES) -> None:
+	frappe.cache().hset(VERSION_KEY, employee, frappe.generate_hash(length=10))
+
+
+def clear_leave_balance_cache(
+	employee: str, leave_type: str, from_date=None, to_date=None
+) -> None:
+	"""Clears cached balances of the employee's leave type affected by changes between the dates,
+	all of them if dates are not passed"""
+	if not (employee and leave_type):
+		return
+
+	clear = partial(_clear_leave_balance_cache, employee, leave_type, from_date, to_date)
+	clear()
+
+	if frappe.db:
+		frappe.db.after_commit.add(clear)
+		frappe.db.after_rollback.add(clear)
+
+
+def clear_all_leave_balance_cache(doc=None, method=None) -> None:
+	"""Clears cached balances of all employees, eg: on changes to holidays"""
+	_clear_all_leave_balance_cache()
+
+	if frappe.db:
+		frappe.db.after_commit.add(_clear_all_leave_balance_cache)
+		frappe.db.after_rollback.add(_clear_all_leave_balance_cache)
+
+
+def _clear_all_leave_balance_cache():
+	set_new_version()
+	frappe.cache().delete_keys(f"{CACHE_KEY}|")
+
+
+def _clear_leave_balance_cache(employee: str, leave_type: str, from_date=None, to_date=None):
+	set_new_version(employee)
+	key = get_cache_key(employee)
+	for field, cached in get_cached_values(employee).items():
+		if is_affected(cached, leave_type, from_date, to_date):
+			frappe.cache().hdel(key, field)
+
+
+def is_affected(cached: dict, leave_type: str, from_date=None, to_date=None) -> bool:
+	if cached.leave_types and leave_type not in cached.leave_types:
+		return False
+
+	# changes outside the allocation's period do not affect balances within it
+	allocation = cached.allocations.get(leave_type)
+	if not (allocation and from_date):
+		return True
+
+	allocation_from_date, allocation_to_date = allocation
+	from_date, to_date = getdate(from_date), getdate(to_date or from_date)
+	return from_date <= getdate(allocation_to_date) and to_date >= getdate(allocation_from_date)
+
+
+def check_leave_balance_cache(employees: list[str] | None = None) -> list[dict]:
+	"""Compares cached values against a full recompute from the ledger.
+
+	Returns the mismatches found, which are cleared from the cache."""
+	if employees is None:
+		employees = frappe.get_all("Employee", pluck="name")
+
+	mismatches = []
+	for employee in employees:
+		for field, cached in get_cached_values(employee).items():
+			value = compute(employee, cached.kind, cached.args).value
+			if value == cached.value:
+				continue
+
+			mismatches.append(
+				frappe._dict(employee=employee, key=field, cached=cached.value, computed=value)
+			)
+			frappe.cache().hdel(get_cache_key(employee), field)
+
+	return mismatches
+
+
+def get_cached_values(employee: str) -> dict:
+	values = frappe.cache().hgetall(get_cache_key(employee)) or {}
+	return {frappe.safe_decode(field): cached for field, cached in values.items()}
+
+
+def get_cache_key(employee: str) -> str:
+	return f"{CACHE_KEY}|{employee}"
@@ -5,7 +5,10 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import DATE_FORMAT, flt, getdate, today
+from frappe.utils import DATE_FORMAT, flt, formatdate, getdate, today
+
+from hrms.hr.doctype.leave_period_closing_entry.leave_period_closing_entry import get_closing_dates
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_leave_balance_cache
 
 
 class LeaveLedgerEntry(Document):
@@ -13,7 +16,15 @@ class LeaveLedgerEntry(Document):
 		if getdate(self.from_date) > getdate(self.to_date):
 			frappe.throw(_("To date needs to be before from date"))
 
+		validate_closed_leave_period(self)
+
+	def on_submit(self):
+		clear_leave_balance_cache(self.employee, self.leave_type, self.from_date, self.to_date)
+
 	def on_cancel(self):
+		validate_closed_leave_period(self)
+		clear_leave_balance_cache(self.employee, self.leave_type, self.from_date, self.to_date)
+
 		# allow cancellation of expiry leaves
 		if self.is_expired:
 			frappe.db.set_value("Leave Allocation", self.transaction_name, "expired", 0)
@@ -45,6 +56,21 @@ def validate_leave_allocation_against_leave_application(ledger):
 		)
 
 
+def validate_closed_leave_period(ledger):
+	"""Checks that the ledger entry does not change the ledger closed by a closed Leave Period"""
+	closing_date = get_closing_dates(ledger.employee, leave_types=[ledger.leave_type]).get(
+		ledger.leave_type
+	)
+
+	if closing_date and getdate(ledger.from_date) <= closing_date:
+		frappe.throw(
+			_(
+				"Leave ledger entries of Employee {0} for Leave Type {1} on or before {2} can not be changed as the Leave Period is closed"
+			).format(ledger.employee, ledger.leave_type, formatdate(closing_date)),
+			title=_("Leave Period Closed"),
+		)
+
+
 def create_leave_ledger_entry(ref_doc, args, submit=True):
 	ledger = frappe._dict(
 		doctype="Leave Ledger Entry",
@@ -69,6 +95,7 @@ def create_leave_ledger_entry(ref_doc, args, submit=True):
 
 def delete_ledger_entry(ledger):
 	"""Delete ledger entry on cancel of leave application/allocation/encashment"""
+	validate_closed_leave_period(ledger)
 	if ledger.transaction_type == "Leave Allocation":
 		validate_leave_allocation_against_leave_application(ledger)
 
@@ -81,6 +108,7 @@ def delete_ledger_entry(ledger):
 			OR `name`=%s""",
 		(ledger.transaction_name, expired_entry),
 	)
+	clear_leave_balance_cache(ledger.employee, ledger.leave_type, ledger.from_date, ledger.to_date)
 
 
 def get_previous_expiry_ledger_entry(ledger):
@@ -1,9 +1,111 @@
 # Copyright (c) 2019, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
 import unittest
 
+import frappe
+from frappe.utils import add_days, get_year_ending, get_year_start, getdate
+
+from hrms.hr.doctype.leave_application.leave_application import (
+	get_leave_balance_on,
+	get_leave_details,
+)
+from hrms.hr.doctype.leave_application.test_leave_application import (
+	get_employee,
+	make_allocation_record,
+	set_leave_approver,
+)
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import (
+	check_leave_balance_cache,
+	clear_all_leave_balance_cache,
+	get_cache_key,
+	get_cached_values,
+)
+from hrms.hr.doctype.leave_type.test_leave_type import create_leave_type
+from hrms.payroll.doctype.salary_slip.test_salary_slip import make_leave_application
+
 
 class TestLeaveLedgerEntry(unittest.TestCase):
-	pass
+	def setUp(self):
+		for dt in ["Leave Application", "Leave Allocation", "Leave Ledger Entry"]:
+			frappe.db.delete(dt)
+
+		frappe.set_user("Administrator")
+		set_leave_approver()
+
+		self.employee = get_employee().name
+		clear_all_leave_balance_cache()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_leave_balance_cache(self):
+		leave_type = create_leave_type(leave_type_name="_Test Leave Type Cached Balance").name
+		year_start = getdate(get_year_start(getdate()))
+		year_end = getdate(get_year_ending(getdate()))
+		make_allocation_record(
+			employee=self.employee, leave_type=leave_type, from_date=year_start, to_date=year_end
+		)
+
+		self.assertEqual(get_leave_balance_on(self.employee, leave_type, year_start, year_end), 30)
+		self.assertEqual(len(get_cached_values(self.employee)), 1)
+
+		# ledger entries of the leave application clear the cached balance
+		make_leave_application(self.employee, year_start, add_days(year_start, 1), leave_type)
+		self.assertEqual(get_cached_values(self.employee), {})
+		self.assertEqual(get_leave_balance_on(self.employee, leave_type, year_start, year_end), 28)
+
+		# balances are recomputed if the cache goes out of sync with the ledger
+		frappe.db.delete("Leave Ledger Entry", {"transaction_type": "Leave Application"})
+		mismatches = check_leave_balance_cache([self.employee])
+		self.assertEqual(len(mismatches), 1)
+		self.assertEqual(mismatches[0].cached.leave_balance, 28)
+		self.assertEqual(mismatches[0].computed.leave_balance, 30)
+		self.assertEqual(get_leave_balance_on(self.employee, leave_type, year_start, year_end), 30)
+
+	def test_leave_balance_cache_version(self):
+		leave_type = create_leave_type(leave_type_name="_Test Leave Type Cached Balance").name
+		year_start = getdate(get_year_start(getdate()))
+		year_end = getdate(get_year_ending(getdate()))
+		make_allocation_record(
+			employee=self.employee, leave_type=leave_type, from_date=year_start, to_date=year_end
+		)
+
+		self.assertEqual(get_leave_balance_on(self.employee, leave_type, year_start, year_end), 30)
+		key = frappe.cache().make_key(get_cache_key(self.employee))
+		self.assertGreater(frappe.cache().ttl(key), 0)
+
+		# values computed before a change are not returned, even if written after it cleared them
+		stale_values = get_cached_values(self.employee)
+		make_leave_application(self.employee, year_start, add_days(year_start, 1), leave_type)
+		for field, cached in stale_values.items():
+			frappe.cache().hset(get_cache_key(self.employee), field, cached)
+
+		self.assertEqual(len(get_cached_values(self.employee)), 1)
+		self.assertEqual(get_leave_balance_on(self.employee, leave_type, year_start, year_end), 28)
+
+		# changes to holidays clear the values
+		frappe.get_last_doc("Holiday List").save()
+		self.assertEqual(get_cached_values(self.employee), {})
+
+	def test_leave_balance_cache_for_pending_leaves(self):
+		leave_type = create_leave_type(leave_type_name="_Test Leave Type Cached Balance").name
+		year_start = getdate(get_year_start(getdate()))
+		year_end = getdate(get_year_ending(getdate()))
+		make_allocation_record(
+			employee=self.employee, leave_type=leave_type, from_date=year_start, to_date=year_end
+		)
+
+		details = get_leave_details(self.employee, year_start)
+		self.assertEqual(details["leave_allocation"][leave_type]["leaves_pending_approval"], 0)
+
+		application = make_leave_application(
+			self.employee, year_start, add_days(year_start, 1), leave_type, submit=False
+		)
+		application.status = "Open"
+		application.save()
+
+		# cached leave details are cleared for leaves pending approval
+		details = get_leave_details(self.employee, year_start)
+		self.assertEqual(details["leave_allocation"][leave_type]["leaves_pending_approval"], 2)
+		self.assertEqual(check_leave_balance_cache([self.employee]), [])
@@ -8,6 +8,30 @@ frappe.ui.form.on('Leave Period', {
 			frm.set_value("to_date", frappe.datetime.add_days(a_year_from_start, -1));
 		}
 	},
+	refresh: (frm) => {
+		if (frm.is_new()) return;
+
+		if (frm.doc.is_closed) {
+			frm.add_custom_button(__("Reopen Period"), () => {
+				frappe.confirm(
+					__("Closing entries of this period will be deleted. Do you want to continue?"),
+					() => frm.call({ method: "reopen_period", doc: frm.doc }).then(() => frm.reload_doc())
+				);
+			});
+		} else if (frm.doc.to_date < frappe.datetime.get_today()) {
+			frm.add_custom_button(__("Close Period"), () => {
+				frappe.confirm(
+					__("Leave ledger entries up to the end of this period can not be changed once it is closed. Do you want to continue?"),
+					() => frm.call({
+						method: "close_period",
+						doc: frm.doc,
+						freeze: true,
+						freeze_message: __("Closing Leave Period..."),
+					}).then(() => frm.reload_doc())
+				);
+			});
+		}
+	},
 	onload: (frm) => {
 		frm.set_query("department", function() {
 			return {
@@ -17,3 +17,30 @@ class LeavePeriod(Document):
 	def validate_dates(self):
 		if getdate(self.from_date) >= getdate(self.to_date):
 			frappe.throw(_("To date can not be equal or less than from date"))
+
+	@frappe.whitelist()
+	def close_period(self):
+		from hrms.hr.doctype.leave_period.leave_period_closing import LeavePeriodClosing
+
+		self.check_permission("write")
+		if self.is_closed:
+			frappe.throw(_("Leave Period is already closed"))
+
+		count = LeavePeriodClosing(self).close()
+		self.db_set("is_closed", 1)
+		frappe.msgprint(
+			_("Leave Period closed with {0} closing entries").format(count),
+			indicator="green",
+			alert=True,
+		)
+
+	@frappe.whitelist()
+	def reopen_period(self):
+		from hrms.hr.doctype.leave_period.leave_period_closing import LeavePeriodClosing
+
+		self.check_permission("write")
+		if not self.is_closed:
+			frappe.throw(_("Leave Period is not closed"))
+
+		LeavePeriodClosing(self).reopen()
+		self.db_set("is_closed", 0)
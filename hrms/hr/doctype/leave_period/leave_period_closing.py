@@ -0,0 +1,130 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import get_link_to_form, getdate, now, today
+
+# closing entries inserted per query
+CHUNK_SIZE = 500
+
+
+class LeavePeriodClosing:
+	"""Closes a Leave Period by closing the leave ledger of allocations ending within it.
+
+	One Leave Period Closing Entry is written per (employee, leave type) allocated within the period.
+	Once closed, ledger entries on or before the period's end can not be added or removed, so balances
+	after it are computed from the ledger entries following the latest closing date instead of the
+	whole history.
+	"""
+
+	def __init__(self, leave_period):
+		self.leave_period = leave_period
+		self.from_date = getdate(leave_period.from_date)
+		self.to_date = getdate(leave_period.to_date)
+		self.leave_types = [d.leave_type for d in leave_period.get("leave_types") or []]
+
+	def close(self) -> int:
+		"""Writes the closing entries of the period and returns the number of entries written"""
+		allocations = self.get_allocations()
+		self.validate(allocations)
+
+		# {(employee, leave type): allocation}
+		allocations = {(d.employee, d.leave_type): d for d in allocations}
+		timestamp = now()
+		entries = [self.get_closing_entry(d, timestamp) for d in allocations.values()]
+
+		for start in range(0, len(entries), CHUNK_SIZE):
+			chunk = entries[start : start + CHUNK_SIZE]
+			fields = list(chunk[0])
+			frappe.db.bulk_insert(
+				"Leave Period Closing Entry", fields, [[row[field] for field in fields] for row in chunk]
+			)
+
+		return len(entries)
+
+	def reopen(self) -> None:
+		"""Drops the closing entries of the period, balances are computed from the whole ledger again"""
+		later_period = frappe.db.get_value(
+			"Leave Period",
+			{"company": self.leave_period.company, "is_closed": 1, "to_date": (">", self.to_date)},
+		)
+		if later_period:
+			frappe.throw(
+				_("Leave Period {0} closed after this one needs to be reopened first").format(
+					get_link_to_form("Leave Period", later_period)
+				)
+			)
+
+		frappe.db.delete("Leave Period Closing Entry", {"leave_period": self.leave_period.name})
+
+	def validate(self, allocations: list[dict]) -> None:
+		if self.to_date >= getdate(today()):
+			frappe.throw(_("Leave Period can only be closed after its end date"))
+
+		# balances after the period are computed without the ledger entries before its end,
+		# so allocations can not continue past it
+		if continuing := self.get_allocations(ending_after=True):
+			frappe.throw(
+				_("Leave Allocations {0} continue after the end of the Leave Period").format(
+					", ".join(get_link_to_form("Leave Allocation", d.name) for d in continuing[:5])
+				),
+				title=_("Cannot Close Leave Period"),
+			)
+
+		# expiry entries are added to the ledger after allocations end
+		if unexpired := [d for d in allocations if not d.expired]:
+			frappe.throw(
+				_("Leave Allocations {0} are not expired yet").format(
+					", ".join(get_link_to_form("Leave Allocation", d.name) for d in unexpired[:5])
+				),
+				title=_("Cannot Close Leave Period"),
+			)
+
+	def get_allocations(self, ending_after: bool = False) -> list[dict]:
+		"""Returns submitted allocations ending within the period, or the ones ending after it if
+		`ending_after` is set"""
+		LeaveAllocation = frappe.qb.DocType("Leave Allocation")
+		query = (
+			frappe.qb.from_(LeaveAllocation)
+			.select(
+				LeaveAllocation.name,
+				LeaveAllocation.employee,
+				LeaveAllocation.employee_name,
+				LeaveAllocation.leave_type,
+				LeaveAllocation.from_date,
+				LeaveAllocation.to_date,
+				LeaveAllocation.expired,
+			)
+			.where(
+				(LeaveAllocation.company == self.leave_period.company) & (LeaveAllocation.docstatus == 1)
+			)
+			.orderby(LeaveAllocation.employee)
+			.orderby(LeaveAllocation.from_date)
+		)
+
+		if ending_after:
+			query = query.where(
+				(LeaveAllocation.from_date <= self.to_date) & (LeaveAllocation.to_date > self.to_date)
+			)
+		else:
+			query = query.where(LeaveAllocation.to_date.between(self.from_date, self.to_date))
+
+		if self.leave_types:
+			query = query.where(LeaveAllocation.leave_type.isin(self.leave_types))
+
+		return query.run(as_dict=True)
+
+	def get_closing_entry(self, allocation: dict, timestamp: str) -> dict:
+		return {
+			"name": frappe.generate_hash(length=10),
+			"owner": frappe.session.user,
+			"modified_by": frappe.session.user,
+			"creation": timestamp,
+			"modified": timestamp,
+			"employee": allocation.employee,
+			"employee_name": allocation.employee_name,
+			"leave_type": allocation.leave_type,
+			"leave_period": self.leave_period.name,
+			"closing_date": self.to_date,
+		}
@@ -4,14 +4,120 @@
 import unittest
 
 import frappe
+from frappe.utils import add_days, add_years, get_year_ending, get_year_start, getdate, nowdate
 
 import erpnext
 
+from hrms.hr.doctype.leave_application.leave_application import get_leave_balance_on
+from hrms.hr.doctype.leave_application.leave_ledger_replay import LeaveLedgerReplay
+from hrms.hr.doctype.leave_application.test_leave_application import (
+	get_employee,
+	make_allocation_record,
+)
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
+from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import expire_allocation
+from hrms.hr.doctype.leave_type.test_leave_type import create_leave_type
+
 test_dependencies = ["Employee", "Leave Type", "Leave Policy"]
 
 
 class TestLeavePeriod(unittest.TestCase):
-	pass
+	def setUp(self):
+		for dt in [
+			"Leave Allocation",
+			"Leave Ledger Entry",
+			"Leave Period",
+			"Leave Period Closing Entry",
+		]:
+			frappe.db.delete(dt)
+		clear_all_leave_balance_cache()
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_close_and_reopen_leave_period(self):
+		employee = get_employee().name
+		leave_type = create_leave_type(leave_type_name="_Test Leave Type Period Closing").name
+		last_year = add_years(nowdate(), -1)
+		from_date, to_date = getdate(get_year_start(last_year)), getdate(get_year_ending(last_year))
+
+		leave_period = frappe.get_doc(
+			{
+				"doctype": "Leave Period",
+				"company": "_Test Company",
+				"from_date": from_date,
+				"to_date": to_date,
+				"leave_types": [{"leave_type": leave_type}],
+			}
+		).insert()
+
+		allocation = make_allocation_record(
+			employee=employee, leave_type=leave_type, from_date=from_date, to_date=to_date, leaves=10
+		)
+		make_ledger_entry(employee, leave_type, add_days(from_date, 10), add_days(from_date, 11), -2)
+		expire_allocation(allocation)
+
+		leave_period.close_period()
+		closing_entry = frappe.get_doc(
+			"Leave Period Closing Entry", {"employee": employee, "leave_type": leave_type}
+		)
+		self.assertEqual(closing_entry.leave_period, leave_period.name)
+		self.assertEqual(getdate(closing_entry.closing_date), to_date)
+
+		# ledger of the closed period can not be changed
+		self.assertRaises(
+			frappe.ValidationError, make_ledger_entry, employee, leave_type, to_date, to_date, -1
+		)
+
+		# balances after the closed period skip its ledger entries
+		next_from_date, next_to_date = add_days(to_date, 1), add_years(to_date, 1)
+		make_allocation_record(
+			employee=employee,
+			leave_type=leave_type,
+			from_date=next_from_date,
+			to_date=next_to_date,
+			leaves=15,
+		)
+		ledger = LeaveLedgerReplay(employee, [leave_type], from_date=next_from_date)
+		self.assertTrue(all(d.from_date > to_date for d in ledger.entries[leave_type]))
+		self.assertEqual(ledger.get_leave_balance_on(leave_type, next_from_date, next_to_date), 15)
+		self.assertEqual(get_leave_balance_on(employee, leave_type, next_from_date, next_to_date), 15)
+
+		leave_period.reload()
+		leave_period.reopen_period()
+		closing_entries = frappe.get_all(
+			"Leave Period Closing Entry", {"leave_period": leave_period.name}
+		)
+		self.assertEqual(closing_entries, [])
+		self.assertEqual(leave_period.is_closed, 0)
+
+	def test_allocation_continuing_after_leave_period(self):
+		employee = get_employee().name
+		leave_type = create_leave_type(leave_type_name="_Test Leave Type Period Closing").name
+		last_year = add_years(nowdate(), -1)
+		from_date, to_date = getdate(get_year_start(last_year)), getdate(get_year_ending(last_year))
+
+		leave_period = frappe.get_doc(
+			{
+				"doctype": "Leave Period",
+				"company": "_Test Company",
+				"from_date": from_date,
+				"to_date": to_date,
+				"leave_types": [{"leave_type": leave_type}],
+			}
+		).insert()
+		make_allocation_record(
+			employee=employee,
+			leave_type=leave_type,
+			from_date=add_days(to_date, -30),
+			to_date=add_days(to_date, 30),
+		)
+
+		self.assertRaises(frappe.ValidationError, leave_period.close_period)
+		closing_entries = frappe.get_all(
+			"Leave Period Closing Entry", {"leave_period": leave_period.name}
+		)
+		self.assertEqual(closing_entries, [])
 
 
 def create_leave_period(from_date, to_date, company=None):
@@ -42,3 +148,18 @@ def create_leave_period(from_date, to_date, company=None):
 		}
 	).insert()
 	return leave_period
+
+
+def make_ledger_entry(employee, leave_type, from_date, to_date, leaves):
+	return frappe.get_doc(
+		{
+			"doctype": "Leave Ledger Entry",
+			"employee": employee,
+			"leave_type": leave_type,
+			"transaction_type": "Leave Application",
+			"transaction_name": "_Test Leave Application",
+			"from_date": from_date,
+			"to_date": to_date,
+			"leaves": leaves,
+		}
+	).submit()
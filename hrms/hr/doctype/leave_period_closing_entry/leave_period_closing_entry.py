@@ -0,0 +1,30 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder.functions import Max
+from frappe.utils import getdate
+
+
+class LeavePeriodClosingEntry(Document):
+	pass
+
+
+def get_closing_dates(employee: str, before=None, leave_types: list[str] | None = None) -> dict:
+	"""Returns the end of the latest closed Leave Period for each of the employee's leave types,
+	only considering periods closed before the date if passed"""
+	ClosingEntry = frappe.qb.DocType("Leave Period Closing Entry")
+	query = (
+		frappe.qb.from_(ClosingEntry)
+		.select(ClosingEntry.leave_type, Max(ClosingEntry.closing_date))
+		.where(ClosingEntry.employee == employee)
+		.groupby(ClosingEntry.leave_type)
+	)
+
+	if before:
+		query = query.where(ClosingEntry.closing_date < getdate(before))
+	if leave_types:
+		query = query.where(ClosingEntry.leave_type.isin(leave_types))
+
+	return {leave_type: getdate(closing_date) for leave_type, closing_date in query.run()}
@@ -0,0 +1,46 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import getdate
+
+from hrms.hr.doctype.leave_application.test_leave_application import get_employee
+from hrms.hr.doctype.leave_period_closing_entry.leave_period_closing_entry import get_closing_dates
+from hrms.hr.doctype.leave_type.test_leave_type import create_leave_type
+
+
+class TestLeavePeriodClosingEntry(FrappeTestCase):
+	def setUp(self):
+		frappe.db.delete("Leave Period Closing Entry")
+
+	def test_closing_dates(self):
+		employee = get_employee().name
+		leave_types = [
+			create_leave_type(leave_type_name=f"_Test Leave Type Closing {i}").name for i in range(2)
+		]
+		for leave_type, closing_date in (
+			(leave_types[0], "2021-12-31"),
+			(leave_types[0], "2022-12-31"),
+			(leave_types[1], "2021-12-31"),
+		):
+			frappe.get_doc(
+				{
+					"doctype": "Leave Period Closing Entry",
+					"name": frappe.generate_hash(length=10),
+					"employee": employee,
+					"leave_type": leave_type,
+					"leave_period": "_Test Leave Period",
+					"closing_date": closing_date,
+				}
+			).db_insert()
+
+		self.assertEqual(
+			get_closing_dates(employee),
+			{leave_types[0]: getdate("2022-12-31"), leave_types[1]: getdate("2021-12-31")},
+		)
+		# periods closed on or after the date are not considered
+		self.assertEqual(
+			get_closing_dates(employee, before="2022-12-31", leave_types=[leave_types[0]]),
+			{leave_types[0]: getdate("2021-12-31")},
+		)
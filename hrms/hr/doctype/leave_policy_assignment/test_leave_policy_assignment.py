@@ -6,6 +6,7 @@ from frappe.tests.utils import FrappeTestCase
 from frappe.utils import add_months, get_first_day, getdate
 
 from hrms.hr.doctype.leave_application.test_leave_application import get_employee, get_leave_period
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_policy.test_leave_policy import create_leave_policy
 from hrms.hr.doctype.leave_policy_assignment.leave_policy_assignment import (
 	create_assignment_for_multiple_employees,
@@ -24,6 +25,7 @@ class TestLeavePolicyAssignment(FrappeTestCase):
 			"Leave Ledger Entry",
 		]:
 			frappe.db.delete(doctype)
+		clear_all_leave_balance_cache()
 
 		employee = get_employee()
 		self.original_doj = employee.date_of_joining
@@ -8,6 +8,8 @@ from frappe import _, bold
 from frappe.model.document import Document
 from frappe.utils import today, getdate, cint, add_to_date
 
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
+
 STANDARD_EARNED_LEAVES_FREQUENCIES = ["Monthly", "Quarterly", "Half-Yearly", "Yearly"]
 
 class LeaveType(Document):
@@ -15,6 +17,11 @@ class LeaveType(Document):
 		self.validate_lwp()
 		self.validate_leave_types()
 
+	def on_update(self):
+		# leaves taken are counted with or without holidays
+		if self.has_value_changed("include_holiday"):
+			clear_all_leave_balance_cache()
+
 	def validate_lwp(self):
 		if self.is_lwp:
 			leave_allocation = frappe.get_all(
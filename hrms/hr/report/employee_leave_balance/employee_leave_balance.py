@@ -1,19 +1,20 @@
 # Copyright (c) 2013, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
-
+import datetime
 from itertools import groupby
 from typing import Dict, List, Optional, Tuple
 
 import frappe
 from frappe import _
+from frappe.query_builder.functions import Max, Min
 from frappe.utils import add_days, cint, flt, getdate
 
-from hrms.hr.doctype.leave_allocation.leave_allocation import get_previous_allocation
 from hrms.hr.doctype.leave_application.leave_application import (
-	get_leave_balance_on,
-	get_leaves_for_period,
+	get_holidays_for_leave_entries,
+	get_leave_days_from_entries,
 )
+from hrms.hr.doctype.leave_application.leave_ledger_replay import LeaveLedgerReplay
 
 Filters = frappe._dict
 
@@ -101,6 +102,16 @@ def get_data(filters: Filters) -> List:
 	consolidate_leave_types = len(active_employees) > 1 and filters.consolidate_leave_types
 	row = None
 
+	# balances of all (employee, leave type) pairs are computed together
+	employees = [employee.name for employee in active_employees]
+	leaves_taken_map = get_leaves_taken(filters.from_date, filters.to_date, employees, leave_types)
+	allocated_and_expired_leaves = get_allocated_and_expired_leaves(
+		filters.from_date, filters.to_date, employees, leave_types
+	)
+	opening_balances = get_opening_balances(
+		employees, leave_types, filters, allocated_and_expired_leaves
+	)
+
 	data = []
 
 	for leave_type in leave_types:
@@ -122,14 +133,12 @@ def get_data(filters: Filters) -> List:
 			row.employee = employee.name
 			row.employee_name = employee.employee_name
 
-			leaves_taken = (
-				get_leaves_for_period(employee.name, leave_type, filters.from_date, filters.to_date) * -1
+			key = (employee.name, leave_type)
+			leaves_taken = leaves_taken_map.get(key, 0)
+			new_allocation, expired_leaves, carry_forwarded_leaves = allocated_and_expired_leaves.get(
+				key, (0, 0, 0)
 			)
-
-			new_allocation, expired_leaves, carry_forwarded_leaves = get_allocated_and_expired_leaves(
-				filters.from_date, filters.to_date, employee.name, leave_type
-			)
-			opening = get_opening_balance(employee.name, leave_type, filters, carry_forwarded_leaves)
+			opening = opening_balances.get(key, 0)
 
 			row.leaves_allocated = flt(new_allocation, precision)
 			row.leaves_expired = flt(expired_leaves, precision)
@@ -145,28 +154,97 @@ def get_data(filters: Filters) -> List:
 	return data
 
 
-def get_opening_balance(
-	employee: str, leave_type: str, filters: Filters, carry_forwarded_leaves: float
-) -> float:
+def get_opening_balances(
+	employees: List[str],
+	leave_types: List[str],
+	filters: Filters,
+	allocated_and_expired_leaves: Dict[Tuple[str, str], Tuple[float, float, float]],
+) -> Dict[Tuple[str, str], float]:
+	"""Returns opening balances of each (employee, leave type)"""
 	# allocation boundary condition
 	# opening balance is the closing leave balance 1 day before the filter start date
-	opening_balance_date = add_days(filters.from_date, -1)
-	allocation = get_previous_allocation(filters.from_date, leave_type, employee)
+	opening_balance_date = getdate(add_days(filters.from_date, -1))
+	previous_allocations = get_previous_allocation_end_dates(
+		filters.from_date, employees, leave_types
+	)
+
+	opening_balances = {}
+	pending = []
+	for employee in employees:
+		for leave_type in leave_types:
+			key = (employee, leave_type)
+			if previous_allocations.get(key) == opening_balance_date:
+				# if opening balance date is same as the previous allocation's expiry
+				# then opening balance should only consider carry forwarded leaves
+				opening_balances[key] = allocated_and_expired_leaves.get(key, (0, 0, 0))[2]
+			else:
+				pending.append(key)
+
+	if not pending:
+		return opening_balances
+
+	# else directly get leave balance on the previous day,
+	# replaying the ledgers of all employees loaded together
+	ledgers = LeaveLedgerReplay.for_employees(
+		list({employee for employee, leave_type in pending}),
+		leave_types,
+		since=get_allocations_start(opening_balance_date, employees, leave_types),
+	)
+	for employee, leave_type in pending:
+		opening_balances[(employee, leave_type)] = ledgers[employee].get_leave_balance_on(
+			leave_type, opening_balance_date
+		)
 
-	if (
-		allocation
-		and allocation.get("to_date")
-		and opening_balance_date
-		and getdate(allocation.get("to_date")) == getdate(opening_balance_date)
-	):
-		# if opening balance date is same as the previous allocation's expiry
-		# then opening balance should only consider carry forwarded leaves
-		opening_balance = carry_forwarded_leaves
-	else:
-		# else directly get leave balance on the previous day
-		opening_balance = get_leave_balance_on(employee, leave_type, opening_balance_date)
+	return opening_balances
 
-	return opening_balance
+
+def get_previous_allocation_end_dates(
+	from_date: str, employees: List[str], leave_types: List[str]
+) -> Dict[Tuple[str, str], datetime.date]:
+	"""Returns the end date of the last allocation before `from_date` of each (employee, leave type),
+	like `get_previous_allocation`"""
+	if not (employees and leave_types):
+		return {}
+
+	LeaveAllocation = frappe.qb.DocType("Leave Allocation")
+	allocations = (
+		frappe.qb.from_(LeaveAllocation)
+		.select(
+			LeaveAllocation.employee,
+			LeaveAllocation.leave_type,
+			Max(LeaveAllocation.to_date).as_("to_date"),
+		)
+		.where(
+			(LeaveAllocation.docstatus == 1)
+			& (LeaveAllocation.to_date < from_date)
+			& (LeaveAllocation.employee.isin(employees))
+			& (LeaveAllocation.leave_type.isin(leave_types))
+		)
+		.groupby(LeaveAllocation.employee, LeaveAllocation.leave_type)
+	).run(as_dict=True)
+
+	return {(d.employee, d.leave_type): getdate(d.to_date) for d in allocations}
+
+
+def get_allocations_start(
+	date: datetime.date, employees: List[str], leave_types: List[str]
+) -> datetime.date:
+	"""Returns the earliest start of the allocations active on the date, ledger entries ending before
+	it do not affect balances on the date"""
+	LeaveAllocation = frappe.qb.DocType("Leave Allocation")
+	start = (
+		frappe.qb.from_(LeaveAllocation)
+		.select(Min(LeaveAllocation.from_date))
+		.where(
+			(LeaveAllocation.docstatus == 1)
+			& (LeaveAllocation.from_date <= date)
+			& (LeaveAllocation.to_date >= date)
+			& (LeaveAllocation.employee.isin(employees))
+			& (LeaveAllocation.leave_type.isin(leave_types))
+		)
+	).run()
+
+	return getdate(start[0][0]) if start and start[0][0] else date
 
 
 def get_conditions(filters: Filters) -> Dict:
@@ -212,37 +290,100 @@ def get_department_leave_approver_map(department: Optional[str] = None):
 
 
 def get_allocated_and_expired_leaves(
-	from_date: str, to_date: str, employee: str, leave_type: str
-) -> Tuple[float, float, float]:
-	new_allocation = 0
-	expired_leaves = 0
-	carry_forwarded_leaves = 0
+	from_date: str, to_date: str, employees: List[str], leave_types: List[str]
+) -> Dict[Tuple[str, str], Tuple[float, float, float]]:
+	"""Returns new, expired and carry forwarded leaves of each (employee, leave type)"""
+	allocated_and_expired_leaves = {}
+
+	records = get_leave_ledger_entries(from_date, to_date, employees, leave_types)
+	for key, group in group_by_employee_and_leave_type(records).items():
+		new_allocation = 0
+		expired_leaves = 0
+		carry_forwarded_leaves = 0
+
+		for record in group:
+			# new allocation records with `is_expired=1` are created when leave expires
+			# these new records should not be considered, else it leads to negative leave balance
+			if record.is_expired:
+				continue
+
+			if record.to_date < getdate(to_date):
+				# leave allocations ending before to_date, reduce leaves taken within that period
+				# since they are already used, they won't expire
+				expired_leaves += record.leaves
+				# expired_leaves += get_leaves_for_period(employee, leave_type, record.from_date, record.to_date)
+
+			if record.from_date >= getdate(from_date):
+				if record.is_carry_forward:
+					carry_forwarded_leaves += record.leaves
+				else:
+					new_allocation += record.leaves
+
+		allocated_and_expired_leaves[key] = (
+			flt(new_allocation, 2),
+			flt(expired_leaves, 2),
+			flt(carry_forwarded_leaves, 2),
+		)
 
-	records = get_leave_ledger_entries(from_date, to_date, employee, leave_type)
-	for record in records:
-		# new allocation records with `is_expired=1` are created when leave expires
-		# these new records should not be considered, else it leads to negative leave balance
-		if record.is_expired:
-			continue
-
-		if record.to_date < getdate(to_date):
-			# leave allocations ending before to_date, reduce leaves taken within that period
-			# since they are already used, they won't expire
-			expired_leaves += record.leaves
-			# expired_leaves += get_leaves_for_period(employee, leave_type, record.from_date, record.to_date)
-
-		if record.from_date >= getdate(from_date):
-			if record.is_carry_forward:
-				carry_forwarded_leaves += record.leaves
-			else:
-				new_allocation += record.leaves
+	return allocated_and_expired_leaves
+
+
+def get_leaves_taken(
+	from_date: str, to_date: str, employees: List[str], leave_types: List[str]
+) -> Dict[Tuple[str, str], float]:
+	"""Returns leaves taken within the period of each (employee, leave type),
+	like `get_leaves_for_period`"""
+	from_date, to_date = getdate(from_date), getdate(to_date)
+	if not (employees and leave_types):
+		return {}
 
-	return flt(new_allocation, 2), flt(expired_leaves, 2), flt(carry_forwarded_leaves, 2)
+	ledger = frappe.qb.DocType("Leave Ledger Entry")
+	leave_application = frappe.qb.DocType("Leave Application")
+	records = (
+		frappe.qb.from_(ledger)
+		.left_join(leave_application)
+		.on(
+			(ledger.transaction_type == "Leave Application")
+			& (ledger.transaction_name == leave_application.name)
+		)
+		.select(
+			ledger.employee,
+			ledger.leave_type,
+			ledger.from_date,
+			ledger.to_date,
+			ledger.leaves,
+			ledger.transaction_name,
+			ledger.transaction_type,
+			ledger.holiday_list,
+			ledger.is_carry_forward,
+			ledger.is_expired,
+			leave_application.half_day_date,
+		)
+		.where(
+			(ledger.docstatus == 1)
+			& ((ledger.leaves < 0) | (ledger.is_expired == 1))
+			& (ledger.employee.isin(employees))
+			& (ledger.leave_type.isin(leave_types))
+			& get_period_condition(ledger, from_date, to_date)
+		)
+	).run(as_dict=True)
+
+	# holidays of all the employees are loaded with one query
+	holidays = get_holidays_for_leave_entries(records, from_date, to_date)
+
+	return {
+		key: get_leave_days_from_entries(group, from_date, to_date, holidays=holidays) * -1
+		for key, group in group_by_employee_and_leave_type(records).items()
+	}
 
 
 def get_leave_ledger_entries(
-	from_date: str, to_date: str, employee: str, leave_type: str
+	from_date: str, to_date: str, employees: List[str], leave_types: List[str]
 ) -> List[Dict]:
+	"""Returns allocation ledger entries of the employees and leave types overlapping the period"""
+	if not (employees and leave_types):
+		return []
+
 	ledger = frappe.qb.DocType("Leave Ledger Entry")
 	records = (
 		frappe.qb.from_(ledger)
@@ -260,19 +401,32 @@ def get_leave_ledger_entries(
 		.where(
 			(ledger.docstatus == 1)
 			& (ledger.transaction_type == "Leave Allocation")
-			& (ledger.employee == employee)
-			& (ledger.leave_type == leave_type)
-			& (
-				(ledger.from_date[from_date:to_date])
-				| (ledger.to_date[from_date:to_date])
-				| ((ledger.from_date < from_date) & (ledger.to_date > to_date))
-			)
+			& (ledger.employee.isin(employees))
+			& (ledger.leave_type.isin(leave_types))
+			& get_period_condition(ledger, from_date, to_date)
 		)
 	).run(as_dict=True)
 
 	return records
 
 
+def group_by_employee_and_leave_type(records: List[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+	grouped = {}
+	for record in records:
+		grouped.setdefault((record.employee, record.leave_type), []).append(record)
+
+	return grouped
+
+
+def get_period_condition(ledger, from_date: str, to_date: str):
+	"""Condition for ledger entries overlapping the period"""
+	return (
+		(ledger.from_date[from_date:to_date])
+		| (ledger.to_date[from_date:to_date])
+		| ((ledger.from_date < from_date) & (ledger.to_date > to_date))
+	)
+
+
 def get_chart_data(data: List, filters: Filters) -> Dict:
 	labels = []
 	datasets = []
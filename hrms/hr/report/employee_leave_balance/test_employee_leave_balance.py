@@ -10,7 +10,12 @@ from frappe.utils import add_days, add_months, flt, get_year_ending, get_year_st
 from erpnext.setup.doctype.employee.test_employee import make_employee
 from erpnext.setup.doctype.holiday_list.test_holiday_list import set_holiday_list
 
+from hrms.hr.doctype.leave_application.leave_application import (
+	get_leave_balance_on,
+	get_leaves_for_period,
+)
 from hrms.hr.doctype.leave_application.test_leave_application import make_allocation_record
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import process_expired_allocation
 from hrms.hr.doctype.leave_type.test_leave_type import create_leave_type
 from hrms.hr.report.employee_leave_balance.employee_leave_balance import execute
@@ -33,6 +38,7 @@ class TestEmployeeLeaveBalance(unittest.TestCase):
 			"Leave Type",
 		]:
 			frappe.db.delete(dt)
+		clear_all_leave_balance_cache()
 
 		frappe.set_user("Administrator")
 
@@ -206,6 +212,53 @@ class TestEmployeeLeaveBalance(unittest.TestCase):
 		)
 		self.assertEqual(report[1][0].opening_balance, opening_balance)
 
+	@set_holiday_list("_Test Emp Balance Holiday List", "_Test Company")
+	def test_leave_balance_of_multiple_employees(self):
+		frappe.get_doc(test_records[0]).insert()
+		employee2 = make_employee("test_emp_leave_balance2@example.com", company="_Test Company")
+		for employee in (self.employee_id, employee2):
+			make_allocation_record(employee=employee, from_date=self.year_start, to_date=self.year_end)
+
+		# 4 and 2 days leave, half of the first one is taken within the report's period
+		first_sunday = get_first_sunday(self.holiday_list, for_date=self.year_start)
+		make_leave_application(
+			self.employee_id, add_days(first_sunday, 1), add_days(first_sunday, 4), "_Test Leave Type"
+		)
+		make_leave_application(
+			employee2, add_days(first_sunday, 1), add_days(first_sunday, 2), "_Test Leave Type"
+		)
+
+		filters = frappe._dict(
+			{
+				"from_date": add_days(first_sunday, 3),
+				"to_date": self.year_end,
+				"company": "_Test Company",
+				"consolidate_leave_types": 1,
+			}
+		)
+		report = execute(filters)
+
+		# leave type row followed by a row per employee
+		self.assertEqual(report[1][0], {"leave_type": "_Test Leave Type"})
+		rows = {row.employee: row for row in report[1][1:]}
+
+		# balances computed for all employees together match the ones computed per employee
+		for employee in (self.employee_id, employee2):
+			opening_balance = get_leave_balance_on(
+				employee, "_Test Leave Type", add_days(filters.from_date, -1)
+			)
+			leaves_taken = -1 * get_leaves_for_period(
+				employee, "_Test Leave Type", filters.from_date, filters.to_date
+			)
+
+			self.assertEqual(rows[employee].opening_balance, opening_balance)
+			self.assertEqual(rows[employee].leaves_taken, leaves_taken)
+			self.assertEqual(rows[employee].closing_balance, opening_balance - leaves_taken)
+
+		self.assertEqual(rows[self.employee_id].opening_balance, rows[employee2].opening_balance)
+		self.assertEqual(rows[self.employee_id].leaves_taken, 2)
+		self.assertEqual(rows[employee2].leaves_taken, 0)
+
 	@set_holiday_list("_Test Emp Balance Holiday List", "_Test Company")
 	def test_employee_status_filter(self):
 		frappe.get_doc(test_records[0]).insert()
@@ -11,6 +11,7 @@ from erpnext.setup.doctype.employee.test_employee import make_employee
 from erpnext.setup.doctype.holiday_list.test_holiday_list import set_holiday_list
 
 from hrms.hr.doctype.leave_application.test_leave_application import make_allocation_record
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import process_expired_allocation
 from hrms.hr.report.employee_leave_balance_summary.employee_leave_balance_summary import execute
 from hrms.payroll.doctype.salary_slip.test_salary_slip import (
@@ -32,6 +33,7 @@ class TestEmployeeLeaveBalance(unittest.TestCase):
 			"Leave Type",
 		]:
 			frappe.db.delete(dt)
+		clear_all_leave_balance_cache()
 
 		frappe.set_user("Administrator")
 
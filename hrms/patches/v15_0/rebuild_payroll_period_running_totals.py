@@ -0,0 +1,7 @@
+from hrms.payroll.doctype.payroll_period_running_total.payroll_period_running_total import (
+	rebuild_payroll_period_running_totals,
+)
+
+
+def execute():
+	rebuild_payroll_period_running_totals()
@@ -0,0 +1,585 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+"""Benchmarks payroll on a synthetic workforce.
+
+`SyntheticWorkforce` generates a company with employees, salary structures with formulas and
+conditions, salary structure assignments, attendance, leave applications, additional salaries and
+timesheets for a payroll period. `PayrollBenchmark` then runs a Payroll Entry for the period
+phase by phase, measuring the wall time, number of queries and peak memory of each phase.
+
+Meant to be run on a throwaway site, with `bench --site <site> run-payroll-benchmark`.
+"""
+
+import json
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import (
+	add_days,
+	add_to_date,
+	cint,
+	date_diff,
+	get_datetime,
+	get_first_day,
+	get_last_day,
+	getdate,
+	now,
+)
+
+from hrms.payroll.doctype.payroll_entry.payroll_entry import (
+	create_salary_slips_for_employees,
+	submit_salary_slips_for_employees,
+)
+from hrms.payroll.doctype.payroll_run_log.payroll_run_log import QueryCounter
+from hrms.payroll.doctype.salary_structure.bulk_salary_structure_assignment import (
+	BulkSalaryStructureAssignment,
+)
+
+PHASES = (
+	"fill_employee_details",
+	"create_salary_slips",
+	"submit_salary_slips",
+	"make_accrual_jv_entry",
+	"make_payment_entry",
+)
+
+# (salary component, abbr, type)
+SALARY_COMPONENTS = (
+	("Benchmark Basic", "BMB", "Earning"),
+	("Benchmark HRA", "BMH", "Earning"),
+	("Benchmark Special Allowance", "BMSA", "Earning"),
+	("Benchmark Overtime", "BMOT", "Earning"),
+	("Benchmark Provident Fund", "BMPF", "Deduction"),
+	("Benchmark Professional Tax", "BMPT", "Deduction"),
+)
+
+LEAVE_TYPE = "Benchmark Leave Without Pay"
+ACTIVITY_TYPE = "Benchmark Work"
+
+
+class SyntheticWorkforce:
+	"""Generates a company and its workforce for a payroll period.
+
+	Shares of employees with leave applications, additional salaries and timesheets are fixed, and
+	random values are drawn from a seeded generator so that runs with the same arguments generate
+	the same workforce.
+	"""
+
+	def __init__(
+		self,
+		company: str,
+		employees: int = 100,
+		salary_structures: int = 5,
+		start_date=None,
+		seed: int = 42,
+	):
+		self.company = company
+		self.employee_count = cint(employees)
+		self.salary_structure_count = max(cint(salary_structures), 1)
+		self.start_date = get_first_day(start_date or getdate())
+		self.end_date = get_last_day(self.start_date)
+		self.random = random.Random(seed)
+
+		self.abbr = None
+		self.currency = None
+		self.holiday_list = None
+		self.holidays = set()
+		self.salary_structures = []
+		self.employees = []
+		# {employee: dates on leave}
+		self.leave_dates = {}
+		self.counts = {}
+
+	def generate(self) -> "SyntheticWorkforce":
+		self.make_company()
+		self.make_holiday_list()
+		self.make_salary_components()
+		self.make_salary_structures()
+		self.make_employees()
+		self.assign_salary_structures()
+		self.make_leave_applications()
+		self.make_attendance()
+		self.make_additional_salaries()
+		self.make_timesheets()
+		frappe.db.commit()  # nosemgrep
+
+		return self
+
+	def make_company(self):
+		self.abbr = "PB" + frappe.generate_hash(length=4).upper()
+		company = frappe.get_doc(
+			{
+				"doctype": "Company",
+				"company_name": self.company,
+				"abbr": self.abbr,
+				"default_currency": frappe.db.get_default("currency") or "INR",
+				"country": frappe.db.get_default("country") or "India",
+				"chart_of_accounts": "Standard",
+			}
+		).insert(ignore_permissions=True)
+
+		self.currency = company.default_currency
+
+	def make_holiday_list(self):
+		holiday_list = frappe.get_doc(
+			{
+				"doctype": "Holiday List",
+				"holiday_list_name": f"{self.company} Holidays",
+				"from_date": get_first_day(add_days(self.start_date, -366)),
+				"to_date": get_last_day(add_days(self.end_date, 366)),
+				"weekly_off": "Sunday",
+			}
+		)
+		holiday_list.get_weekly_off_dates()
+		holiday_list.insert(ignore_permissions=True)
+
+		self.holiday_list = holiday_list.name
+		self.holidays = {getdate(d.holiday_date) for d in holiday_list.holidays}
+		frappe.db.set_value("Company", self.company, "default_holiday_list", self.holiday_list)
+
+	def make_salary_components(self):
+		accounts = {
+			"Earning": self.make_account("Benchmark Salary", f"Indirect Expenses - {self.abbr}"),
+			"Deduction": self.make_account(
+				"Benchmark Salary Deductions", f"Current Liabilities - {self.abbr}"
+			),
+		}
+
+		for salary_component, abbr, component_type in SALARY_COMPONENTS:
+			if frappe.db.exists("Salary Component", salary_component):
+				doc = frappe.get_doc("Salary Component", salary_component)
+			else:
+				doc = frappe.new_doc("Salary Component")
+				doc.update(
+					{
+						"salary_component": salary_component,
+						"salary_component_abbr": abbr,
+						"type": component_type,
+						"depends_on_payment_days": 1,
+					}
+				)
+
+			doc.append("accounts", {"company": self.company, "account": accounts[component_type]})
+			doc.save(ignore_permissions=True)
+
+	def make_account(self, account_name: str, parent_account: str) -> str:
+		return (
+			frappe.get_doc(
+				{
+					"doctype": "Account",
+					"account_name": account_name,
+					"parent_account": parent_account,
+					"company": self.company,
+				}
+			)
+			.insert(ignore_permissions=True)
+			.name
+		)
+
+	def make_salary_structures(self):
+		for idx in range(self.salary_structure_count):
+			basic_ratio = 0.35 + 0.05 * (idx % 4)
+			earnings = [
+				{"salary_component": "Benchmark Basic", "formula": f"base * {basic_ratio}"},
+				{
+					"salary_component": "Benchmark HRA",
+					"formula": "BMB * 0.5 if employment_type == 'Full-time' else BMB * 0.4",
+				},
+				{"salary_component": "Benchmark Special Allowance", "formula": "max(base - BMB - BMH, 0)"},
+			]
+			deductions = [
+				{
+					"salary_component": "Benchmark Provident Fund",
+					"formula": "min(BMB, 15000) * 0.12",
+					"condition": "BMB > 0",
+				},
+				{
+					"salary_component": "Benchmark Professional Tax",
+					"formula": "200 if gross_pay > 20000 else 150",
+					"condition": "gross_pay > 15000",
+				},
+			]
+
+			salary_structure = frappe.get_doc(
+				{
+					"doctype": "Salary Structure",
+					"name": f"{self.company} Structure {idx + 1}",
+					"company": self.company,
+					"currency": self.currency,
+					"payroll_frequency": "Monthly",
+					"earnings": [dict(row, amount_based_on_formula=1) for row in earnings],
+					"deductions": [dict(row, amount_based_on_formula=1) for row in deductions],
+				}
+			)
+			salary_structure.insert(ignore_permissions=True)
+			salary_structure.submit()
+			self.salary_structures.append(salary_structure)
+
+	def make_employees(self):
+		for idx in range(self.employee_count):
+			employee = frappe.get_doc(
+				{
+					"doctype": "Employee",
+					"first_name": "Benchmark",
+					"last_name": f"{idx + 1:06d}",
+					"gender": self.random.choice(("Male", "Female")),
+					"date_of_birth": add_days(self.start_date, -self.random.randint(8000, 20000)),
+					"date_of_joining": add_days(self.start_date, -self.random.randint(30, 3000)),
+					"employment_type": self.random.choice(("Full-time", "Full-time", "Part-time")),
+					"company": self.company,
+					"holiday_list": self.holiday_list,
+					"status": "Active",
+				}
+			).insert(ignore_permissions=True)
+			self.employees.append(employee.name)
+
+		self.counts["employees"] = len(self.employees)
+
+	def assign_salary_structures(self):
+		employees_by_structure = {}
+		for idx, employee in enumerate(self.employees):
+			salary_structure = self.salary_structures[idx % len(self.salary_structures)]
+			employees_by_structure.setdefault(salary_structure.name, (salary_structure, []))[1].append(
+				employee
+			)
+
+		assigned = 0
+		for salary_structure, employees in employees_by_structure.values():
+			# employees of a structure share the base, which is varied across structures instead
+			result = BulkSalaryStructureAssignment(
+				salary_structure,
+				add_days(self.start_date, -30),
+				base=self.random.randrange(20000, 150000, 500),
+			).run(employees, publish_progress=False)
+			assigned += len(result.assigned)
+
+		self.counts["salary_structure_assignments"] = assigned
+
+	def make_leave_applications(self):
+		if not frappe.db.exists("Leave Type", LEAVE_TYPE):
+			frappe.get_doc(
+				{"doctype": "Leave Type", "leave_type_name": LEAVE_TYPE, "is_lwp": 1}
+			).insert(ignore_permissions=True)
+
+		working_days = self.get_working_days()
+		count = 0
+		for employee in self.sample(self.employees, 0.05):
+			from_date = self.random.choice(working_days[:-2])
+			leave_application = frappe.get_doc(
+				{
+					"doctype": "Leave Application",
+					"employee": employee,
+					"leave_type": LEAVE_TYPE,
+					"from_date": from_date,
+					"to_date": add_days(from_date, 1),
+					"status": "Approved",
+					"company": self.company,
+				}
+			)
+			leave_application.insert(ignore_permissions=True)
+			leave_application.submit()
+
+			self.leave_dates[employee] = {getdate(from_date), getdate(add_days(from_date, 1))}
+			count += 1
+
+		self.counts["leave_applications"] = count
+
+	def make_attendance(self):
+		working_days = self.get_working_days()
+		timestamp = now()
+		rows = []
+
+		for employee in self.employees:
+			leave_dates = self.leave_dates.get(employee, set())
+			for attendance_date in working_days:
+				if attendance_date in leave_dates:
+					continue
+
+				rows.append(
+					{
+						"name": frappe.generate_hash(length=12),
+						"owner": frappe.session.user,
+						"modified_by": frappe.session.user,
+						"creation": timestamp,
+						"modified": timestamp,
+						"docstatus": 1,
+						"employee": employee,
+						"attendance_date": attendance_date,
+						"status": self.random.choices(("Present", "Absent", "Half Day"), (94, 3, 3))[0],
+						"company": self.company,
+					}
+				)
+
+		if rows:
+			fields = list(rows[0])
+			frappe.db.bulk_insert("Attendance", fields, [[row[field] for field in fields] for row in rows])
+		self.counts["attendance"] = len(rows)
+
+	def make_additional_salaries(self):
+		count = 0
+		for employee in self.sample(self.employees, 0.1):
+			frappe.get_doc(
+				{
+					"doctype": "Additional Salary",
+					"employee": employee,
+					"company": self.company,
+					"salary_component": "Benchmark Overtime",
+					"type": "Earning",
+					"amount": self.random.randrange(500, 5000, 50),
+					"payroll_date": self.random.choice(self.get_working_days()),
+					"currency": self.currency,
+					"overwrite_salary_structure_amount": 0,
+				}
+			).submit()
+			count += 1
+
+		self.counts["additional_salaries"] = count
+
+	def make_timesheets(self):
+		if not frappe.db.exists("Activity Type", ACTIVITY_TYPE):
+			frappe.get_doc({"doctype": "Activity Type", "activity_type": ACTIVITY_TYPE}).insert(
+				ignore_permissions=True
+			)
+
+		working_days = self.get_working_days()
+		count = 0
+		for employee in self.sample(self.employees, 0.05):
+			frappe.get_doc(
+				{
+					"doctype": "Timesheet",
+					"employee": employee,
+					"company": self.company,
+					"time_logs": [
+						{
+							"activity_type": ACTIVITY_TYPE,
+							"from_time": get_datetime(f"{day} 09:00:00"),
+							"to_time": add_to_date(get_datetime(f"{day} 09:00:00"), hours=hours),
+							"hours": hours,
+						}
+						for day, hours in zip(
+							self.sample(working_days, 0.25), self.random.choices((2, 4, 8), k=len(working_days))
+						)
+					],
+				}
+			).submit()
+			count += 1
+
+		self.counts["timesheets"] = count
+
+	def get_working_days(self) -> list:
+		return [
+			getdate(add_days(self.start_date, i))
+			for i in range(date_diff(self.end_date, self.start_date) + 1)
+			if getdate(add_days(self.start_date, i)) not in self.holidays
+		]
+
+	def sample(self, population: list, share: float) -> list:
+		return self.random.sample(population, max(int(len(population) * share), 1))
+
+
+class PayrollBenchmark:
+	"""Runs a Payroll Entry for a generated workforce and measures each phase of it.
+
+	Phases run synchronously, in the order of `PHASES`. The accrual journal entry is made while
+	submitting salary slips, so it is measured on its own and excluded from the submission's numbers.
+	Emailing salary slips is left out of the benchmark.
+	"""
+
+	def __init__(self, workforce: SyntheticWorkforce, measure_memory: bool = True):
+		self.workforce = workforce
+		self.measure_memory = measure_memory
+		self.payroll_entry = None
+		self.phases = {}
+		self.queries = QueryCounter()
+
+	def run(self) -> dict:
+		with self.queries:
+			self.make_payroll_entry()
+
+			with self.measure("fill_employee_details"):
+				self.payroll_entry.fill_employee_details()
+				self.payroll_entry.save()
+
+			self.payroll_entry.db_set("docstatus", 1)
+			self.payroll_entry.reload()
+
+			with self.measure("create_salary_slips"):
+				create_salary_slips_for_employees(
+					[d.employee for d in self.payroll_entry.employees],
+					self.payroll_entry.get_salary_slip_args(),
+					publish_progress=False,
+				)
+			self.raise_on_failure()
+
+			self.payroll_entry.reload()
+			self.payroll_entry.make_accrual_jv_entry = self.measured(
+				"make_accrual_jv_entry", self.payroll_entry.make_accrual_jv_entry
+			)
+			self.payroll_entry.email_salary_slip = lambda submitted: None
+			with self.measure("submit_salary_slips"):
+				submit_salary_slips_for_employees(
+					self.payroll_entry,
+					self.payroll_entry.get_sal_slip_list(ss_status=0),
+					publish_progress=False,
+				)
+			self.raise_on_failure()
+			self.exclude_from_phase("submit_salary_slips", "make_accrual_jv_entry")
+
+			self.payroll_entry.reload()
+			with self.measure("make_payment_entry"):
+				self.payroll_entry.make_payment_entry()
+
+		frappe.db.commit()  # nosemgrep
+		return self.get_result()
+
+	def make_payroll_entry(self):
+		company = frappe.get_cached_doc("Company", self.workforce.company)
+
+		self.payroll_entry = frappe.get_doc(
+			{
+				"doctype": "Payroll Entry",
+				"company": company.name,
+				"posting_date": self.workforce.end_date,
+				"start_date": self.workforce.start_date,
+				"end_date": self.workforce.end_date,
+				"payroll_frequency": "Monthly",
+				"currency": company.default_currency,
+				"exchange_rate": 1,
+				"payroll_payable_account": company.default_payroll_payable_account,
+				"cost_center": company.cost_center,
+				"payment_account": company.default_cash_account,
+			}
+		).insert(ignore_permissions=True)
+		frappe.db.commit()  # nosemgrep
+
+	def raise_on_failure(self):
+		if error_message := frappe.db.get_value(
+			"Payroll Entry", self.payroll_entry.name, "error_message"
+		):
+			frappe.throw(error_message, title="Payroll Benchmark Failed")
+
+	@contextmanager
+	def measure(self, phase: str):
+		queries = self.queries.count
+		if self.measure_memory:
+			tracemalloc.start()
+		started = time.perf_counter()
+
+		try:
+			yield
+		finally:
+			self.phases[phase] = {
+				"wall_time": round(time.perf_counter() - started, 4),
+				"queries": self.queries.count - queries,
+				"peak_memory": tracemalloc.get_traced_memory()[1] if self.measure_memory else None,
+			}
+			if self.measure_memory:
+				tracemalloc.stop()
+
+	def measured(self, phase: str, method):
+		"""Returns the method measuring its calls as a phase, for phases run by other phases"""
+
+		def wrapper(*args, **kwargs):
+			queries = self.queries.count
+			started = time.perf_counter()
+			try:
+				return method(*args, **kwargs)
+			finally:
+				self.phases[phase] = {
+					"wall_time": round(time.perf_counter() - started, 4),
+					"queries": self.queries.count - queries,
+					"peak_memory": None,
+				}
+
+		return wrapper
+
+	def exclude_from_phase(self, phase: str, nested_phase: str):
+		if nested_phase not in self.phases:
+			return
+
+		self.phases[phase]["wall_time"] = round(
+			self.phases[phase]["wall_time"] - self.phases[nested_phase]["wall_time"], 4
+		)
+		self.phases[phase]["queries"] -= self.phases[nested_phase]["queries"]
+		# the nested phase's memory was traced as part of the outer phase
+		self.phases[nested_phase]["peak_memory"] = self.phases[phase]["peak_memory"]
+
+	def get_result(self) -> dict:
+		return {
+			"timestamp": now(),
+			"versions": {app: get_app_version(app) for app in frappe.get_installed_apps()},
+			"payroll_entry": self.payroll_entry.name,
+			"workforce": {
+				"company": self.workforce.company,
+				"start_date": str(self.workforce.start_date),
+				"end_date": str(self.workforce.end_date),
+				"salary_structures": len(self.workforce.salary_structures),
+				**self.workforce.counts,
+			},
+			"phases": {phase: self.phases.get(phase) for phase in PHASES},
+			"total": {
+				"wall_time": round(sum(d["wall_time"] for d in self.phases.values()), 4),
+				"queries": sum(d["queries"] for d in self.phases.values()),
+			},
+		}
+
+
+def run_payroll_benchmark(
+	employees: int = 100,
+	salary_structures: int = 5,
+	start_date=None,
+	company: str | None = None,
+	seed: int = 42,
+	measure_memory: bool = True,
+) -> dict:
+	frappe.set_user("Administrator")
+	company = company or f"Payroll Benchmark {frappe.generate_hash(length=5)}"
+	if frappe.db.exists("Company", company):
+		frappe.throw(f"Company {company} already exists, the benchmark needs a new company")
+
+	workforce = SyntheticWorkforce(
+		company,
+		employees=employees,
+		salary_structures=salary_structures,
+		start_date=start_date,
+		seed=seed,
+	).generate()
+
+	return PayrollBenchmark(workforce, measure_memory=measure_memory).run()
+
+
+def compare_results(result: dict, baseline: dict) -> list[tuple]:
+	"""Returns (phase, metric, baseline, current, change in percent) for each measured metric"""
+	comparison = []
+	for phase in PHASES + ("total",):
+		current = result["phases"].get(phase) if phase != "total" else result["total"]
+		previous = baseline["phases"].get(phase) if phase != "total" else baseline["total"]
+		if not current or not previous:
+			continue
+
+		for metric in ("wall_time", "queries", "peak_memory"):
+			if current.get(metric) is None or previous.get(metric) is None:
+				continue
+
+			change = None
+			if previous[metric]:
+				change = round((current[metric] - previous[metric]) * 100 / previous[metric], 2)
+			comparison.append((phase, metric, previous[metric], current[metric], change))
+
+	return comparison
+
+
+def get_app_version(app: str) -> str | None:
+	try:
+		return frappe.get_attr(f"{app}.__version__")
+	except Exception:
+		return None
+
+
+def dump_result(result: dict, path: str) -> None:
+	with open(path, "w") as f:
+		json.dump(result, f, indent=1, default=str)
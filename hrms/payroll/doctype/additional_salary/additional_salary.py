@@ -14,10 +14,17 @@ class AdditionalSalary(Document):
 	def on_submit(self):
 		self.update_return_amount_in_employee_advance()
 		self.update_employee_referral()
+		self.mark_salary_slips_as_stale()
 
 	def on_cancel(self):
 		self.update_return_amount_in_employee_advance()
 		self.update_employee_referral(cancel=True)
+		self.mark_salary_slips_as_stale()
+
+	def mark_salary_slips_as_stale(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip import mark_salary_slips_as_stale
+
+		mark_salary_slips_as_stale(self)
 
 	def validate(self):
 		validate_active_employee(self.employee)
@@ -146,19 +153,63 @@ class AdditionalSalary(Document):
 			self.validate_recurring_additional_salary_overlap()
 
 
-def get_additional_salaries(employee, start_date, end_date, component_type):
-	from frappe.query_builder import Criterion
+def get_additional_salaries(
+	employee, start_date, end_date, component_type, additional_salary_list=None
+):
+	"""Returns additional salaries of the employee for the component type within the dates.
+	`additional_salary_list` can be passed if the records were already fetched,
+	eg: by `get_additional_salaries_for_employees`"""
+	if additional_salary_list is None:
+		comp_type = "Earning" if component_type == "earnings" else "Deduction"
+		additional_salary_list = get_additional_salary_records(
+			[employee], start_date, end_date, comp_type
+		)
+
+	additional_salaries = []
+	components_to_overwrite = []
+
+	for d in additional_salary_list:
+		if d.overwrite:
+			if d.component in components_to_overwrite:
+				frappe.throw(
+					_(
+						"Multiple Additional Salaries with overwrite property exist for Salary Component {0} between {1} and {2}."
+					).format(frappe.bold(d.component), start_date, end_date),
+					title=_("Error"),
+				)
+
+			components_to_overwrite.append(d.component)
+
+		additional_salaries.append(d)
+
+	return additional_salaries
 
-	comp_type = "Earning" if component_type == "earnings" else "Deduction"
+
+def get_additional_salaries_for_employees(employees: list[str], start_date, end_date) -> dict:
+	"""Returns additional salaries of the employees within the dates,
+	indexed by employee and component type (earnings/deductions)"""
+	additional_salaries = {}
+	for d in get_additional_salary_records(employees, start_date, end_date):
+		component_type = "earnings" if d.type == "Earning" else "deductions"
+		additional_salaries.setdefault((d.employee, component_type), []).append(d)
+
+	return additional_salaries
+
+
+def get_additional_salary_records(
+	employees: list[str], start_date, end_date, comp_type: str | None = None
+) -> list[dict]:
+	from frappe.query_builder import Criterion
 
 	additional_sal = frappe.qb.DocType("Additional Salary")
 	component_field = additional_sal.salary_component.as_("component")
 	overwrite_field = additional_sal.overwrite_salary_structure_amount.as_("overwrite")
 
-	additional_salary_list = (
+	query = (
 		frappe.qb.from_(additional_sal)
 		.select(
 			additional_sal.name,
+			additional_sal.employee,
 			component_field,
 			additional_sal.type,
 			additional_sal.amount,
@@ -167,9 +218,8 @@ def get_additional_salaries(employee, start_date, end_date, component_type):
 			additional_sal.deduct_full_tax_on_selected_payroll_date,
 		)
 		.where(
-			(additional_sal.employee == employee)
+			(additional_sal.employee.isin(employees))
 			& (additional_sal.docstatus == 1)
-			& (additional_sal.type == comp_type)
 			& (additional_sal.disabled == 0)
 		)
 		.where(
@@ -191,24 +241,9 @@ def get_additional_salaries(employee, start_date, end_date, component_type):
 				]
 			)
 		)
-		.run(as_dict=True)
 	)
 
-	additional_salaries = []
-	components_to_overwrite = []
-
-	for d in additional_salary_list:
-		if d.overwrite:
-			if d.component in components_to_overwrite:
-				frappe.throw(
-					_(
-						"Multiple Additional Salaries with overwrite property exist for Salary Component {0} between {1} and {2}."
-					).format(frappe.bold(d.component), start_date, end_date),
-					title=_("Error"),
-				)
-
-			components_to_overwrite.append(d.component)
-
-		additional_salaries.append(d)
+	if comp_type:
+		query = query.where(additional_sal.type == comp_type)
 
-	return additional_salaries
\ No newline at end of file
+	return query.run(as_dict=True)
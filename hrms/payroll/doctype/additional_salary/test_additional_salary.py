@@ -109,6 +109,30 @@ class TestAdditionalSalary(FrappeTestCase):
 		self.assertIsNone(amount)
 		self.assertIsNone(salary_component)
 
+	def test_additional_salaries_for_employees(self):
+		from hrms.payroll.doctype.additional_salary.additional_salary import (
+			get_additional_salaries,
+			get_additional_salaries_for_employees,
+		)
+
+		date = nowdate()
+		emp_id = make_employee("test_additional@salary.com")
+		other_emp_id = make_employee("test_additional_other@salary.com")
+		add_sal = get_additional_salary(emp_id, recurring=False, payroll_date=date)
+
+		start_date, end_date = add_days(date, -1), add_days(date, 1)
+		additional_salaries = get_additional_salaries_for_employees(
+			[emp_id, other_emp_id], start_date, end_date
+		)
+
+		self.assertEqual([d.name for d in additional_salaries[(emp_id, "earnings")]], [add_sal.name])
+		self.assertNotIn((emp_id, "deductions"), additional_salaries)
+		self.assertNotIn((other_emp_id, "earnings"), additional_salaries)
+		self.assertEqual(
+			additional_salaries[(emp_id, "earnings")],
+			get_additional_salaries(emp_id, start_date, end_date, "earnings"),
+		)
+
 
 def get_additional_salary(emp_id, recurring=True, payroll_date=None):
 	create_salary_component("Recurring Salary Component")
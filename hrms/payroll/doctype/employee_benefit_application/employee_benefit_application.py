@@ -256,8 +256,16 @@ def calculate_lwp(employee, start_date, holidays, working_days):
 
 
 def get_benefit_component_amount(
-	employee, start_date, end_date, salary_component, sal_struct, payroll_frequency, payroll_period
+	employee,
+	start_date,
+	end_date,
+	salary_component,
+	sal_struct,
+	payroll_frequency,
+	payroll_period,
+	benefit_applications=None,
 ):
+	"""`benefit_applications` can be passed if they were already fetched using `get_benefit_applications`"""
 	if not payroll_period:
 		frappe.msgprint(
 			_("Start and end dates not in a valid Payroll Period, cannot calculate {0}").format(
@@ -266,31 +274,17 @@ def get_benefit_component_amount(
 		)
 		return False
 
-	# Considering there is only one application for a year
-	benefit_application = frappe.db.sql(
-		"""
-		select name
-		from `tabEmployee Benefit Application`
-		where
-			payroll_period=%(payroll_period)s
-			and employee=%(employee)s
-			and docstatus = 1
-	""",
-		{"employee": employee, "payroll_period": payroll_period.name},
-	)
+	if benefit_applications is None:
+		benefit_applications = get_benefit_applications([employee], payroll_period.name)
 
 	current_benefit_amount = 0.0
-	component_max_benefit, depends_on_payment_days = frappe.db.get_value(
+	component_max_benefit, depends_on_payment_days = frappe.get_cached_value(
 		"Salary Component", salary_component, ["max_benefit_amount", "depends_on_payment_days"]
 	)
 
 	benefit_amount = 0
-	if benefit_application:
-		benefit_amount = frappe.db.get_value(
-			"Employee Benefit Application Detail",
-			{"parent": benefit_application[0][0], "earning_component": salary_component},
-			"amount",
-		)
+	if employee in benefit_applications:
+		benefit_amount = benefit_applications[employee].get(salary_component)
 	elif component_max_benefit:
 		benefit_amount = get_benefit_amount_based_on_pro_rata(sal_struct, component_max_benefit)
 
@@ -305,6 +299,46 @@ def get_benefit_component_amount(
 	return current_benefit_amount
 
 
+def get_benefit_applications(employees: list[str], payroll_period: str) -> dict:
+	"""Returns benefit amounts of the employees' submitted applications for the payroll period,
+	as {employee: {earning component: amount}}. Employees without an application are not included"""
+	Application = frappe.qb.DocType("Employee Benefit Application")
+	ApplicationDetail = frappe.qb.DocType("Employee Benefit Application Detail")
+
+	applications = (
+		frappe.qb.from_(Application)
+		.left_join(ApplicationDetail)
+		.on(
+			(ApplicationDetail.parent == Application.name)
+			& (ApplicationDetail.parenttype == "Employee Benefit Application")
+		)
+		.select(
+			Application.employee,
+			Application.name,
+			ApplicationDetail.earning_component,
+			ApplicationDetail.amount,
+		)
+		.where(
+			(Application.employee.isin(employees))
+			& (Application.payroll_period == payroll_period)
+			& (Application.docstatus == 1)
+		)
+		.orderby(Application.creation)
+	).run(as_dict=True)
+
+	benefit_applications, application_names = {}, {}
+	for d in applications:
+		# considering there is only one application for a year
+		if application_names.setdefault(d.employee, d.name) != d.name:
+			continue
+
+		amounts = benefit_applications.setdefault(d.employee, {})
+		if d.earning_component:
+			amounts.setdefault(d.earning_component, d.amount)
+
+	return benefit_applications
+
+
 def get_benefit_amount_based_on_pro_rata(sal_struct, component_max_benefit):
 	max_benefits_total = 0
 	benefit_amount = 0
@@ -5,6 +5,7 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.query_builder.functions import Sum
 from frappe.utils import flt
 
 from hrms.hr.utils import get_previous_claimed_amount, validate_active_employee
@@ -162,6 +163,38 @@ def get_benefit_claim_amount(employee, start_date, end_date, salary_component=No
 	return claimed_amount
 
 
+def get_benefit_claim_amounts(
+	employees: list[str], start_date, end_date, pay_against_benefit_claim: int | None = None
+) -> dict:
+	"""Returns amounts claimed by the employees within the dates,
+	as {employee: {earning component: amount}}"""
+	BenefitClaim = frappe.qb.DocType("Employee Benefit Claim")
+
+	query = (
+		frappe.qb.from_(BenefitClaim)
+		.select(
+			BenefitClaim.employee,
+			BenefitClaim.earning_component,
+			Sum(BenefitClaim.claimed_amount).as_("claimed_amount"),
+		)
+		.where(
+			(BenefitClaim.employee.isin(employees))
+			& (BenefitClaim.docstatus == 1)
+			& (BenefitClaim.claim_date.between(start_date, end_date))
+		)
+		.groupby(BenefitClaim.employee, BenefitClaim.earning_component)
+	)
+
+	if pay_against_benefit_claim is not None:
+		query = query.where(BenefitClaim.pay_against_benefit_claim == pay_against_benefit_claim)
+
+	claimed_amounts = {}
+	for d in query.run(as_dict=True):
+		claimed_amounts.setdefault(d.employee, {})[d.earning_component] = flt(d.claimed_amount)
+
+	return claimed_amounts
+
+
 def get_total_benefit_dispensed(employee, sal_struct, sal_slip_start_date, payroll_period):
 	pro_rata_amount = 0
 	claimed_amount = 0
@@ -1,14 +1,224 @@
 # Copyright (c) 2020, Frappe Technologies Pvt. Ltd. and contributors
 # For license information, please see license.txt
 
+from bisect import bisect_right
+from datetime import date
 
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cstr, flt, getdate
 
-# import frappe
 import erpnext
 
+from hrms.payroll.utils import compile_expression, get_referenced_names, safe_eval_compiled
+
 
 class IncomeTaxSlab(Document):
 	def validate(self):
 		if self.company:
 			self.currency = erpnext.get_company_currency(self.company)
+
+
+class IncomeTaxSlabEvaluator:
+	"""Calculates income tax for an Income Tax Slab.
+
+	Slabs without conditions add up to a piecewise linear function of the annual taxable earning,
+	so the tax at each slab boundary and the rate up to the next boundary are computed upfront and
+	looked up by bisecting the boundaries. Slab conditions are compiled once and evaluated per call.
+	"""
+
+	def __init__(self, tax_slab):
+		self.slabs = [
+			frappe._dict(
+				from_amount=flt(slab.from_amount),
+				to_amount=flt(slab.to_amount),
+				percent_deduction=flt(slab.percent_deduction),
+				condition=cstr(slab.condition).strip(),
+			)
+			for slab in tax_slab.slabs
+		]
+		self.other_taxes_and_charges = [
+			frappe._dict(
+				percent=flt(d.percent),
+				min_taxable_income=flt(d.min_taxable_income),
+				max_taxable_income=flt(d.max_taxable_income),
+			)
+			for d in tax_slab.other_taxes_and_charges
+		]
+
+		self.conditional_slabs = []
+		# names read by slab conditions, to be made available to them while calculating
+		self.referenced_names = set()
+		for slab in self.slabs:
+			if not slab.condition:
+				continue
+
+			slab.compiled_condition = compile_tax_slab_condition(slab.condition)
+			referenced_names = get_referenced_names(slab.condition)
+			# conditions not depending on the earning are evaluated once per batch
+			slab.depends_on_earning = "annual_taxable_earning" in referenced_names
+			self.referenced_names |= referenced_names
+			self.conditional_slabs.append(slab)
+
+		self.set_boundaries()
+
+	def set_boundaries(self):
+		slabs = [slab for slab in self.slabs if not slab.condition]
+
+		self.boundaries = sorted(
+			{slab.from_amount for slab in slabs} | {slab.to_amount for slab in slabs if slab.to_amount}
+		)
+		# tax at each boundary and the rate at which it grows till the next one
+		self.boundary_taxes = [
+			sum(get_slab_tax(slab, boundary) for slab in slabs) for boundary in self.boundaries
+		]
+		self.boundary_rates = [
+			sum(get_slab_rate(slab, boundary) for slab in slabs) for boundary in self.boundaries
+		]
+
+	def calculate(self, annual_taxable_earning, eval_globals=None, eval_locals=None) -> float:
+		if eval_locals is None:
+			eval_locals = {}
+
+		eval_locals.update({"annual_taxable_earning": annual_taxable_earning})
+		applicable_slabs = self.get_applicable_conditional_slabs(eval_globals, eval_locals)
+
+		return self._calculate(annual_taxable_earning, applicable_slabs, eval_globals, eval_locals)
+
+	def calculate_batch(
+		self, annual_taxable_earnings: list, eval_globals=None, eval_locals: dict | list | None = None
+	) -> list[float]:
+		"""Returns the tax for each annual taxable earning.
+
+		Args:
+		        annual_taxable_earnings (list): annual taxable earnings to calculate tax for
+		        eval_locals (dict, list): locals for slab conditions, shared by all earnings or one per earning
+		"""
+		if isinstance(eval_locals, list):
+			return [
+				self.calculate(earning, eval_globals, locals_)
+				for earning, locals_ in zip(annual_taxable_earnings, eval_locals)
+			]
+
+		eval_locals = dict(eval_locals or {})
+		if annual_taxable_earnings:
+			eval_locals["annual_taxable_earning"] = annual_taxable_earnings[0]
+		shared_slabs = self.get_applicable_conditional_slabs(
+			eval_globals, eval_locals, depends_on_earning=False
+		)
+
+		taxes = []
+		for earning in annual_taxable_earnings:
+			eval_locals["annual_taxable_earning"] = earning
+			applicable_slabs = shared_slabs + self.get_applicable_conditional_slabs(
+				eval_globals, eval_locals, depends_on_earning=True
+			)
+			taxes.append(self._calculate(earning, applicable_slabs, eval_globals, eval_locals))
+
+		return taxes
+
+	def get_applicable_conditional_slabs(
+		self, eval_globals, eval_locals, depends_on_earning: bool | None = None
+	) -> list:
+		return [
+			slab
+			for slab in self.conditional_slabs
+			if (depends_on_earning is None or slab.depends_on_earning == depends_on_earning)
+			and eval_compiled_tax_slab_condition(slab, eval_globals, eval_locals)
+		]
+
+	def _calculate(self, annual_taxable_earning, applicable_slabs, eval_globals, eval_locals) -> float:
+		annual_taxable_earning = flt(annual_taxable_earning)
+		tax_amount = 0
+
+		idx = bisect_right(self.boundaries, annual_taxable_earning) - 1
+		if idx >= 0:
+			tax_amount += self.boundary_taxes[idx] + self.boundary_rates[idx] * (
+				annual_taxable_earning - self.boundaries[idx]
+			)
+
+		for slab in applicable_slabs:
+			tax_amount += get_slab_tax(slab, annual_taxable_earning)
+
+		# other taxes and charges on income tax
+		for d in self.other_taxes_and_charges:
+			if d.min_taxable_income and d.min_taxable_income > annual_taxable_earning:
+				continue
+
+			if d.max_taxable_income and d.max_taxable_income < annual_taxable_earning:
+				continue
+
+			tax_amount += tax_amount * d.percent / 100
+
+		return tax_amount
+
+
+def get_slab_tax(slab, annual_taxable_earning) -> float:
+	if annual_taxable_earning < slab.from_amount:
+		return 0
+
+	if not slab.to_amount or annual_taxable_earning < slab.to_amount:
+		return (annual_taxable_earning - slab.from_amount + 1) * slab.percent_deduction * 0.01
+
+	return (slab.to_amount - slab.from_amount + 1) * slab.percent_deduction * 0.01
+
+
+def get_slab_rate(slab, annual_taxable_earning) -> float:
+	"""Returns the rate at which the slab's tax grows with the earning"""
+	if annual_taxable_earning < slab.from_amount:
+		return 0
+
+	if not slab.to_amount or annual_taxable_earning < slab.to_amount:
+		return slab.percent_deduction * 0.01
+
+	return 0
+
+
+def compile_tax_slab_condition(condition):
+	try:
+		return compile_expression(condition)
+	except SyntaxError as err:
+		frappe.throw(_("Syntax error in condition: {0} in Income Tax Slab").format(err))
+
+
+def eval_compiled_tax_slab_condition(slab, eval_globals=None, eval_locals=None):
+	if not eval_globals:
+		eval_globals = {
+			"int": int,
+			"float": float,
+			"long": int,
+			"round": round,
+			"date": date,
+			"getdate": getdate,
+		}
+
+	try:
+		return safe_eval_compiled(slab.compiled_condition, eval_globals, eval_locals)
+	except NameError as err:
+		frappe.throw(
+			_("{0} <br> This error can be due to missing or deleted field.").format(err),
+			title=_("Name error"),
+		)
+	except Exception as e:
+		frappe.throw(_("Error in formula or condition: {0} in Income Tax Slab").format(e))
+		raise
+
+
+# {(site, income tax slab): (modified, evaluator)}
+_evaluator_cache = {}
+
+
+def get_income_tax_slab_evaluator(tax_slab) -> IncomeTaxSlabEvaluator:
+	"""Returns the evaluator for the Income Tax Slab, built once per saved version of the slab"""
+	if not tax_slab.get("name") or not tax_slab.get("modified"):
+		return IncomeTaxSlabEvaluator(tax_slab)
+
+	key = (frappe.local.site, tax_slab.name)
+	modified = cstr(tax_slab.modified)
+
+	cached = _evaluator_cache.get(key)
+	if not cached or cached[0] != modified:
+		cached = _evaluator_cache[key] = (modified, IncomeTaxSlabEvaluator(tax_slab))
+
+	return cached[1]
@@ -1,9 +1,64 @@
 # Copyright (c) 2020, Frappe Technologies Pvt. Ltd. and Contributors
 # See license.txt
 
-# import frappe
-import unittest
+import frappe
+from frappe.tests.utils import FrappeTestCase
 
+from hrms.payroll.doctype.income_tax_slab.income_tax_slab import IncomeTaxSlabEvaluator
 
-class TestIncomeTaxSlab(unittest.TestCase):
-	pass
+
+class TestIncomeTaxSlab(FrappeTestCase):
+	def get_tax_slab(self, slabs, other_taxes_and_charges=None):
+		return frappe._dict(
+			slabs=[frappe._dict(slab) for slab in slabs],
+			other_taxes_and_charges=[frappe._dict(d) for d in other_taxes_and_charges or []],
+		)
+
+	def test_tax_for_unconditional_slabs(self):
+		tax_slab = self.get_tax_slab(
+			[
+				{"from_amount": 250000, "to_amount": 500000, "percent_deduction": 5},
+				{"from_amount": 500001, "to_amount": 1000000, "percent_deduction": 20},
+				{"from_amount": 1000001, "percent_deduction": 30},
+			],
+			[{"percent": 4}],
+		)
+		evaluator = IncomeTaxSlabEvaluator(tax_slab)
+
+		def expected_tax(earning):
+			tax = 0
+			if earning >= 250000:
+				tax += (earning - 250000 + 1) * 0.05 if earning < 500000 else 250001 * 0.05
+			if earning >= 500001:
+				tax += (earning - 500001 + 1) * 0.2 if earning < 1000000 else 500000 * 0.2
+			if earning >= 1000001:
+				tax += (earning - 1000001 + 1) * 0.3
+			return tax * 1.04
+
+		earnings = [0, 249999, 250000, 400000, 500000, 500001, 999999, 1000000, 1500000]
+		taxes = evaluator.calculate_batch(earnings)
+
+		for earning, tax in zip(earnings, taxes):
+			self.assertAlmostEqual(tax, expected_tax(earning), places=6)
+			self.assertAlmostEqual(evaluator.calculate(earning), tax, places=6)
+
+	def test_tax_for_conditional_slabs(self):
+		tax_slab = self.get_tax_slab(
+			[
+				{"from_amount": 0, "to_amount": 500000, "percent_deduction": 10},
+				{"from_amount": 0, "percent_deduction": 10, "condition": "age > 60"},
+				{
+					"from_amount": 0,
+					"percent_deduction": 5,
+					"condition": "annual_taxable_earning > 1000000",
+				},
+			]
+		)
+		evaluator = IncomeTaxSlabEvaluator(tax_slab)
+
+		self.assertAlmostEqual(evaluator.calculate(100000, eval_locals={"age": 30}), 10000.1)
+		self.assertAlmostEqual(evaluator.calculate(100000, eval_locals={"age": 65}), 20000.2)
+
+		taxes = evaluator.calculate_batch([100000, 2000000], eval_locals={"age": 30})
+		self.assertAlmostEqual(taxes[0], 10000.1)
+		self.assertAlmostEqual(taxes[1], 50000.1 + 100000.05)
@@ -0,0 +1,155 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+from bisect import bisect_left, bisect_right
+
+import frappe
+from frappe import _
+from frappe.query_builder.functions import Coalesce, Count
+from frappe.utils import date_diff, getdate
+
+CSV_COLUMNS = {
+	"employee": "Employee",
+	"employee_name": "Employee Name",
+	"holiday_list": "Holiday List",
+	"payroll_days": "Payroll Days",
+	"holidays": "Holidays",
+	"working_days": "Working Days",
+	"marked_days": "Marked Days",
+	"unmarked_days": "Unmarked Days",
+}
+
+
+class AttendancePrecheck:
+	"""Checks whether attendance is marked for the employees of a Payroll Entry.
+
+	Attendance is counted for all employees with one grouped query and holidays of all their holiday
+	lists are loaded with another, so working, marked and unmarked days of each employee are computed
+	with lookups instead of queries per employee or holiday list.
+	"""
+
+	def __init__(self, payroll_entry):
+		self.company = payroll_entry.company
+		self.start_date = getdate(payroll_entry.start_date)
+		self.end_date = getdate(payroll_entry.end_date)
+		self.employees = [
+			frappe._dict(employee=d.employee, employee_name=d.employee_name)
+			for d in payroll_entry.employees
+		]
+
+		# {holiday list: sorted holiday dates within the payroll period}
+		self.holidays = {}
+
+	def run(self) -> list[dict]:
+		"""Returns working, marked and unmarked days of each employee in the entry's order"""
+		if not self.employees:
+			return []
+
+		employee_details = self.get_employee_and_attendance_details()
+		self.load_holidays({d.holiday_list for d in employee_details.values() if d.holiday_list})
+
+		result = []
+		for emp in self.employees:
+			if details := employee_details.get(emp.employee):
+				result.append(self.get_attendance_summary(emp, details))
+
+		return result
+
+	def get_unmarked_attendance(self) -> list[dict]:
+		return [d for d in self.run() if d.unmarked_days > 0]
+
+	def get_page(self, start: int = 0, page_length: int = 20, only_unmarked: bool = True) -> dict:
+		"""Returns a page of the result along with the number of employees in it"""
+		result = self.get_unmarked_attendance() if only_unmarked else self.run()
+		return {
+			"data": result[start : start + page_length],
+			"total": len(result),
+			"start": start,
+			"page_length": page_length,
+		}
+
+	def get_csv_rows(self, only_unmarked: bool = False) -> list[list]:
+		result = self.get_unmarked_attendance() if only_unmarked else self.run()
+		rows = [[_(label) for label in CSV_COLUMNS.values()]]
+		rows.extend([d.get(field) for field in CSV_COLUMNS] for d in result)
+
+		return rows
+
+	def get_attendance_summary(self, emp: dict, details: dict) -> frappe._dict:
+		start_date, end_date = self.get_payroll_dates_for_employee(details)
+		payroll_days = date_diff(end_date, start_date) + 1
+		holidays = self.get_holidays_count(details.holiday_list, start_date, end_date)
+
+		return frappe._dict(
+			employee=emp.employee,
+			employee_name=emp.employee_name,
+			holiday_list=details.holiday_list,
+			payroll_days=payroll_days,
+			holidays=holidays,
+			working_days=payroll_days - holidays,
+			marked_days=details.attendance_count,
+			unmarked_days=payroll_days - (holidays + details.attendance_count),
+		)
+
+	def get_employee_and_attendance_details(self) -> dict:
+		default_holiday_list = frappe.db.get_value(
+			"Company", self.company, "default_holiday_list", cache=True
+		)
+
+		Employee = frappe.qb.DocType("Employee")
+		Attendance = frappe.qb.DocType("Attendance")
+
+		details = (
+			frappe.qb.from_(Employee)
+			.left_join(Attendance)
+			.on(
+				(Employee.name == Attendance.employee)
+				& (Attendance.attendance_date.between(self.start_date, self.end_date))
+				& (Attendance.docstatus == 1)
+			)
+			.select(
+				Employee.name,
+				Employee.date_of_joining,
+				Employee.relieving_date,
+				Coalesce(Employee.holiday_list, default_holiday_list).as_("holiday_list"),
+				Count(Attendance.name).as_("attendance_count"),
+			)
+			.where(Employee.name.isin([emp.employee for emp in self.employees]))
+			.groupby(Employee.name)
+		).run(as_dict=True)
+
+		return {d.name: d for d in details}
+
+	def load_holidays(self, holiday_lists: set[str]) -> None:
+		self.holidays = {holiday_list: [] for holiday_list in holiday_lists}
+		if not holiday_lists:
+			return
+
+		Holiday = frappe.qb.DocType("Holiday")
+		holidays = (
+			frappe.qb.from_(Holiday)
+			.select(Holiday.parent, Holiday.holiday_date)
+			.where(
+				(Holiday.parent.isin(list(holiday_lists)))
+				& (Holiday.holiday_date.between(self.start_date, self.end_date))
+			)
+			.orderby(Holiday.holiday_date)
+		).run(as_dict=True)
+
+		for holiday in holidays:
+			self.holidays[holiday.parent].append(getdate(holiday.holiday_date))
+
+	def get_holidays_count(self, holiday_list: str, start_date, end_date) -> int:
+		holidays = self.holidays.get(holiday_list) or []
+		return bisect_right(holidays, getdate(end_date)) - bisect_left(holidays, getdate(start_date))
+
+	def get_payroll_dates_for_employee(self, employee_details: dict) -> tuple:
+		start_date = self.start_date
+		if employee_details.date_of_joining and getdate(employee_details.date_of_joining) > start_date:
+			start_date = getdate(employee_details.date_of_joining)
+
+		end_date = self.end_date
+		if employee_details.relieving_date and getdate(employee_details.relieving_date) < end_date:
+			end_date = getdate(employee_details.relieving_date)
+
+		return start_date, end_date
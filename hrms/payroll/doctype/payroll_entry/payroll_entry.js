@@ -99,6 +99,10 @@ frappe.ui.form.on('Payroll Entry', {
 		frappe.realtime.on("completed_salary_slip_submission", function() {
 			frm.reload_doc();
 		});
+
+		frappe.realtime.on("completed_salary_slip_refresh", function() {
+			frm.reload_doc();
+		});
 	},
 
 	get_employee_details: function (frm) {
@@ -142,6 +146,14 @@ frappe.ui.form.on('Payroll Entry', {
 		if (frm.doc.salary_slips_submitted || (frm.doc.__onload && frm.doc.__onload.submitted_ss)) {
 			frm.events.add_bank_entry_button(frm);
 		} else if (frm.doc.salary_slips_created && frm.doc.status != 'Queued') {
+			frm.add_custom_button(__("Refresh Stale Salary Slips"), function () {
+				frm.call({
+					method: "refresh_stale_salary_slips",
+					doc: frm.doc,
+					freeze: true,
+					freeze_message: __("Refreshing Salary Slips..."),
+				});
+			});
 			frm.add_custom_button(__("Submit Salary Slip"), function () {
 				submit_salary_slip(frm);
 			}).addClass("btn-primary");
@@ -347,7 +359,7 @@ frappe.ui.form.on('Payroll Entry', {
 	validate_attendance: function (frm) {
 		if (frm.doc.validate_attendance && (frm.doc.employees?.length > 0)) {
 			frappe.call({
-				method: 'get_employees_with_unmarked_attendance',
+				method: 'get_attendance_precheck',
 				args: {},
 				callback: function (r) {
 					render_employee_attendance(frm, r.message);
@@ -419,10 +431,34 @@ let make_bank_entry = function (frm) {
 	}
 };
 
-let render_employee_attendance = function (frm, data) {
+let render_employee_attendance = function (frm, precheck) {
+	if (!precheck) return;
+
+	const wrapper = frm.fields_dict.attendance_detail_html.$wrapper;
 	frm.fields_dict.attendance_detail_html.html(
 		frappe.render_template('employees_with_unmarked_attendance', {
-			data: data
+			data: precheck.data,
+			total: precheck.total,
+			start: precheck.start,
+			can_download: !frm.is_new()
 		})
 	);
-};
\ No newline at end of file
+
+	const get_page = (start) => {
+		frappe.call({
+			method: 'get_attendance_precheck',
+			args: { start: start, page_length: precheck.page_length },
+			doc: frm.doc,
+			callback: (r) => render_employee_attendance(frm, r.message)
+		});
+	};
+
+	wrapper.find('.btn-prev-page').on('click', () => get_page(Math.max(precheck.start - precheck.page_length, 0)));
+	wrapper.find('.btn-next-page').on('click', () => get_page(precheck.start + precheck.page_length));
+	wrapper.find('.btn-download-precheck').on('click', () => {
+		open_url_post(
+			'/api/method/hrms.payroll.doctype.payroll_entry.payroll_entry.download_attendance_precheck',
+			{ payroll_entry: frm.doc.name }
+		);
+	});
+};
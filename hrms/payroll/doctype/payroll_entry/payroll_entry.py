@@ -9,17 +9,18 @@ import frappe
 from frappe import _
 from frappe.desk.reportview import get_match_cond
 from frappe.model.document import Document
-from frappe.query_builder.functions import Coalesce, Count
+from frappe.query_builder.functions import Coalesce, Sum
 from frappe.utils import (
 	DATE_FORMAT,
 	add_days,
 	add_to_date,
 	cint,
 	comma_and,
-	date_diff,
 	flt,
 	get_link_to_form,
 	getdate,
+	now_datetime,
+	time_diff_in_seconds,
 )
 
 import erpnext
@@ -28,6 +29,18 @@ from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
 )
 from erpnext.accounts.utils import get_fiscal_year
 
+from hrms.payroll.doctype.payroll_entry.attendance_precheck import AttendancePrecheck
+from hrms.payroll.doctype.payroll_entry.payroll_run_context import PayrollRunContext
+from hrms.payroll.doctype.payroll_run_log.payroll_run_log import (
+	log_payroll_phase,
+	measure_salary_slip,
+	set_phase_failed,
+)
+
+
+# number of salary slips submitted and committed together while submitting a payroll entry
+SUBMISSION_CHUNK_SIZE = 100
+
 
 class PayrollEntry(Document):
 	def onload(self):
@@ -126,6 +139,7 @@ class PayrollEntry(Document):
 		return filters
 
 	@frappe.whitelist()
+	@log_payroll_phase("Employee Fetch")
 	def fill_employee_details(self):
 		filters = self.make_filters()
 		employees = get_employee_list(filters=filters, as_dict=True, ignore_match_conditions=True)
@@ -154,7 +168,7 @@ class PayrollEntry(Document):
 		self.set("employees", employees)
 		self.number_of_employees = len(self.employees)
 
-		return self.get_employees_with_unmarked_attendance()
+		return self.get_attendance_precheck()
 
 	@frappe.whitelist()
 	def create_salary_slips(self):
@@ -165,30 +179,10 @@ class PayrollEntry(Document):
 		employees = [emp.employee for emp in self.employees]
 
 		if employees:
-			args = frappe._dict(
-				{
-					"salary_slip_based_on_timesheet": self.salary_slip_based_on_timesheet,
-					"payroll_frequency": self.payroll_frequency,
-					"start_date": self.start_date,
-					"end_date": self.end_date,
-					"company": self.company,
-					"posting_date": self.posting_date,
-					"deduct_tax_for_unclaimed_employee_benefits": self.deduct_tax_for_unclaimed_employee_benefits,
-					"deduct_tax_for_unsubmitted_tax_exemption_proof": self.deduct_tax_for_unsubmitted_tax_exemption_proof,
-					"payroll_entry": self.name,
-					"exchange_rate": self.exchange_rate,
-					"currency": self.currency,
-				}
-			)
+			args = self.get_salary_slip_args()
 			if len(employees) > 30 or frappe.flags.enqueue_payroll_entry:
 				self.db_set("status", "Queued")
-				frappe.enqueue(
-					create_salary_slips_for_employees,
-					timeout=3000,
-					employees=employees,
-					args=args,
-					publish_progress=False,
-				)
+				self.enqueue_salary_slip_creation(employees, args)
 				frappe.msgprint(
 					_("Salary Slip creation is queued. It may take a few minutes"),
 					alert=True,
@@ -199,6 +193,106 @@ class PayrollEntry(Document):
 				# since this method is called via frm.call this doc needs to be updated manually
 				self.reload()
 
+	def get_salary_slip_args(self):
+		return frappe._dict(
+			{
+				"salary_slip_based_on_timesheet": self.salary_slip_based_on_timesheet,
+				"payroll_frequency": self.payroll_frequency,
+				"start_date": self.start_date,
+				"end_date": self.end_date,
+				"company": self.company,
+				"posting_date": self.posting_date,
+				"deduct_tax_for_unclaimed_employee_benefits": self.deduct_tax_for_unclaimed_employee_benefits,
+				"deduct_tax_for_unsubmitted_tax_exemption_proof": self.deduct_tax_for_unsubmitted_tax_exemption_proof,
+				"payroll_entry": self.name,
+				"exchange_rate": self.exchange_rate,
+				"currency": self.currency,
+			}
+		)
+
+	@frappe.whitelist()
+	def refresh_stale_salary_slips(self):
+		"""Recalculates draft salary slips whose attendance, leaves, additional salaries or timesheets
+		changed after they were created"""
+		self.check_permission("write")
+
+		ss = frappe.qb.DocType("Salary Slip")
+		salary_slips = (
+			frappe.qb.from_(ss)
+			.select(ss.name, ss.employee)
+			.where(self.get_sal_slip_conditions(ss, 0) & (ss.is_stale == 1))
+		).run(as_dict=True)
+
+		if not salary_slips:
+			frappe.msgprint(_("There are no stale Salary Slips to refresh"))
+			return
+
+		if len(salary_slips) > 30 or frappe.flags.enqueue_payroll_entry:
+			frappe.enqueue(
+				refresh_salary_slips,
+				queue="long",
+				timeout=3000,
+				enqueue_after_commit=True,
+				payroll_entry=self.name,
+				salary_slips=salary_slips,
+			)
+			frappe.msgprint(
+				_("Refreshing {0} stale Salary Slips is queued. It may take a few minutes").format(
+					len(salary_slips)
+				),
+				alert=True,
+				indicator="blue",
+			)
+		else:
+			refresh_salary_slips(self.name, salary_slips)
+			frappe.msgprint(
+				_("Refreshed {0} stale Salary Slips").format(len(salary_slips)),
+				alert=True,
+				indicator="green",
+			)
+
+	def enqueue_salary_slip_creation(self, employees, args):
+		"""Splits employees into shards and enqueues each shard as an independent job"""
+		shard_size = cint(
+			frappe.db.get_single_value("Payroll Settings", "salary_slips_per_background_job")
+		)
+		self.clear_shards("Creation")
+
+		for shard_employees in get_shards(employees, shard_size):
+			shard = self.add_shard("Creation", shard_employees)
+			frappe.enqueue(
+				create_salary_slips_for_shard,
+				queue="long",
+				timeout=3000,
+				enqueue_after_commit=True,
+				payroll_entry=self.name,
+				shard=shard.name,
+				employees=shard_employees,
+				args=args,
+			)
+
+	def add_shard(self, process, employees=None, salary_slips=None, status="Queued"):
+		shard = self.append(
+			"shards",
+			{
+				"process": process,
+				"status": status,
+				"employee_count": len(employees or salary_slips),
+				"employees": json.dumps(employees) if employees else None,
+				"salary_slips": json.dumps(salary_slips) if salary_slips else None,
+				"started_at": now_datetime() if status == "Running" else None,
+			},
+		)
+		shard.db_insert()
+		return shard
+
+	def clear_shards(self, process):
+		self.set("shards", [shard for shard in self.shards if shard.process != process])
+		frappe.db.delete(
+			"Payroll Entry Shard",
+			{"parent": self.name, "parenttype": self.doctype, "process": process},
+		)
+
 	def get_sal_slip_list(self, ss_status, as_dict=False):
 		"""
 		Returns list of salary slips based on selected criteria
@@ -208,18 +302,21 @@ class PayrollEntry(Document):
 		ss_list = (
 			frappe.qb.from_(ss)
 			.select(ss.name, ss.salary_structure)
-			.where(
-				(ss.docstatus == ss_status)
-				& (ss.start_date >= self.start_date)
-				& (ss.end_date <= self.end_date)
-				& (ss.payroll_entry == self.name)
-				& ((ss.journal_entry.isnull()) | (ss.journal_entry == ""))
-				& (Coalesce(ss.salary_slip_based_on_timesheet, 0) == self.salary_slip_based_on_timesheet)
-			)
+			.where(self.get_sal_slip_conditions(ss, ss_status))
 		).run(as_dict=as_dict)
 
 		return ss_list
 
+	def get_sal_slip_conditions(self, ss, ss_status):
+		return (
+			(ss.docstatus == ss_status)
+			& (ss.start_date >= self.start_date)
+			& (ss.end_date <= self.end_date)
+			& (ss.payroll_entry == self.name)
+			& ((ss.journal_entry.isnull()) | (ss.journal_entry == ""))
+			& (Coalesce(ss.salary_slip_based_on_timesheet, 0) == self.salary_slip_based_on_timesheet)
+		)
+
 	@frappe.whitelist()
 	def submit_salary_slips(self):
 		self.check_permission("write")
@@ -243,9 +340,9 @@ class PayrollEntry(Document):
 			submit_salary_slips_for_employees(self, salary_slips, publish_progress=False)
 
 	def email_salary_slip(self, submitted_ss):
-		if frappe.db.get_single_value("Payroll Settings", "email_salary_slip_to_employee"):
-			for ss in submitted_ss:
-				ss.email_salary_slip()
+		from hrms.payroll.doctype.salary_slip.salary_slip_email import enqueue_salary_slip_emails
+
+		enqueue_salary_slip_emails([ss.name for ss in submitted_ss], payroll_entry=self.name)
 
 	def get_salary_component_account(self, salary_component):
 		account = frappe.db.get_value(
@@ -265,53 +362,79 @@ class PayrollEntry(Document):
 		return account
 
 	def get_salary_components(self, component_type):
-		salary_slips = self.get_sal_slip_list(ss_status=1, as_dict=True)
+		"""Returns amounts of the submitted salary slips by component, salary structure and employee.
+
+		Deprecated, use `get_grouped_salary_components`. Kept for custom apps calling it, it now
+		returns one row per group with the amounts summed, instead of one row per salary detail."""
+		salary_components = self.get_grouped_salary_components(component_type)
+		for d in salary_components:
+			d.parentfield = component_type
 
-		if salary_slips:
-			ss = frappe.qb.DocType("Salary Slip")
-			ssd = frappe.qb.DocType("Salary Detail")
-			salary_components = (
-				frappe.qb.from_(ss)
-				.join(ssd)
-				.on(ss.name == ssd.parent)
-				.select(ssd.salary_component, ssd.amount, ssd.parentfield, ss.salary_structure, ss.employee)
-				.where((ssd.parentfield == component_type) & (ss.name.isin([d.name for d in salary_slips])))
-			).run(as_dict=True)
+		return salary_components or None
 
-			return salary_components
+	def get_grouped_salary_components(self, component_type):
+		"""Returns amounts of the submitted salary slips grouped by component, salary structure and employee"""
+		ss = frappe.qb.DocType("Salary Slip")
+		ssd = frappe.qb.DocType("Salary Detail")
+		sc = frappe.qb.DocType("Salary Component")
+
+		return (
+			frappe.qb.from_(ss)
+			.join(ssd)
+			.on(ss.name == ssd.parent)
+			.left_join(sc)
+			.on(sc.name == ssd.salary_component)
+			.select(
+				ssd.salary_component,
+				ss.salary_structure,
+				ss.employee,
+				Sum(ssd.amount).as_("amount"),
+				sc.is_flexible_benefit,
+				sc.only_tax_impact,
+			)
+			.where((ssd.parentfield == component_type) & self.get_sal_slip_conditions(ss, 1))
+			.groupby(
+				ssd.salary_component,
+				ss.salary_structure,
+				ss.employee,
+				sc.is_flexible_benefit,
+				sc.only_tax_impact,
+			)
+			.orderby(ssd.salary_component)
+			.orderby(ss.employee)
+		).run(as_dict=True)
 
 	def get_salary_component_total(
 		self,
 		component_type=None,
 		employee_wise_accounting_enabled=False,
 	):
-		salary_components = self.get_salary_components(component_type)
+		salary_components = self.get_grouped_salary_components(component_type)
 		if salary_components:
 			component_dict = {}
+			self.set_payroll_cost_centers_for_employees(
+				{item.employee: item.salary_structure for item in salary_components}
+			)
 
 			for item in salary_components:
-				add_component_to_accrual_jv_entry = True
+				if component_type == "earnings" and (
+					item.is_flexible_benefit == 1 and item.only_tax_impact == 1
+				):
+					continue
+
 				employee_cost_centers = self.get_payroll_cost_centers_for_employee(
 					item.employee, item.salary_structure
 				)
 
-				if component_type == "earnings":
-					is_flexible_benefit, only_tax_impact = frappe.get_cached_value(
-						"Salary Component", item["salary_component"], ["is_flexible_benefit", "only_tax_impact"]
-					)
-					if is_flexible_benefit == 1 and only_tax_impact == 1:
-						add_component_to_accrual_jv_entry = False
-
-				if add_component_to_accrual_jv_entry:
-					for cost_center, percentage in employee_cost_centers.items():
-						amount_against_cost_center = flt(item.amount) * percentage / 100
-						key = (item.salary_component, cost_center)
-						component_dict[key] = component_dict.get(key, 0) + amount_against_cost_center
+				for cost_center, percentage in employee_cost_centers.items():
+					amount_against_cost_center = flt(item.amount) * percentage / 100
+					key = (item.salary_component, cost_center)
+					component_dict[key] = component_dict.get(key, 0) + amount_against_cost_center
 
-						if employee_wise_accounting_enabled:
-							self.set_employee_based_payroll_payable_entries(
-								component_type, item.employee, amount_against_cost_center
-							)
+					if employee_wise_accounting_enabled:
+						self.set_employee_based_payroll_payable_entries(
+							component_type, item.employee, amount_against_cost_center
+						)
 
 			account_details = self.get_account(component_dict=component_dict)
 
@@ -328,6 +451,72 @@ class PayrollEntry(Document):
 		if salary_structure and "salary_structure" not in employee_details:
 			employee_details["salary_structure"] = salary_structure
 
+	def set_payroll_cost_centers_for_employees(self, employees: dict) -> None:
+		"""Loads payroll cost centers for all employees in bulk
+
+		Args:
+		        employees (dict): salary structure of the salary slip for each employee
+		"""
+		if not hasattr(self, "employee_cost_centers"):
+			self.employee_cost_centers = {}
+
+		employees = {
+			employee: salary_structure
+			for employee, salary_structure in employees.items()
+			if not self.employee_cost_centers.get(employee)
+		}
+		if not employees:
+			return
+
+		SalaryStructureAssignment = frappe.qb.DocType("Salary Structure Assignment")
+		EmployeeCostCenter = frappe.qb.DocType("Employee Cost Center")
+
+		cost_centers = (
+			frappe.qb.from_(SalaryStructureAssignment)
+			.join(EmployeeCostCenter)
+			.on(SalaryStructureAssignment.name == EmployeeCostCenter.parent)
+			.select(
+				SalaryStructureAssignment.employee,
+				SalaryStructureAssignment.salary_structure,
+				EmployeeCostCenter.cost_center,
+				EmployeeCostCenter.percentage,
+			)
+			.where(
+				(SalaryStructureAssignment.employee.isin(list(employees)))
+				& (SalaryStructureAssignment.docstatus == 1)
+				& (SalaryStructureAssignment.salary_structure.isin(list(set(employees.values()))))
+			)
+		).run(as_dict=True)
+
+		for row in cost_centers:
+			if employees[row.employee] == row.salary_structure:
+				self.employee_cost_centers.setdefault(row.employee, {})[row.cost_center] = row.percentage
+
+		employees_without_cost_centers = [
+			employee for employee in employees if not self.employee_cost_centers.get(employee)
+		]
+		if not employees_without_cost_centers:
+			return
+
+		Employee = frappe.qb.DocType("Employee")
+		Department = frappe.qb.DocType("Department")
+
+		default_cost_centers = (
+			frappe.qb.from_(Employee)
+			.left_join(Department)
+			.on(Employee.department == Department.name)
+			.select(
+				Employee.name,
+				Employee.payroll_cost_center,
+				Department.payroll_cost_center.as_("department_cost_center"),
+			)
+			.where(Employee.name.isin(employees_without_cost_centers))
+		).run(as_dict=True)
+
+		for row in default_cost_centers:
+			default_cost_center = row.payroll_cost_center or row.department_cost_center or self.cost_center
+			self.employee_cost_centers[row.name] = {default_cost_center: 100}
+
 	def get_payroll_cost_centers_for_employee(self, employee, salary_structure):
 		if not hasattr(self, "employee_cost_centers"):
 			self.employee_cost_centers = {}
@@ -377,6 +566,7 @@ class PayrollEntry(Document):
 
 		return account_dict
 
+	@log_payroll_phase("Accrual Journal Entry")
 	def make_accrual_jv_entry(self, submitted_salary_slips):
 		self.check_permission("write")
 		employee_wise_accounting_enabled = frappe.db.get_single_value(
@@ -674,6 +864,7 @@ class PayrollEntry(Document):
 		return exchange_rate, amount
 
 	@frappe.whitelist()
+	@log_payroll_phase("Bank Entry")
 	def make_payment_entry(self):
 		self.check_permission("write")
 		self.employee_based_payroll_payable_entries = {}
@@ -861,95 +1052,32 @@ class PayrollEntry(Document):
 		if not self.validate_attendance:
 			return
 
-		unmarked_attendance = []
-		employee_details = self.get_employee_and_attendance_details()
-
-		for emp in self.employees:
-			details = next((record for record in employee_details if record.name == emp.employee), None)
-			if not details:
-				continue
-
-			start_date, end_date = self.get_payroll_dates_for_employee(details)
-			holidays = self.get_holidays_count(details.holiday_list, start_date, end_date)
-			payroll_days = date_diff(end_date, start_date) + 1
-			unmarked_days = payroll_days - (holidays + details.attendance_count)
-
-			if unmarked_days > 0:
-				unmarked_attendance.append(
-					{"employee": emp.employee, "employee_name": emp.employee_name, "unmarked_days": unmarked_days}
-				)
-
-		return unmarked_attendance
-
-	def get_employee_and_attendance_details(self) -> list[dict]:
-		"""Returns a list of employee and attendance details like
-		[
-		        {
-		                "name": "HREMP00001",
-		                "date_of_joining": "2019-01-01",
-		                "relieving_date": "2022-01-01",
-		                "holiday_list": "Holiday List Company",
-		                "attendance_count": 22
-		        }
+		return [
+			{"employee": d.employee, "employee_name": d.employee_name, "unmarked_days": d.unmarked_days}
+			for d in AttendancePrecheck(self).get_unmarked_attendance()
 		]
-		"""
-		employees = [emp.employee for emp in self.employees]
-		default_holiday_list = frappe.db.get_value(
-			"Company", self.company, "default_holiday_list", cache=True
-		)
-
-		Employee = frappe.qb.DocType("Employee")
-		Attendance = frappe.qb.DocType("Attendance")
-
-		return (
-			frappe.qb.from_(Employee)
-			.left_join(Attendance)
-			.on(
-				(Employee.name == Attendance.employee)
-				& (Attendance.attendance_date.between(self.start_date, self.end_date))
-				& (Attendance.docstatus == 1)
-			)
-			.select(
-				Employee.name,
-				Employee.date_of_joining,
-				Employee.relieving_date,
-				Coalesce(Employee.holiday_list, default_holiday_list).as_("holiday_list"),
-				Count(Attendance.name).as_("attendance_count"),
-			)
-			.where(Employee.name.isin(employees))
-			.groupby(Employee.name)
-		).run(as_dict=True)
-
-	def get_payroll_dates_for_employee(self, employee_details: dict) -> tuple[str, str]:
-		start_date = self.start_date
-		if employee_details.date_of_joining > getdate(self.start_date):
-			start_date = employee_details.date_of_joining
 
-		end_date = self.end_date
-		if employee_details.relieving_date and employee_details.relieving_date < getdate(self.end_date):
-			end_date = employee_details.relieving_date
-
-		return start_date, end_date
+	@frappe.whitelist()
+	def get_attendance_precheck(self, start: int = 0, page_length: int = 20) -> dict | None:
+		"""Returns a page of employees with unmarked attendance and the total number of them"""
+		if not self.validate_attendance:
+			return
 
-	def get_holidays_count(self, holiday_list: str, start_date: str, end_date: str) -> float:
-		"""Returns number of holidays between start and end dates in the holiday list"""
-		if not hasattr(self, "_holidays_between_dates"):
-			self._holidays_between_dates = {}
+		return AttendancePrecheck(self).get_page(cint(start), cint(page_length) or 20)
 
-		key = f"{start_date}-{end_date}-{holiday_list}"
-		if key in self._holidays_between_dates:
-			return self._holidays_between_dates[key]
 
-		holidays = frappe.db.get_all(
-			"Holiday",
-			filters={"parent": holiday_list, "holiday_date": ("between", [start_date, end_date])},
-			fields=["COUNT(*) as holidays_count"],
-		)[0]
+@frappe.whitelist()
+def download_attendance_precheck(payroll_entry: str, only_unmarked: int = 0) -> None:
+	"""Downloads working, marked and unmarked days of all the employees in the Payroll Entry as CSV"""
+	from frappe.utils.csvutils import build_csv_response
 
-		if holidays:
-			self._holidays_between_dates[key] = holidays.holidays_count
+	doc = frappe.get_doc("Payroll Entry", payroll_entry)
+	doc.check_permission("read")
 
-		return self._holidays_between_dates.get(key) or 0
+	build_csv_response(
+		AttendancePrecheck(doc).get_csv_rows(cint(only_unmarked)),
+		_("Attendance Precheck {0}").format(doc.name),
+	)
 
 
 def get_salary_structure(
@@ -1202,6 +1330,13 @@ def log_payroll_failure(process, payroll_entry, error):
 	error_log = frappe.log_error(
 		title=_("Salary Slip {0} failed for Payroll Entry {1}").format(process, payroll_entry.name)
 	)
+	error_message = get_payroll_failure_message(error, error_log)
+	set_phase_failed(error_message)
+
+	payroll_entry.db_set({"error_message": error_message, "status": "Failed"})
+
+
+def get_payroll_failure_message(error, error_log) -> str:
 	message_log = frappe.message_log.pop() if frappe.message_log else str(error)
 
 	try:
@@ -1213,26 +1348,60 @@ def log_payroll_failure(process, payroll_entry, error):
 		get_link_to_form("Error Log", error_log.name)
 	)
 
-	payroll_entry.db_set({"error_message": error_message, "status": "Failed"})
+	return error_message
+
 
+def get_shards(employees: list, shard_size: int) -> list[list]:
+	if not shard_size:
+		return [employees]
 
+	return [employees[i : i + shard_size] for i in range(0, len(employees), shard_size)]
+
+
+def insert_salary_slips(employees, args, publish_progress=False):
+	payroll_run_context = PayrollRunContext(employees, args).load()
+
+	for count, emp in enumerate(employees, start=1):
+		with measure_salary_slip(emp) as measured:
+			args.update({"doctype": "Salary Slip", "employee": emp})
+			salary_slip = frappe.get_doc(args)
+			salary_slip._payroll_run_context = payroll_run_context
+			salary_slip.insert()
+			measured.salary_structure = salary_slip.salary_structure
+
+		if publish_progress:
+			frappe.publish_progress(
+				count * 100 / len(employees),
+				title=_("Creating Salary Slips..."),
+			)
+
+
+def refresh_salary_slips(payroll_entry: str, salary_slips: list[dict]):
+	"""Recalculates the components of draft salary slips of the Payroll Entry affected by changes
+	to their attendance, leaves, additional salaries or timesheets"""
+	payroll_entry = frappe.get_doc("Payroll Entry", payroll_entry)
+	payroll_run_context = PayrollRunContext(
+		[d.employee for d in salary_slips], payroll_entry.get_salary_slip_args()
+	).load()
+
+	for d in salary_slips:
+		salary_slip = frappe.get_doc("Salary Slip", d.name)
+		salary_slip._payroll_run_context = payroll_run_context
+		salary_slip.refresh_amounts()
+
+	frappe.publish_realtime("completed_salary_slip_refresh")
+
+
+@log_payroll_phase(
+	"Salary Slip Creation", lambda arguments: arguments["args"].get("payroll_entry")
+)
 def create_salary_slips_for_employees(employees, args, publish_progress=True):
 	try:
 		payroll_entry = frappe.get_cached_doc("Payroll Entry", args.payroll_entry)
 		salary_slips_exist_for = get_existing_salary_slips(employees, args)
-		count = 0
 
 		employees = list(set(employees) - set(salary_slips_exist_for))
-		for emp in employees:
-			args.update({"doctype": "Salary Slip", "employee": emp})
-			frappe.get_doc(args).insert()
-
-			count += 1
-			if publish_progress:
-				frappe.publish_progress(
-					count * 100 / len(employees),
-					title=_("Creating Salary Slips..."),
-				)
+		insert_salary_slips(employees, args, publish_progress)
 
 		payroll_entry.db_set({"status": "Submitted", "salary_slips_created": 1, "error_message": ""})
 
@@ -1254,6 +1423,86 @@ def create_salary_slips_for_employees(employees, args, publish_progress=True):
 		frappe.publish_realtime("completed_salary_slip_creation")
 
 
+@log_payroll_phase("Salary Slip Creation")
+def create_salary_slips_for_shard(payroll_entry: str, shard: str, employees: list, args: dict):
+	"""Creates salary slips for a shard of the Payroll Entry's employees.
+	Each shard commits independently, so a failure only rolls back its own slips"""
+	started_at = now_datetime()
+	frappe.db.set_value(
+		"Payroll Entry Shard", shard, {"status": "Running", "started_at": started_at, "error_message": ""}
+	)
+	frappe.db.commit()  # nosemgrep
+
+	try:
+		salary_slips_exist_for = get_existing_salary_slips(employees, args)
+		insert_salary_slips(list(set(employees) - set(salary_slips_exist_for)), args)
+		frappe.db.commit()  # nosemgrep
+		status, error_message = "Completed", ""
+
+	except Exception as e:
+		frappe.db.rollback()
+		error_log = frappe.log_error(
+			title=_("Salary Slip creation failed for Payroll Entry {0}").format(payroll_entry)
+		)
+		status, error_message = "Failed", get_payroll_failure_message(e, error_log)
+		set_phase_failed(error_message)
+
+	finished_at = now_datetime()
+	frappe.db.set_value(
+		"Payroll Entry Shard",
+		shard,
+		{
+			"status": status,
+			"finished_at": finished_at,
+			"duration": time_diff_in_seconds(finished_at, started_at),
+			"error_message": error_message,
+		},
+	)
+	frappe.db.commit()  # nosemgrep
+
+	update_payroll_entry_status_from_shards(payroll_entry, "Creation")
+
+
+def update_payroll_entry_status_from_shards(payroll_entry: str, process: str):
+	"""Updates the Payroll Entry status once all the shards of the process have finished"""
+	# lock the payroll entry so that only one of the concurrently finishing shards updates it
+	frappe.db.get_value("Payroll Entry", payroll_entry, "name", for_update=True)
+
+	PayrollEntryShard = frappe.qb.DocType("Payroll Entry Shard")
+	shards = (
+		frappe.qb.from_(PayrollEntryShard)
+		.select(PayrollEntryShard.idx, PayrollEntryShard.status, PayrollEntryShard.error_message)
+		.where(
+			(PayrollEntryShard.parent == payroll_entry)
+			& (PayrollEntryShard.parenttype == "Payroll Entry")
+			& (PayrollEntryShard.process == process)
+		)
+		.for_update()
+	).run(as_dict=True)
+
+	if any(shard.status in ("Queued", "Running") for shard in shards):
+		frappe.db.commit()  # nosemgrep
+		return
+
+	failed_shards = [shard for shard in shards if shard.status == "Failed"]
+	if failed_shards:
+		error_message = "\n\n".join(
+			_("Shard #{0}: {1}").format(shard.idx, shard.error_message) for shard in failed_shards
+		)
+		frappe.db.set_value(
+			"Payroll Entry", payroll_entry, {"error_message": error_message, "status": "Failed"}
+		)
+	else:
+		frappe.db.set_value(
+			"Payroll Entry",
+			payroll_entry,
+			{"status": "Submitted", "salary_slips_created": 1, "error_message": ""},
+		)
+
+	frappe.db.commit()  # nosemgrep
+	frappe.publish_realtime("completed_salary_slip_creation")
+
+
 def show_payroll_submission_status(submitted, unsubmitted, payroll_entry):
 	if not submitted and not unsubmitted:
 		frappe.msgprint(
@@ -1293,28 +1542,47 @@ def get_existing_salary_slips(employees, args):
 	).run(pluck=True)
 
 
+@log_payroll_phase("Salary Slip Submission")
 def submit_salary_slips_for_employees(payroll_entry, salary_slips, publish_progress=True):
+	"""Submits salary slips in committed chunks. Every committed chunk is a checkpoint, so a rerun
+	after a failure only picks up the slips that are still in draft. The accrual journal entry is
+	built once, from all the submitted slips of the entry, after every chunk succeeds"""
+	shard = None
 	try:
-		submitted = []
 		unsubmitted = []
 		frappe.flags.via_payroll_entry = True
 		count = 0
+		salary_slips = [entry[0] for entry in salary_slips]
+		# shards of earlier runs, left running if their worker was killed
+		payroll_entry.clear_shards("Submission")
+
+		for chunk in get_shards(salary_slips, SUBMISSION_CHUNK_SIZE):
+			shard = payroll_entry.add_shard("Submission", salary_slips=chunk, status="Running")
+			frappe.db.commit()  # nosemgrep
+
+			for salary_slip in chunk:
+				salary_slip = frappe.get_doc("Salary Slip", salary_slip)
+				with measure_salary_slip(salary_slip.employee) as measured:
+					measured.salary_structure = salary_slip.salary_structure
+					if salary_slip.net_pay < 0:
+						unsubmitted.append(salary_slip.name)
+					else:
+						try:
+							salary_slip.submit()
+						except frappe.ValidationError:
+							unsubmitted.append(salary_slip.name)
+
+				count += 1
+				if publish_progress:
+					frappe.publish_progress(
+						count * 100 / len(salary_slips), title=_("Submitting Salary Slips...")
+					)
 
-		for entry in salary_slips:
-			salary_slip = frappe.get_doc("Salary Slip", entry[0])
-			if salary_slip.net_pay < 0:
-				unsubmitted.append(entry[0])
-			else:
-				try:
-					salary_slip.submit()
-					submitted.append(salary_slip)
-				except frappe.ValidationError:
-					unsubmitted.append(entry[0])
-
-			count += 1
-			if publish_progress:
-				frappe.publish_progress(count * 100 / len(salary_slips), title=_("Submitting Salary Slips..."))
+			set_shard_status(shard, "Completed")
+			frappe.db.commit()  # nosemgrep
+			shard = None
 
+		submitted = payroll_entry.get_sal_slip_list(ss_status=1, as_dict=True)
 		if submitted:
 			payroll_entry.make_accrual_jv_entry(submitted)
 			payroll_entry.email_salary_slip(submitted)
@@ -1325,6 +1593,8 @@ def submit_salary_slips_for_employees(payroll_entry, salary_slips, publish_progr
 	except Exception as e:
 		frappe.db.rollback()
 		log_payroll_failure("submission", payroll_entry, e)
+		if shard:
+			set_shard_status(shard, "Failed", payroll_entry.error_message)
 
 	finally:
 		frappe.db.commit()  # nosemgrep
@@ -1333,6 +1603,20 @@ def submit_salary_slips_for_employees(payroll_entry, salary_slips, publish_progr
 	frappe.flags.via_payroll_entry = False
 
 
+def set_shard_status(shard, status, error_message=None):
+	finished_at = now_datetime()
+	frappe.db.set_value(
+		"Payroll Entry Shard",
+		shard.name,
+		{
+			"status": status,
+			"finished_at": finished_at,
+			"duration": time_diff_in_seconds(finished_at, shard.started_at),
+			"error_message": error_message or "",
+		},
+	)
+
+
 @frappe.whitelist()
 @frappe.validate_and_sanitize_search_inputs
 def get_payroll_entries_for_jv(doctype, txt, searchfield, start, page_len, filters):
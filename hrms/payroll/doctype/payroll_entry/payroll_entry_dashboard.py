@@ -5,5 +5,5 @@ def get_data():
 			"Journal Entry": "reference_name",
 			"Payment Entry": "reference_name",
 		},
-		"transactions": [{"items": ["Salary Slip", "Journal Entry"]}],
+		"transactions": [{"items": ["Salary Slip", "Journal Entry", "Payroll Run Log"]}],
 	}
@@ -0,0 +1,330 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import frappe
+from frappe.utils import cstr, getdate
+
+# value of expression inputs not found in the salary slip's data
+MISSING = object()
+
+
+class PayrollRunContext:
+	"""Data shared by all the Salary Slips created in a Payroll Entry run.
+
+	Everything is loaded once using bulk queries. Slips created with a context read from it instead
+	of hitting the database per slip, and fall back to their regular queries for anything the context
+	does not cover (eg: holidays of a holiday list that ends within the payroll period).
+	"""
+
+	def __init__(self, employees: list[str], args: dict):
+		self.employee_list = list(employees)
+		self.company = args.get("company")
+		self.start_date = getdate(args.get("start_date"))
+		self.end_date = getdate(args.get("end_date"))
+		self.exchange_rate = args.get("exchange_rate")
+
+		self.payroll_settings = frappe._dict()
+		self.employees = {}
+		self.salary_structure_assignments = {}
+		self.salary_structures = {}
+		self.salary_components = {}
+		self.salary_component_abbreviation_seed = None
+		self.leave_types = []
+		self.holiday_lists = {}
+		self.holidays = {}
+		self.lwp_or_ppl_leaves = None
+		self.component_wise_year_to_date = {}
+		# {key: data of all the employees}, loaded the first time a salary slip needs it
+		self.employee_data = {}
+		# {(compiled expression, values of the names it reads): result}
+		self.expression_results = {}
+
+	def load(self) -> "PayrollRunContext":
+		self.payroll_settings = frappe.get_single("Payroll Settings")
+
+		if not self.employee_list:
+			return self
+
+		self.load_employees()
+		self.load_salary_structure_assignments()
+		self.load_salary_structures()
+		self.load_salary_components()
+		self.load_leave_types()
+		self.load_holidays()
+		self.load_lwp_or_ppl_leaves()
+
+		return self
+
+	def load_employees(self):
+		employees = frappe.get_all(
+			"Employee", filters={"name": ("in", self.employee_list)}, fields=["*"]
+		)
+		self.employees = {employee.name: employee for employee in employees}
+
+	def load_salary_structure_assignments(self):
+		assignments = frappe.get_all(
+			"Salary Structure Assignment",
+			filters={
+				"employee": ("in", self.employee_list),
+				"from_date": ("<=", self.end_date),
+				"docstatus": 1,
+			},
+			fields=["*"],
+			order_by="from_date desc",
+		)
+
+		for assignment in assignments:
+			self.salary_structure_assignments.setdefault(assignment.employee, []).append(assignment)
+
+	def load_salary_structures(self):
+		structures = {
+			assignment.salary_structure
+			for assignments in self.salary_structure_assignments.values()
+			for assignment in assignments
+		}
+
+		for structure in structures:
+			self.salary_structures[structure] = frappe.get_doc("Salary Structure", structure)
+
+	def load_salary_components(self):
+		components = frappe.get_all(
+			"Salary Component",
+			fields=[
+				"name",
+				"salary_component_abbr",
+				"remove_if_zero_valued",
+				"round_to_the_nearest_integer",
+				"pay_against_benefit_claim",
+			],
+		)
+		self.salary_components = {component.name: component for component in components}
+
+	def load_leave_types(self):
+		self.leave_types = frappe.get_all(
+			"Leave Type",
+			or_filters=[["is_ppl", "=", 1], ["is_lwp", "=", 1]],
+			fields=["name", "is_lwp", "is_ppl", "fraction_of_daily_salary_per_leave", "include_holiday"],
+		)
+
+	def load_holidays(self):
+		"""Loads holidays of holiday lists that cover the whole payroll period.
+		Employees with lists replaced mid-period are resolved by the slip itself"""
+		default_holiday_list = frappe.get_cached_value("Company", self.company, "default_holiday_list")
+
+		for employee in self.employees.values():
+			holiday_list = employee.holiday_list or default_holiday_list
+			if holiday_list:
+				self.holiday_lists[employee.name] = holiday_list
+
+		if not self.holiday_lists:
+			return
+
+		holiday_lists = frappe.get_all(
+			"Holiday List",
+			filters={
+				"name": ("in", list(set(self.holiday_lists.values()))),
+				"from_date": ("<=", self.start_date),
+				"to_date": (">=", self.end_date),
+			},
+			pluck="name",
+		)
+
+		if not holiday_lists:
+			return
+
+		self.holidays = {holiday_list: [] for holiday_list in holiday_lists}
+		holidays = frappe.get_all(
+			"Holiday",
+			filters={
+				"parent": ("in", holiday_lists),
+				"holiday_date": ("between", [self.start_date, self.end_date]),
+			},
+			fields=["parent", "holiday_date"],
+			order_by="holiday_date",
+		)
+
+		for holiday in holidays:
+			self.holidays[holiday.parent].append(getdate(holiday.holiday_date))
+
+	def load_lwp_or_ppl_leaves(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip import get_lwp_or_ppl_leaves_for_period
+
+		if self.payroll_settings.payroll_based_on != "Leave":
+			return
+
+		self.lwp_or_ppl_leaves = get_lwp_or_ppl_leaves_for_period(
+			self.employee_list, self.start_date, self.end_date
+		)
+
+	def get_employee(self, employee: str) -> frappe._dict | None:
+		return self.employees.get(employee)
+
+	def get_salary_structure(self, salary_structure: str):
+		if salary_structure not in self.salary_structures:
+			self.salary_structures[salary_structure] = frappe.get_doc("Salary Structure", salary_structure)
+
+		return self.salary_structures[salary_structure]
+
+	def get_salary_structure_assignment(
+		self, employee: str, salary_structure: str, on_date
+	) -> frappe._dict | None:
+		"""Returns the latest assignment of the structure effective on or before `on_date`"""
+		on_date = getdate(on_date)
+		for assignment in self.salary_structure_assignments.get(employee, []):
+			if assignment.salary_structure == salary_structure and assignment.from_date <= on_date:
+				return assignment
+
+	def get_active_salary_structure(
+		self, employee: str, on_date, payroll_frequency: str | None = None
+	) -> str | None:
+		"""Returns the latest active salary structure assigned on or before `on_date`"""
+		on_date = getdate(on_date)
+		for assignment in self.salary_structure_assignments.get(employee, []):
+			if assignment.from_date > on_date:
+				continue
+
+			structure = self.get_salary_structure(assignment.salary_structure)
+			if structure.docstatus != 1 or structure.is_active != "Yes":
+				continue
+
+			if payroll_frequency and structure.payroll_frequency != payroll_frequency:
+				continue
+
+			return structure.name
+
+	def get_salary_component_abbreviation_seed(self) -> dict:
+		"""Returns zero amounts of all salary components by abbreviation.
+		Shared by all salary slips of the run, so it must not be modified"""
+		if self.salary_component_abbreviation_seed is None:
+			self.salary_component_abbreviation_seed = dict.fromkeys(
+				(component.salary_component_abbr for component in self.salary_components.values()), 0
+			)
+
+		return self.salary_component_abbreviation_seed
+
+	def get_salary_component_value(self, salary_component: str, fieldname: str):
+		component = self.salary_components.get(salary_component)
+		if component is None:
+			return frappe.get_cached_value("Salary Component", salary_component, fieldname)
+
+		return component.get(fieldname)
+
+	def get_holiday_dates(self, employee: str, start_date, end_date) -> list[str] | None:
+		"""Returns holiday dates for the employee between the dates,
+		or None if they are not covered by the context"""
+		start_date, end_date = getdate(start_date), getdate(end_date)
+		if start_date < self.start_date or end_date > self.end_date:
+			return
+
+		holidays = self.holidays.get(self.holiday_lists.get(employee))
+		if holidays is None:
+			return
+
+		return [cstr(holiday) for holiday in holidays if start_date <= holiday <= end_date]
+
+	def get_lwp_or_ppl_leaves(self, employee: str) -> dict | None:
+		if self.lwp_or_ppl_leaves is None:
+			return
+
+		return self.lwp_or_ppl_leaves.get(employee, {})
+
+	def get_component_wise_year_to_date(self, employee: str, start_date, end_date) -> dict:
+		"""Returns component totals of the employee's submitted salary slips in the year to date period.
+		Totals are loaded for all the employees of the run the first time a period is requested"""
+		from hrms.payroll.doctype.salary_slip.salary_slip import get_component_wise_year_to_date
+
+		key = (getdate(start_date), getdate(end_date))
+		if key not in self.component_wise_year_to_date:
+			self.component_wise_year_to_date[key] = get_component_wise_year_to_date(
+				self.employee_list, start_date, end_date
+			)
+
+		return self.component_wise_year_to_date[key].get(employee, {})
+
+	def get_employee_data(self, key: tuple, load):
+		"""Returns data loaded for all the employees of the run by `load(employees)`,
+		loading it the first time `key` is requested"""
+		if key not in self.employee_data:
+			self.employee_data[key] = load(self.employee_list)
+
+		return self.employee_data[key]
+
+	def get_additional_salaries(
+		self, employee: str, start_date, end_date, component_type: str
+	) -> list[dict] | None:
+		"""Returns additional salaries of the employee for the component type,
+		or None if the dates are not the ones of the run"""
+		from hrms.payroll.doctype.additional_salary.additional_salary import (
+			get_additional_salaries_for_employees,
+		)
+
+		if (getdate(start_date), getdate(end_date)) != (self.start_date, self.end_date):
+			return None
+
+		additional_salaries = self.get_employee_data(
+			("additional_salaries",),
+			lambda employees: get_additional_salaries_for_employees(
+				employees, self.start_date, self.end_date
+			),
+		)
+
+		return additional_salaries.get((employee, component_type), [])
+
+	def get_benefit_applications(self, payroll_period: str) -> dict:
+		from hrms.payroll.doctype.employee_benefit_application.employee_benefit_application import (
+			get_benefit_applications,
+		)
+
+		return self.get_employee_data(
+			("benefit_applications", payroll_period),
+			lambda employees: get_benefit_applications(employees, payroll_period),
+		)
+
+	def get_benefit_claim_amounts(
+		self, employee: str, start_date, end_date, pay_against_benefit_claim: int | None = None
+	) -> dict:
+		"""Returns amounts claimed by the employee within the dates, by earning component"""
+		from hrms.payroll.doctype.employee_benefit_claim.employee_benefit_claim import (
+			get_benefit_claim_amounts,
+		)
+
+		start_date, end_date = getdate(start_date), getdate(end_date)
+		claimed_amounts = self.get_employee_data(
+			("benefit_claim_amounts", start_date, end_date, pay_against_benefit_claim),
+			lambda employees: get_benefit_claim_amounts(
+				employees, start_date, end_date, pay_against_benefit_claim
+			),
+		)
+
+		return claimed_amounts.get(employee, {})
+
+	def get_tax_exemption_amount(
+		self, employee: str, payroll_period: str, based_on_proof: bool
+	) -> float | None:
+		"""Returns the exemption amount of the employee's submitted proof or declaration"""
+		from hrms.payroll.doctype.salary_slip.salary_slip import get_tax_exemption_amounts
+
+		exemption_amounts = self.get_employee_data(
+			("tax_exemption_amounts", payroll_period, based_on_proof),
+			lambda employees: get_tax_exemption_amounts(employees, payroll_period, based_on_proof),
+		)
+
+		return exemption_amounts.get(employee)
+
+	def evaluate_expression(self, code, inputs: tuple[str], eval_globals: dict, eval_locals):
+		"""Evaluates a compiled condition or formula once per distinct values of its `inputs`
+		across the salary slips of the run. Employees sharing a salary structure mostly share
+		these values, eg: base and payment days, so their slips reuse the results."""
+		from hrms.payroll.utils import safe_eval_compiled
+
+		key = (code, tuple(eval_locals.get(name, MISSING) for name in inputs))
+		try:
+			return self.expression_results[key]
+		except KeyError:
+			pass
+		except TypeError:
+			# unhashable values, eg: rows of a table field
+			return safe_eval_compiled(code, eval_globals, eval_locals)
+
+		result = self.expression_results[key] = safe_eval_compiled(code, eval_globals, eval_locals)
+		return result
@@ -1,6 +1,8 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
 
+import json
+
 import frappe
 from frappe.tests.utils import FrappeTestCase, change_settings
 from frappe.utils import add_days, add_months
@@ -11,9 +13,13 @@ from erpnext.setup.doctype.employee.test_employee import make_employee
 
 from hrms.payroll.doctype.payroll_entry.payroll_entry import (
 	PayrollEntry,
+	create_salary_slips_for_shard,
 	get_end_date,
+	get_shards,
 	get_start_end_dates,
 )
+from hrms.payroll.doctype.payroll_entry.attendance_precheck import AttendancePrecheck
+from hrms.payroll.doctype.payroll_entry.payroll_run_context import PayrollRunContext
 from hrms.payroll.doctype.salary_slip.test_salary_slip import (
 	create_account,
 	make_deduction_salary_component,
@@ -35,6 +41,7 @@ class TestPayrollEntry(FrappeTestCase):
 			"Salary Component",
 			"Salary Component Account",
 			"Payroll Entry",
+			"Payroll Entry Shard",
 			"Salary Structure",
 			"Salary Structure Assignment",
 			"Payroll Employee Detail",
@@ -170,6 +177,59 @@ class TestPayrollEntry(FrappeTestCase):
 
 		self.assertEqual(je_entries, expected_je)
 
+	@change_settings("Payroll Settings", {"process_payroll_accounting_entry_based_on_employee": 1})
+	def test_employee_wise_accrual_entry_with_employee_cost_centers(self):
+		department = create_department("Cost Center Test")
+
+		employee1 = make_employee(
+			"test_emp1@example.com",
+			payroll_cost_center="_Test Cost Center - _TC",
+			department=department,
+			company="_Test Company",
+		)
+		employee2 = make_employee(
+			"test_emp2@example.com", department=department, company="_Test Company"
+		)
+
+		# employee2's amounts are split 60/40 between two cost centers
+		create_assignments_with_cost_centers(employee1, employee2)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		pe = make_payroll_entry(
+			start_date=dates.start_date,
+			end_date=dates.end_date,
+			payable_account="_Test Payroll Payable - _TC",
+			currency="INR",
+			department=department,
+			company="_Test Company",
+			payment_account="Cash - _TC",
+			cost_center="Main - _TC",
+		)
+		je = frappe.db.get_value("Salary Slip", {"payroll_entry": pe.name}, "journal_entry")
+		je_entries = frappe.get_all(
+			"Journal Entry Account",
+			filters={"parent": je},
+			fields=["account", "cost_center", "party_type", "party", "debit", "credit"],
+			as_list=True,
+		)
+
+		def sort_key(row):
+			return tuple(d or "" for d in row[:4])
+
+		expected_je = [
+			("_Test Payroll Payable - _TC", "Main - _TC", "Employee", employee1, 0.0, 77800.0),
+			("_Test Payroll Payable - _TC", "Main - _TC", "Employee", employee2, 0.0, 77800.0),
+			# 78000 of employee1 and 60% of 78000 of employee2
+			("Salary - _TC", "_Test Cost Center - _TC", None, None, 124800.0, 0.0),
+			("Salary - _TC", "_Test Cost Center 2 - _TC", None, None, 31200.0, 0.0),
+			("Salary Deductions - _TC", "_Test Cost Center - _TC", None, None, 0.0, 320.0),
+			("Salary Deductions - _TC", "_Test Cost Center 2 - _TC", None, None, 0.0, 80.0),
+		]
+
+		self.assertEqual(
+			sorted((tuple(row) for row in je_entries), key=sort_key), sorted(expected_je, key=sort_key)
+		)
+
 	def test_get_end_date(self):
 		self.assertEqual(get_end_date("2017-01-01", "monthly"), {"end_date": "2017-01-31"})
 		self.assertEqual(get_end_date("2017-02-01", "monthly"), {"end_date": "2017-02-28"})
@@ -202,8 +262,122 @@ class TestPayrollEntry(FrappeTestCase):
 		payroll_entry.reload()
 
 		self.assertEqual(payroll_entry.status, "Queued")
+		self.assertEqual(len(payroll_entry.shards), 1)
+		self.assertEqual(payroll_entry.shards[0].status, "Queued")
+		self.assertEqual(payroll_entry.shards[0].employee_count, len(payroll_entry.employees))
 		frappe.flags.enqueue_payroll_entry = False
 
+		# run the queued shard and check that the status is aggregated back on the entry
+		shard = payroll_entry.shards[0]
+		create_salary_slips_for_shard(
+			payroll_entry.name,
+			shard.name,
+			json.loads(shard.employees),
+			frappe._dict(
+				{
+					"salary_slip_based_on_timesheet": payroll_entry.salary_slip_based_on_timesheet,
+					"payroll_frequency": payroll_entry.payroll_frequency,
+					"start_date": payroll_entry.start_date,
+					"end_date": payroll_entry.end_date,
+					"company": payroll_entry.company,
+					"posting_date": payroll_entry.posting_date,
+					"payroll_entry": payroll_entry.name,
+					"exchange_rate": payroll_entry.exchange_rate,
+					"currency": payroll_entry.currency,
+				}
+			),
+		)
+		payroll_entry.reload()
+
+		self.assertEqual(payroll_entry.shards[0].status, "Completed")
+		self.assertEqual(payroll_entry.status, "Submitted")
+		self.assertTrue(payroll_entry.salary_slips_created)
+
+	def test_get_shards(self):
+		employees = ["EMP-1", "EMP-2", "EMP-3", "EMP-4", "EMP-5"]
+		self.assertEqual(
+			get_shards(employees, 2), [["EMP-1", "EMP-2"], ["EMP-3", "EMP-4"], ["EMP-5"]]
+		)
+		self.assertEqual(get_shards(employees, 0), [employees])
+
+	@change_settings("Payroll Settings", {"salary_slips_per_background_job": 1})
+	def test_salary_slip_creation_in_shards(self):
+		company_doc = frappe.get_doc("Company", "_Test Company")
+		employees = [
+			make_employee(f"test_creation_shard{i}@payroll.com", company=company_doc.name)
+			for i in range(3)
+		]
+		for employee in employees:
+			setup_salary_structure(employee, company_doc)
+
+		payroll_entry = make_sharded_payroll_entry(company_doc)
+		shards = [d for d in payroll_entry.shards if d.process == "Creation"]
+
+		# one shard per chunk of employees
+		self.assertEqual(len(shards), 3)
+		self.assertEqual(
+			sorted(employee for shard in shards for employee in json.loads(shard.employees)),
+			sorted(employees),
+		)
+		self.assertEqual({shard.employee_count for shard in shards}, {1})
+
+		# the entry is marked as created only once its last shard finishes
+		for shard in shards[:-1]:
+			run_creation_shard(payroll_entry, shard)
+			payroll_entry.reload()
+			self.assertEqual(payroll_entry.status, "Queued")
+			self.assertFalse(payroll_entry.salary_slips_created)
+
+		run_creation_shard(payroll_entry, shards[-1])
+		payroll_entry.reload()
+		self.assertEqual(payroll_entry.status, "Submitted")
+		self.assertTrue(payroll_entry.salary_slips_created)
+		self.assertEqual({d.status for d in payroll_entry.shards}, {"Completed"})
+		self.assertEqual(frappe.db.count("Salary Slip", {"payroll_entry": payroll_entry.name}), 3)
+
+	@change_settings("Payroll Settings", {"salary_slips_per_background_job": 1})
+	def test_failed_salary_slip_creation_shard(self):
+		company_doc = frappe.get_doc("Company", "_Test Company")
+		employees = [
+			make_employee(f"test_failed_creation_shard{i}@payroll.com", company=company_doc.name)
+			for i in range(3)
+		]
+		for employee in employees:
+			setup_salary_structure(employee, company_doc)
+
+		payroll_entry = make_sharded_payroll_entry(company_doc)
+		shards = [d for d in payroll_entry.shards if d.process == "Creation"]
+		self.assertEqual(len(shards), 3)
+
+		# creating the salary slip fails for the inactive employee of the second shard
+		failing_employee = json.loads(shards[1].employees)[0]
+		frappe.db.set_value("Employee", failing_employee, "status", "Inactive")
+		frappe.db.commit()  # nosemgrep
+		self.addCleanup(frappe.db.set_value, "Employee", failing_employee, "status", "Active")
+
+		for shard in shards:
+			run_creation_shard(payroll_entry, shard)
+
+		payroll_entry.reload()
+		self.assertEqual(payroll_entry.status, "Failed")
+		self.assertFalse(payroll_entry.salary_slips_created)
+		self.assertTrue(payroll_entry.error_message.startswith(f"Shard #{shards[1].idx}: "))
+		self.assertNotIn(f"Shard #{shards[0].idx}: ", payroll_entry.error_message)
+		self.assertEqual(
+			[d.status for d in payroll_entry.shards if d.process == "Creation"],
+			["Completed", "Failed", "Completed"],
+		)
+
+		# salary slips of the other shards stay committed
+		self.assertEqual(
+			sorted(
+				frappe.get_all(
+					"Salary Slip", filters={"payroll_entry": payroll_entry.name}, pluck="employee"
+				)
+			),
+			sorted(set(employees) - {failing_employee}),
+		)
+
 	def test_salary_slip_operation_failure(self):
 		company = "_Test Company"
 		company_doc = frappe.get_doc("Company", company)
@@ -507,6 +681,256 @@ class TestPayrollEntry(FrappeTestCase):
 		employees = payroll_entry.get_employees_with_unmarked_attendance()
 		self.assertFalse(employees)
 
+	def test_attendance_precheck(self):
+		company = frappe.get_doc("Company", "_Test Company")
+		employee1 = make_employee("test_attendance_precheck1@payroll.com", company=company.name)
+		employee2 = make_employee("test_attendance_precheck2@payroll.com", company=company.name)
+		setup_salary_structure(employee1, company)
+		setup_salary_structure(employee2, company)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		payroll_entry = get_payroll_entry(
+			start_date=dates.start_date,
+			end_date=dates.end_date,
+			payable_account=company.default_payroll_payable_account,
+			currency=company.default_currency,
+			company=company.name,
+		)
+		payroll_entry.validate_attendance = True
+
+		for date in get_date_range(payroll_entry.start_date, payroll_entry.end_date):
+			mark_attendance(employee1, date, "Present", ignore_validate=True)
+
+		precheck = AttendancePrecheck(payroll_entry)
+		result = {d.employee: d for d in precheck.run()}
+		self.assertEqual(result[employee1].unmarked_days, -result[employee1].holidays)
+		self.assertEqual(
+			result[employee2].unmarked_days,
+			result[employee2].payroll_days - result[employee2].holidays,
+		)
+		self.assertEqual(result[employee2].working_days, result[employee2].unmarked_days)
+
+		page = payroll_entry.get_attendance_precheck(start=0, page_length=1)
+		employees = [d.employee for d in precheck.get_unmarked_attendance()]
+		self.assertEqual(page["total"], len(employees))
+		self.assertEqual([d.employee for d in page["data"]], employees[:1])
+		self.assertNotIn(employee1, employees)
+
+		rows = precheck.get_csv_rows()
+		self.assertEqual(len(rows), len(result) + 1)
+
+	def test_salary_slip_with_payroll_run_context(self):
+		company = frappe.get_doc("Company", "_Test Company")
+		employee = make_employee("test_payroll_run_context@payroll.com", company=company.name)
+		setup_salary_structure(employee, company)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		args = frappe._dict(
+			{
+				"company": company.name,
+				"payroll_frequency": "Monthly",
+				"start_date": dates.start_date,
+				"end_date": dates.end_date,
+				"posting_date": dates.end_date,
+				"exchange_rate": 1,
+				"currency": company.default_currency,
+			}
+		)
+		payroll_run_context = PayrollRunContext([employee], args).load()
+
+		def make_salary_slip(payroll_run_context=None):
+			salary_slip = frappe.get_doc(dict(args, doctype="Salary Slip", employee=employee))
+			salary_slip._payroll_run_context = payroll_run_context
+			salary_slip.get_emp_and_working_day_details()
+			return salary_slip
+
+		expected = make_salary_slip()
+		salary_slip = make_salary_slip(payroll_run_context)
+
+		for field in ("salary_structure", "payment_days", "gross_pay", "total_deduction", "net_pay"):
+			self.assertEqual(salary_slip.get(field), expected.get(field))
+
+		for component_type in ("earnings", "deductions"):
+			self.assertEqual(
+				[(d.salary_component, d.amount) for d in salary_slip.get(component_type)],
+				[(d.salary_component, d.amount) for d in expected.get(component_type)],
+			)
+
+	def test_shared_formula_results_in_payroll_run(self):
+		company = frappe.get_doc("Company", "_Test Company")
+		employees = [
+			make_employee("test_shared_results1@payroll.com", company=company.name),
+			make_employee("test_shared_results2@payroll.com", company=company.name),
+		]
+		for employee in employees:
+			setup_salary_structure(employee, company)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		args = frappe._dict(
+			{
+				"company": company.name,
+				"payroll_frequency": "Monthly",
+				"start_date": dates.start_date,
+				"end_date": dates.end_date,
+				"posting_date": dates.end_date,
+				"exchange_rate": 1,
+				"currency": company.default_currency,
+			}
+		)
+		payroll_run_context = PayrollRunContext(employees, args).load()
+
+		salary_slips, evaluated = [], []
+		for employee in employees:
+			salary_slip = frappe.get_doc(dict(args, doctype="Salary Slip", employee=employee))
+			salary_slip._payroll_run_context = payroll_run_context
+			salary_slip.get_emp_and_working_day_details()
+			salary_slips.append(salary_slip)
+			evaluated.append(len(payroll_run_context.expression_results))
+
+		# both employees have the same base and payment days, so the second slip reuses all results
+		self.assertTrue(evaluated[0])
+		self.assertEqual(evaluated[0], evaluated[1])
+		self.assertEqual(
+			[(d.salary_component, d.amount) for d in salary_slips[0].earnings],
+			[(d.salary_component, d.amount) for d in salary_slips[1].earnings],
+		)
+
+	def test_refresh_stale_salary_slips(self):
+		company_doc = frappe.get_doc("Company", "_Test Company")
+		employee = make_employee("test_stale_salary_slips@payroll.com", company=company_doc.name)
+		setup_salary_structure(employee, company_doc)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		payroll_entry = get_payroll_entry(
+			start_date=dates.start_date,
+			end_date=dates.end_date,
+			payable_account=company_doc.default_payroll_payable_account,
+			currency=company_doc.default_currency,
+			company=company_doc.name,
+		)
+		payroll_entry.submit()
+
+		salary_slip = frappe.db.get_value(
+			"Salary Slip",
+			{"employee": employee, "payroll_entry": payroll_entry.name},
+			["name", "gross_pay", "is_stale"],
+			as_dict=True,
+		)
+		self.assertFalse(salary_slip.is_stale)
+
+		frappe.get_doc(
+			{
+				"doctype": "Additional Salary",
+				"employee": employee,
+				"company": company_doc.name,
+				"salary_component": "Arrear",
+				"payroll_date": dates.start_date,
+				"amount": 1000,
+				"type": "Earning",
+				"currency": company_doc.default_currency,
+			}
+		).submit()
+		self.assertTrue(frappe.db.get_value("Salary Slip", salary_slip.name, "is_stale"))
+
+		payroll_entry.refresh_stale_salary_slips()
+		refreshed = frappe.db.get_value(
+			"Salary Slip", salary_slip.name, ["gross_pay", "is_stale"], as_dict=True
+		)
+		self.assertFalse(refreshed.is_stale)
+		self.assertEqual(refreshed.gross_pay, salary_slip.gross_pay + 1000)
+
+	@change_settings("Payroll Settings", {"email_salary_slip_to_employee": 1})
+	def test_salary_slip_email_status(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip_email import set_email_status
+
+		company_doc = frappe.get_doc("Company", "_Test Company")
+		employee = make_employee("test_salary_slip_email_status@payroll.com", company=company_doc.name)
+		frappe.db.set_value("Employee", employee, "prefered_email", None)
+		setup_salary_structure(employee, company_doc)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		payroll_entry = get_payroll_entry(
+			start_date=dates.start_date,
+			end_date=dates.end_date,
+			payable_account=company_doc.default_payroll_payable_account,
+			currency=company_doc.default_currency,
+			company=company_doc.name,
+		)
+		payroll_entry.submit()
+
+		# emails are sent after submission, employees without an email are not sent one
+		salary_slip = frappe.db.get_value(
+			"Salary Slip", {"employee": employee, "payroll_entry": payroll_entry.name}
+		)
+		self.assertEqual(frappe.db.get_value("Salary Slip", salary_slip, "email_status"), "Not Sent")
+
+		# salary slips whose emails are already queued are not emailed again
+		set_email_status([salary_slip], "Email Queued")
+		frappe.db.set_value("Employee", employee, "prefered_email", "test_salary_slip@payroll.com")
+		payroll_entry.email_salary_slip(payroll_entry.get_sal_slip_list(ss_status=1, as_dict=True))
+		self.assertEqual(frappe.db.get_value("Salary Slip", salary_slip, "email_status"), "Email Queued")
+		self.assertFalse(
+			frappe.db.exists(
+				"Email Queue", {"reference_doctype": "Salary Slip", "reference_name": salary_slip}
+			)
+		)
+
+		# emails are queued for employees with an email, delivery is left to the Email Queue
+		set_email_status([salary_slip], "Not Sent")
+		payroll_entry.email_salary_slip(payroll_entry.get_sal_slip_list(ss_status=1, as_dict=True))
+		self.assertEqual(frappe.db.get_value("Salary Slip", salary_slip, "email_status"), "Email Queued")
+		self.assertTrue(
+			frappe.db.exists(
+				"Email Queue", {"reference_doctype": "Salary Slip", "reference_name": salary_slip}
+			)
+		)
+
+	def test_resume_salary_slip_submission(self):
+		company = frappe.get_doc("Company", "_Test Company")
+		employee1 = make_employee("test_resume_submission1@payroll.com", company=company.name)
+		employee2 = make_employee("test_resume_submission2@payroll.com", company=company.name)
+		setup_salary_structure(employee1, company)
+		setup_salary_structure(employee2, company, salary_structure="_Test Salary Structure 2")
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		payroll_entry = get_payroll_entry(
+			start_date=dates.start_date,
+			end_date=dates.end_date,
+			payable_account=company.default_payroll_payable_account,
+			currency=company.default_currency,
+			company=company.name,
+			cost_center="Main - _TC",
+		)
+		payroll_entry.submit()
+
+		# slip checkpointed by an earlier run that failed before making the accrual entry
+		frappe.get_doc("Salary Slip", {"payroll_entry": payroll_entry.name, "employee": employee1}).submit()
+		# shard of the earlier run whose worker was killed
+		payroll_entry.add_shard("Submission", salary_slips=[], status="Running")
+
+		payroll_entry.submit_salary_slips()
+		payroll_entry.reload()
+
+		salary_slips = frappe.get_all(
+			"Salary Slip",
+			filters={"payroll_entry": payroll_entry.name, "employee": ("in", [employee1, employee2])},
+			fields=["docstatus", "journal_entry"],
+		)
+		self.assertEqual({d.docstatus for d in salary_slips}, {1})
+		# accrual entry is built once for the checkpointed and the newly submitted slips
+		self.assertEqual(len({d.journal_entry for d in salary_slips}), 1)
+		self.assertTrue(salary_slips[0].journal_entry)
+
+		submission_shards = [d for d in payroll_entry.shards if d.process == "Submission"]
+		self.assertTrue(submission_shards)
+		self.assertEqual({d.status for d in submission_shards}, {"Completed"})
+		self.assertNotIn(
+			frappe.db.get_value(
+				"Salary Slip", {"payroll_entry": payroll_entry.name, "employee": employee1}
+			),
+			json.loads(submission_shards[0].salary_slips),
+		)
+
 
 def get_payroll_entry(**args):
 	args = frappe._dict(args)
@@ -549,6 +973,38 @@ def make_payroll_entry(**args):
 	return payroll_entry
 
 
+def make_sharded_payroll_entry(company_doc):
+	"""Submits a Payroll Entry for the current month, queueing salary slip creation in shards"""
+	dates = get_start_end_dates("Monthly", nowdate())
+	payroll_entry = get_payroll_entry(
+		start_date=dates.start_date,
+		end_date=dates.end_date,
+		payable_account=company_doc.default_payroll_payable_account,
+		currency=company_doc.default_currency,
+		company=company_doc.name,
+		cost_center="Main - _TC",
+	)
+
+	frappe.flags.enqueue_payroll_entry = True
+	try:
+		payroll_entry.submit()
+	finally:
+		frappe.flags.enqueue_payroll_entry = False
+
+	payroll_entry.reload()
+	return payroll_entry
+
+
+def run_creation_shard(payroll_entry, shard):
+	"""Runs the job creating salary slips for the shard, like the background worker would"""
+	create_salary_slips_for_shard(
+		payroll_entry.name,
+		shard.name,
+		json.loads(shard.employees),
+		payroll_entry.get_salary_slip_args(),
+	)
+
+
 def get_payment_account():
 	return frappe.get_value(
 		"Account",
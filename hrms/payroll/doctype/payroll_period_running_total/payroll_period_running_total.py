@@ -0,0 +1,246 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder.functions import Count, Max, Sum
+from frappe.utils import cint, flt, getdate
+
+COMPONENT_TYPES = {"earnings": "Earning", "deductions": "Deduction"}
+
+
+class PayrollPeriodRunningTotal(Document):
+	def covers(self, date) -> bool:
+		"""Returns True if every salary slip included in the totals ends on or before `date`"""
+		return not self.last_salary_slip_end_date or getdate(self.last_salary_slip_end_date) <= getdate(
+			date
+		)
+
+	def get_amount(
+		self,
+		parentfield,
+		salary_component=None,
+		is_tax_applicable=None,
+		is_flexible_benefit=None,
+		exempted_from_income_tax=0,
+		variable_based_on_taxable_salary=0,
+		field_to_select="amount",
+	) -> float:
+		"""Returns the total of component rows matching the filters.
+		Filters mirror the ones applied on Salary Detail rows by `SalarySlip.get_salary_slip_details`"""
+		component_type = COMPONENT_TYPES[parentfield]
+		amount = 0.0
+
+		for row in self.components:
+			if row.component_type != component_type:
+				continue
+			if salary_component and row.salary_component != salary_component:
+				continue
+			if is_tax_applicable is not None and cint(row.is_tax_applicable) != cint(is_tax_applicable):
+				continue
+			if is_flexible_benefit is not None and cint(row.is_flexible_benefit) != cint(
+				is_flexible_benefit
+			):
+				continue
+			if exempted_from_income_tax and not row.exempted_from_income_tax:
+				continue
+			if variable_based_on_taxable_salary and not row.variable_based_on_taxable_salary:
+				continue
+
+			amount += flt(row.get(field_to_select))
+
+		return amount
+
+	def get_component_total(self, salary_component) -> float:
+		return flt(self.get_component_totals().get(salary_component))
+
+	def get_component_totals(self) -> dict:
+		"""Returns total amount of each salary component across earnings and deductions"""
+		totals = {}
+		for row in self.components:
+			totals[row.salary_component] = totals.get(row.salary_component, 0.0) + flt(row.amount)
+
+		return totals
+
+	def refresh_totals(self, start_date, end_date):
+		"""Recomputes the totals from the submitted salary slips of the employee within the dates"""
+		ss = frappe.qb.DocType("Salary Slip")
+		sd = frappe.qb.DocType("Salary Detail")
+
+		conditions = (
+			(ss.docstatus == 1)
+			& (ss.employee == self.employee)
+			& (ss.start_date >= start_date)
+			& (ss.end_date <= end_date)
+		)
+
+		totals = (
+			frappe.qb.from_(ss)
+			.select(
+				Count(ss.name).as_("salary_slip_count"),
+				Max(ss.end_date).as_("last_salary_slip_end_date"),
+				Sum(ss.gross_pay).as_("gross_pay"),
+				Sum(ss.base_gross_pay).as_("base_gross_pay"),
+				Sum(ss.net_pay).as_("net_pay"),
+			)
+			.where(conditions)
+		).run(as_dict=True)[0]
+
+		self.salary_slip_count = cint(totals.salary_slip_count)
+		self.last_salary_slip_end_date = totals.last_salary_slip_end_date
+		self.gross_pay = flt(totals.gross_pay)
+		self.base_gross_pay = flt(totals.base_gross_pay)
+		self.net_pay = flt(totals.net_pay)
+
+		components = (
+			frappe.qb.from_(ss)
+			.join(sd)
+			.on(sd.parent == ss.name)
+			.select(
+				sd.salary_component,
+				sd.parentfield,
+				sd.is_tax_applicable,
+				sd.is_flexible_benefit,
+				sd.exempted_from_income_tax,
+				sd.variable_based_on_taxable_salary,
+				Sum(sd.amount).as_("amount"),
+				Sum(sd.additional_amount).as_("additional_amount"),
+			)
+			.where(conditions & (sd.parenttype == "Salary Slip"))
+			.groupby(
+				sd.salary_component,
+				sd.parentfield,
+				sd.is_tax_applicable,
+				sd.is_flexible_benefit,
+				sd.exempted_from_income_tax,
+				sd.variable_based_on_taxable_salary,
+			)
+			.orderby(sd.parentfield)
+			.orderby(sd.salary_component)
+		).run(as_dict=True)
+
+		self.set("components", [])
+		for row in components:
+			if row.parentfield not in COMPONENT_TYPES:
+				continue
+
+			self.append(
+				"components",
+				{
+					"salary_component": row.salary_component,
+					"component_type": COMPONENT_TYPES[row.parentfield],
+					"is_tax_applicable": cint(row.is_tax_applicable),
+					"is_flexible_benefit": cint(row.is_flexible_benefit),
+					"exempted_from_income_tax": cint(row.exempted_from_income_tax),
+					"variable_based_on_taxable_salary": cint(row.variable_based_on_taxable_salary),
+					"amount": flt(row.amount),
+					"additional_amount": flt(row.additional_amount),
+				},
+			)
+
+
+def update_running_total(employee: str, payroll_period: dict) -> None:
+	"""Recomputes the running total of the employee for the payroll period.
+	`payroll_period` is the dict returned by `get_payroll_period`"""
+	name = frappe.db.get_value(
+		"Payroll Period Running Total",
+		{"employee": employee, "payroll_period": payroll_period.name},
+		for_update=True,
+	)
+
+	if name:
+		doc = frappe.get_doc("Payroll Period Running Total", name)
+	else:
+		doc = frappe.new_doc("Payroll Period Running Total")
+		doc.employee = employee
+		doc.payroll_period = payroll_period.name
+		doc.company = frappe.db.get_value("Payroll Period", payroll_period.name, "company")
+
+	doc.refresh_totals(payroll_period.start_date, payroll_period.end_date)
+	doc.flags.ignore_permissions = True
+	doc.save()
+
+
+def get_payroll_period_running_totals(employees: list[str], payroll_period: str) -> dict:
+	"""Returns running totals of the employees for the payroll period, indexed by employee"""
+	if not employees or not payroll_period:
+		return {}
+
+	running_totals = frappe.get_all(
+		"Payroll Period Running Total",
+		filters={"employee": ("in", employees), "payroll_period": payroll_period},
+		fields=["*"],
+	)
+	if not running_totals:
+		return {}
+
+	components = frappe.get_all(
+		"Payroll Period Component Total",
+		filters={
+			"parent": ("in", [d.name for d in running_totals]),
+			"parenttype": "Payroll Period Running Total",
+		},
+		fields=["*"],
+		order_by="idx",
+	)
+
+	components_by_parent = {}
+	for row in components:
+		components_by_parent.setdefault(row.parent, []).append(row)
+
+	return {
+		d.employee: frappe.get_doc(
+			{
+				**d,
+				"doctype": "Payroll Period Running Total",
+				"components": components_by_parent.get(d.name, []),
+			}
+		)
+		for d in running_totals
+	}
+
+
+def rebuild_payroll_period_running_totals(
+	company: str | None = None, payroll_period: str | None = None, employee: str | None = None
+) -> int:
+	"""Rebuilds running totals from the submitted salary slips. Returns the number of totals rebuilt"""
+	filters = {}
+	if company:
+		filters["company"] = company
+	if payroll_period:
+		filters["name"] = payroll_period
+
+	rebuilt = 0
+	for period in frappe.get_all(
+		"Payroll Period", filters=filters, fields=["name", "company", "start_date", "end_date"]
+	):
+		employee_filters = {"employee": employee} if employee else {}
+
+		employees = set(
+			frappe.get_all(
+				"Salary Slip",
+				filters={
+					"docstatus": 1,
+					"company": period.company,
+					"start_date": (">=", period.start_date),
+					"end_date": ("<=", period.end_date),
+					**employee_filters,
+				},
+				pluck="employee",
+				distinct=True,
+			)
+		)
+		# refresh existing totals as well, in case their salary slips no longer exist
+		employees.update(
+			frappe.get_all(
+				"Payroll Period Running Total",
+				filters={"payroll_period": period.name, **employee_filters},
+				pluck="employee",
+			)
+		)
+
+		for emp in sorted(employees):
+			update_running_total(emp, period)
+			rebuilt += 1
+
+	return rebuilt
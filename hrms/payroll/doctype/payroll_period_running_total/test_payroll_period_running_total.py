@@ -0,0 +1,131 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_months, flt, getdate
+
+from erpnext.setup.doctype.employee.test_employee import make_employee
+
+from hrms.payroll.doctype.employee_tax_exemption_declaration.test_employee_tax_exemption_declaration import (
+	create_payroll_period,
+)
+from hrms.payroll.doctype.payroll_period_running_total.payroll_period_running_total import (
+	get_payroll_period_running_totals,
+	rebuild_payroll_period_running_totals,
+)
+from hrms.payroll.doctype.salary_slip.test_salary_slip import (
+	create_salary_slips_for_payroll_period,
+	create_tax_slab,
+	setup_test,
+)
+from hrms.payroll.doctype.salary_structure.salary_structure import make_salary_slip
+from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+
+
+class TestPayrollPeriodRunningTotal(FrappeTestCase):
+	def setUp(self):
+		setup_test()
+
+		self.employee = make_employee("test_running_total@salary.com", company="_Test Company")
+		self.payroll_period = create_payroll_period(name="_Test Payroll Period", company="_Test Company")
+		create_tax_slab(
+			self.payroll_period,
+			allow_tax_exemption=True,
+			currency="INR",
+			effective_date=getdate("2019-04-01"),
+			company="_Test Company",
+		)
+		self.salary_structure = make_salary_structure(
+			"Monthly Salary Structure Test for Running Totals",
+			"Monthly",
+			employee=self.employee,
+			company="_Test Company",
+			currency="INR",
+			payroll_period=self.payroll_period,
+		)
+
+	def get_running_total(self):
+		return get_payroll_period_running_totals([self.employee], self.payroll_period.name).get(
+			self.employee
+		)
+
+	def test_running_total_on_submit_and_cancel(self):
+		create_salary_slips_for_payroll_period(
+			self.employee, self.salary_structure.name, self.payroll_period, deduct_random=False, num=3
+		)
+
+		slips = frappe.get_all(
+			"Salary Slip",
+			filters={"employee": self.employee, "docstatus": 1},
+			fields=["name", "gross_pay", "net_pay", "end_date"],
+			order_by="end_date",
+		)
+		running_total = self.get_running_total()
+
+		self.assertEqual(running_total.salary_slip_count, 3)
+		self.assertEqual(getdate(running_total.last_salary_slip_end_date), getdate(slips[-1].end_date))
+		self.assertEqual(flt(running_total.net_pay), sum(flt(d.net_pay) for d in slips))
+
+		basic = frappe.get_all(
+			"Salary Detail",
+			filters={"parent": ("in", [d.name for d in slips]), "salary_component": "Basic Salary"},
+			pluck="amount",
+		)
+		self.assertEqual(running_total.get_component_total("Basic Salary"), sum(basic))
+
+		frappe.get_doc("Salary Slip", slips[-1].name).cancel()
+		running_total = self.get_running_total()
+
+		self.assertEqual(running_total.salary_slip_count, 2)
+		self.assertEqual(getdate(running_total.last_salary_slip_end_date), getdate(slips[1].end_date))
+		self.assertEqual(flt(running_total.net_pay), sum(flt(d.net_pay) for d in slips[:2]))
+
+	def test_salary_slip_details_from_running_total(self):
+		create_salary_slips_for_payroll_period(
+			self.employee, self.salary_structure.name, self.payroll_period, deduct_random=False, num=2
+		)
+
+		posting_date = add_months(self.payroll_period.start_date, 2)
+		slip = make_salary_slip(
+			self.salary_structure.name,
+			employee=self.employee,
+			posting_date=posting_date,
+		)
+		self.assertTrue(slip.get_payroll_period_running_total(slip.start_date))
+
+		args = (self.payroll_period.start_date, slip.start_date)
+		from_running_total = (
+			slip.get_salary_slip_details(*args, parentfield="earnings", is_tax_applicable=1),
+			slip.get_salary_slip_details(
+				*args, parentfield="deductions", variable_based_on_taxable_salary=1
+			),
+		)
+
+		# totals not covering the dates are not used
+		slip._payroll_period_running_total.last_salary_slip_end_date = slip.end_date
+		self.assertIsNone(slip.get_payroll_period_running_total(slip.start_date))
+
+		from_salary_slips = (
+			slip.get_salary_slip_details(*args, parentfield="earnings", is_tax_applicable=1),
+			slip.get_salary_slip_details(
+				*args, parentfield="deductions", variable_based_on_taxable_salary=1
+			),
+		)
+		self.assertEqual(from_running_total, from_salary_slips)
+
+	def test_rebuild_running_totals(self):
+		create_salary_slips_for_payroll_period(
+			self.employee, self.salary_structure.name, self.payroll_period, deduct_random=False, num=2
+		)
+		expected = self.get_running_total()
+
+		frappe.db.delete("Payroll Period Running Total", {"employee": self.employee})
+		self.assertIsNone(self.get_running_total())
+
+		rebuild_payroll_period_running_totals(payroll_period=self.payroll_period.name)
+		running_total = self.get_running_total()
+
+		self.assertEqual(running_total.salary_slip_count, expected.salary_slip_count)
+		self.assertEqual(flt(running_total.gross_pay), flt(expected.gross_pay))
+		self.assertEqual(len(running_total.components), len(expected.components))
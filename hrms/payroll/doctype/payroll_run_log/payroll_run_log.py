@@ -0,0 +1,281 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and contributors
+# For license information, please see license.txt
+
+import inspect
+import math
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import now, now_datetime
+
+# salary slips recorded per phase, slowest first
+SLOWEST_SALARY_SLIPS = 10
+
+
+class PayrollRunLog(Document):
+	pass
+
+
+class QueryCounter:
+	"""Counts the queries run through `frappe.db.sql` while active"""
+
+	def __init__(self):
+		self.count = 0
+		self.db = None
+		self.sql = None
+
+	def __enter__(self) -> "QueryCounter":
+		# the connection is kept, so that its method is restored even if the site reconnects
+		self.db = frappe.db
+		self.sql = sql = self.db.sql
+
+		def counted_sql(*args, **kwargs):
+			self.count += 1
+			return sql(*args, **kwargs)
+
+		self.db.sql = counted_sql
+		return self
+
+	def __exit__(self, *args):
+		if self.db:
+			self.db.sql = self.sql
+			self.db = None
+
+
+class PayrollPhaseLog:
+	"""Measures a phase of a Payroll Entry run and adds it to the entry's Payroll Run Log.
+
+	Phases run within other phases (eg: the accrual journal entry made while submitting salary slips)
+	are recorded on their own and excluded from the outer phase. Salary slips processed in the phase
+	are measured with `measure_salary_slip`, for their percentiles and the slowest ones.
+
+	Failed phases are recorded once the current transaction is committed or rolled back, in a
+	transaction of their own, since the failure may roll back changes made with the phase.
+	"""
+
+	def __init__(self, payroll_entry: str, phase: str):
+		self.payroll_entry = payroll_entry
+		self.phase = phase
+		self.error_message = None
+		self.salary_slips = []
+		self.nested_duration = 0
+		self.nested_query_count = 0
+		self.queries = QueryCounter()
+
+	def __enter__(self) -> "PayrollPhaseLog":
+		self.parent = get_current_phase_log()
+		self.parent_query_count = self.parent.queries.count if self.parent else 0
+		frappe.local.payroll_phase_log = self
+
+		self.started_at = now_datetime()
+		self.started = time.perf_counter()
+		self.queries.__enter__()
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		frappe.local.payroll_phase_log = self.parent
+		try:
+			self.record(exc_type, exc_value)
+		finally:
+			# `frappe.db.sql` is restored even if recording the phase fails
+			self.queries.__exit__()
+
+	def record(self, exc_type, exc_value):
+		duration = time.perf_counter() - self.started - self.nested_duration
+		query_count = self.queries.count - self.nested_query_count
+
+		if exc_type:
+			self.error_message = str(exc_value)
+
+		if self.error_message:
+			self.save_after_transaction(duration, query_count)
+		else:
+			self.save_or_log_error(duration, query_count)
+
+		if self.parent:
+			# including the time and queries taken to save this phase
+			self.parent.nested_duration += time.perf_counter() - self.started
+			self.parent.nested_query_count += self.parent.queries.count - self.parent_query_count
+
+	@contextmanager
+	def measure_salary_slip(self, employee: str):
+		started = time.perf_counter()
+		query_count = self.queries.count
+		salary_slip = frappe._dict(employee=employee, salary_structure=None)
+
+		try:
+			yield salary_slip
+		finally:
+			salary_slip.duration = time.perf_counter() - started
+			salary_slip.query_count = self.queries.count - query_count
+			self.salary_slips.append(salary_slip)
+
+	def save_after_transaction(self, duration: float, query_count: int):
+		saved = False
+
+		def save():
+			nonlocal saved
+			# registered for both commit and rollback, only one of which runs for the transaction
+			if saved:
+				return
+
+			saved = True
+			self.save_or_log_error(duration, query_count)
+			frappe.db.commit()  # nosemgrep
+
+		frappe.db.after_commit.add(save)
+		frappe.db.after_rollback.add(save)
+
+	def save_or_log_error(self, duration: float, query_count: int):
+		try:
+			self.save(duration, query_count)
+		except Exception:
+			frappe.log_error(
+				title=_("Payroll Run Log could not be updated for Payroll Entry {0}").format(
+					self.payroll_entry
+				)
+			)
+
+	def save(self, duration: float, query_count: int):
+		log = get_payroll_run_log(self.payroll_entry)
+		durations = sorted(d.duration for d in self.salary_slips)
+
+		add_row(
+			log,
+			"phases",
+			{
+				"phase": self.phase,
+				"status": "Failed" if self.error_message else "Completed",
+				"started_at": self.started_at,
+				"duration": duration,
+				"query_count": query_count,
+				"salary_slip_count": len(self.salary_slips),
+				"p50_duration": get_percentile(durations, 50),
+				"p95_duration": get_percentile(durations, 95),
+				"error_message": self.error_message,
+			},
+		)
+
+		slowest = sorted(self.salary_slips, key=lambda d: d.duration, reverse=True)
+		for salary_slip in slowest[:SLOWEST_SALARY_SLIPS]:
+			add_row(
+				log,
+				"salary_slips",
+				{
+					"phase": self.phase,
+					"employee": salary_slip.employee,
+					"salary_structure": salary_slip.salary_structure,
+					"duration": salary_slip.duration,
+					"query_count": salary_slip.query_count,
+				},
+			)
+
+
+def log_payroll_phase(phase: str, get_payroll_entry=None):
+	"""Decorator recording the function's runs as a phase of the Payroll Entry it runs for.
+
+	Args:
+	        phase (str): phase of the Payroll Run Log
+	        get_payroll_entry (callable): returns the Payroll Entry (name or document) from the
+	        function's arguments, defaults to the `self` or `payroll_entry` argument
+	"""
+
+	def decorator(function):
+		signature = inspect.signature(function)
+
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			arguments = signature.bind_partial(*args, **kwargs).arguments
+			if get_payroll_entry:
+				payroll_entry = get_payroll_entry(arguments)
+			else:
+				payroll_entry = arguments.get("self") or arguments.get("payroll_entry")
+
+			if not isinstance(payroll_entry, str):
+				# unsaved entries have nothing to link the log to
+				payroll_entry = None if not payroll_entry or payroll_entry.is_new() else payroll_entry.name
+
+			if not payroll_entry:
+				return function(*args, **kwargs)
+
+			with PayrollPhaseLog(payroll_entry, phase):
+				return function(*args, **kwargs)
+
+		return wrapper
+
+	return decorator
+
+
+@contextmanager
+def measure_salary_slip(employee: str):
+	"""Measures the processing of an employee's salary slip within the current phase, if any"""
+	if phase_log := get_current_phase_log():
+		with phase_log.measure_salary_slip(employee) as salary_slip:
+			yield salary_slip
+	else:
+		yield frappe._dict(employee=employee)
+
+
+def get_current_phase_log() -> PayrollPhaseLog | None:
+	return getattr(frappe.local, "payroll_phase_log", None)
+
+
+def set_phase_failed(error_message: str) -> None:
+	"""Marks the current phase as failed, for failures handled within the phase"""
+	if phase_log := get_current_phase_log():
+		phase_log.error_message = error_message
+
+
+def get_payroll_run_log(payroll_entry: str) -> str:
+	if frappe.db.exists("Payroll Run Log", payroll_entry):
+		return payroll_entry
+
+	try:
+		frappe.get_doc(
+			{
+				"doctype": "Payroll Run Log",
+				"payroll_entry": payroll_entry,
+				"company": frappe.db.get_value("Payroll Entry", payroll_entry, "company"),
+			}
+		).insert(ignore_permissions=True)
+	except frappe.DuplicateEntryError:
+		# created by a job running another shard of the entry
+		pass
+
+	return payroll_entry
+
+
+def add_row(log: str, parentfield: str, values: dict) -> None:
+	"""Inserts a row without saving the log, so that concurrent jobs do not update the same log"""
+	doctype = frappe.get_meta("Payroll Run Log").get_field(parentfield).options
+	timestamp = now()
+	# rows of concurrent jobs are numbered one after the other
+	frappe.db.get_value("Payroll Run Log", log, "name", for_update=True)
+
+	row = frappe.get_doc(
+		{
+			"doctype": doctype,
+			"parent": log,
+			"parenttype": "Payroll Run Log",
+			"parentfield": parentfield,
+			"idx": frappe.db.count(doctype, {"parent": log, "parentfield": parentfield}) + 1,
+			"owner": frappe.session.user,
+			"modified_by": frappe.session.user,
+			"creation": timestamp,
+			"modified": timestamp,
+			**values,
+		}
+	)
+	row.db_insert()
+
+
+def get_percentile(values: list[float], percentile: int) -> float:
+	"""Returns the nearest-rank percentile of sorted values"""
+	if not values:
+		return 0
+
+	return values[max(math.ceil(percentile * len(values) / 100), 1) - 1]
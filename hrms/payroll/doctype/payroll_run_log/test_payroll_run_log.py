@@ -0,0 +1,135 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from erpnext.setup.doctype.employee.test_employee import make_employee
+
+from hrms.payroll.doctype.payroll_entry.payroll_entry import get_start_end_dates
+from hrms.payroll.doctype.payroll_entry.test_payroll_entry import (
+	make_payroll_entry,
+	setup_salary_structure,
+)
+from hrms.payroll.doctype.payroll_run_log.payroll_run_log import (
+	PayrollPhaseLog,
+	get_percentile,
+	measure_salary_slip,
+)
+
+
+class TestPayrollRunLog(FrappeTestCase):
+	def setUp(self):
+		for dt in ["Salary Slip", "Payroll Entry", "Payroll Run Log"]:
+			frappe.db.delete(dt)
+
+	def test_phases_of_payroll_run(self):
+		company = frappe.get_doc("Company", "_Test Company")
+		employee = make_employee("test_payroll_run_log@payroll.com", company=company.name)
+		setup_salary_structure(employee, company)
+
+		dates = get_start_end_dates("Monthly", nowdate())
+		payroll_entry = make_payroll_entry(
+			start_date=dates.start_date,
+			end_date=dates.end_date,
+			payable_account=company.default_payroll_payable_account,
+			currency=company.default_currency,
+			company=company.name,
+		)
+
+		log = frappe.get_doc("Payroll Run Log", payroll_entry.name)
+		phases = {d.phase: d for d in log.phases}
+		for phase in (
+			"Salary Slip Creation",
+			"Salary Slip Submission",
+			"Accrual Journal Entry",
+			"Bank Entry",
+		):
+			self.assertEqual(phases[phase].status, "Completed")
+			self.assertGreater(phases[phase].query_count, 0)
+
+		self.assertGreaterEqual(phases["Salary Slip Creation"].salary_slip_count, 1)
+		self.assertIn(employee, [d.employee for d in log.salary_slips])
+
+	def test_nested_phases(self):
+		payroll_entry = frappe.new_doc("Payroll Entry")
+		payroll_entry.update(
+			{"company": "_Test Company", "posting_date": nowdate(), "payroll_frequency": "Monthly"}
+		)
+		payroll_entry.name = name = "_Test Payroll Entry for Run Log"
+		payroll_entry.db_insert()
+
+		with PayrollPhaseLog(name, "Salary Slip Submission"):
+			frappe.db.sql("select 1")
+			with measure_salary_slip("_T-Employee-00001"):
+				frappe.db.sql("select 1")
+
+			with PayrollPhaseLog(name, "Accrual Journal Entry"):
+				frappe.db.sql("select 1")
+				frappe.db.sql("select 1")
+
+		phases = {d.phase: d for d in frappe.get_doc("Payroll Run Log", name).phases}
+		# queries of the nested phase are excluded from the outer one
+		self.assertEqual(phases["Salary Slip Submission"].query_count, 2)
+		self.assertEqual(phases["Salary Slip Submission"].salary_slip_count, 1)
+		self.assertEqual(phases["Accrual Journal Entry"].query_count, 2)
+
+	def test_percentile(self):
+		values = [0.1 * i for i in range(1, 21)]
+		self.assertAlmostEqual(get_percentile(values, 50), 1.0)
+		self.assertAlmostEqual(get_percentile(values, 95), 1.9)
+		self.assertEqual(get_percentile([], 50), 0)
+
+
+class TestPayrollPhaseLogAfterRollback(FrappeTestCase):
+	"""Failed phases are saved after the transaction is rolled back, so the entry they belong to is
+	committed. Tables are not cleared like in other tests, to not commit their deletion too."""
+
+	entry = "_Test Payroll Entry for Failed Phase"
+
+	def setUp(self):
+		self.delete_entry()
+
+		payroll_entry = frappe.new_doc("Payroll Entry")
+		payroll_entry.update(
+			{"company": "_Test Company", "posting_date": nowdate(), "payroll_frequency": "Monthly"}
+		)
+		payroll_entry.name = self.entry
+		payroll_entry.db_insert()
+		frappe.db.commit()  # nosemgrep
+
+		self.addCleanup(self.delete_entry)
+
+	def delete_entry(self):
+		for doctype in ("Payroll Run Log Phase", "Payroll Run Log Salary Slip"):
+			frappe.db.delete(doctype, {"parent": self.entry, "parenttype": "Payroll Run Log"})
+		frappe.db.delete("Payroll Run Log", self.entry)
+		frappe.db.delete("Payroll Entry", self.entry)
+		frappe.db.commit()  # nosemgrep
+
+	def test_failed_nested_phase_after_rollback(self):
+		name = self.entry
+		with PayrollPhaseLog(name, "Salary Slip Submission"):
+			try:
+				with PayrollPhaseLog(name, "Accrual Journal Entry"):
+					raise frappe.ValidationError("Accrual failed")
+			except frappe.ValidationError:
+				# failures are rolled back by the outer phase
+				frappe.db.rollback()
+
+		phases = {d.phase: d for d in frappe.get_doc("Payroll Run Log", name).phases}
+		self.assertEqual(phases["Accrual Journal Entry"].status, "Failed")
+		self.assertEqual(phases["Accrual Journal Entry"].error_message, "Accrual failed")
+		self.assertEqual(phases["Salary Slip Submission"].status, "Completed")
+		self.assertEqual(sorted(d.idx for d in phases.values()), [1, 2])
+
+	def test_query_counting_restored_when_phase_fails(self):
+		sql = frappe.db.sql
+		with self.assertRaises(frappe.ValidationError):
+			with PayrollPhaseLog(self.entry, "Salary Slip Submission"):
+				with PayrollPhaseLog(self.entry, "Accrual Journal Entry"):
+					raise frappe.ValidationError("Accrual failed")
+
+		self.assertEqual(frappe.db.sql, sql)
+		frappe.db.rollback()
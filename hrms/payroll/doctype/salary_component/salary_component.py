@@ -13,6 +13,9 @@ class SalaryComponent(Document):
 	def on_update(self):
 		self.invalidate_cache()
 
+	def on_trash(self):
+		self.invalidate_cache()
+
 	def validate_abbr(self):
 		if not self.salary_component_abbr:
 			self.salary_component_abbr = "".join([c[0] for c in self.salary_component.split()]).upper()
@@ -27,4 +30,4 @@ class SalaryComponent(Document):
 		)
 
 	def invalidate_cache(self):
-		frappe.cache().delete_value("tax_components")
+		frappe.cache().delete_value(["tax_components", "salary_component_abbreviation_seed"])
@@ -2,6 +2,7 @@
 # License: GNU General Public License v3. See license.txt
 
 
+from collections import ChainMap
 from datetime import date
 
 import frappe
@@ -39,17 +40,36 @@ from hrms.payroll.doctype.employee_benefit_claim.employee_benefit_claim import (
 	get_benefit_claim_amount,
 	get_last_payroll_period_benefits,
 )
+from hrms.payroll.doctype.income_tax_slab.income_tax_slab import get_income_tax_slab_evaluator
 from hrms.payroll.doctype.payroll_entry.payroll_entry import get_start_end_dates
 from hrms.payroll.doctype.payroll_period.payroll_period import (
 	get_payroll_period,
 	get_period_factor,
 )
+from hrms.payroll.doctype.payroll_period_running_total.payroll_period_running_total import (
+	get_payroll_period_running_totals,
+	update_running_total,
+)
 from hrms.payroll.doctype.salary_slip.salary_slip_loan_utils import (
 	cancel_loan_repayment_entry,
 	make_loan_repayment_entry,
 	set_loan_repayment,
 )
-from hrms.payroll.utils import sanitize_expression
+from hrms.payroll.utils import (
+	get_compiled_condition_and_formula,
+	get_component_dependency_graph,
+	get_structure_referenced_names,
+	safe_eval_compiled,
+)
+
+# fields set from attendance and leaves, read by the formulas of components
+WORKING_DAYS_FIELDS = (
+	"total_working_days",
+	"payment_days",
+	"leave_without_pay",
+	"absent_days",
+	"unmarked_days",
+)
 
 
 class SalarySlip(TransactionBase):
@@ -77,8 +97,27 @@ class SalarySlip(TransactionBase):
 
 		return self._payroll_period
 
+	@property
+	def payroll_run_context(self):
+		"""Data preloaded by Payroll Entry for all the slips of a run, if the slip is created by one"""
+		return getattr(self, "_payroll_run_context", None)
+
+	def get_payroll_setting(self, fieldname):
+		if self.payroll_run_context:
+			return self.payroll_run_context.payroll_settings.get(fieldname)
+
+		return frappe.db.get_single_value("Payroll Settings", fieldname)
+
+	def get_salary_component_value(self, salary_component, fieldname):
+		if self.payroll_run_context:
+			return self.payroll_run_context.get_salary_component_value(salary_component, fieldname)
+
+		return frappe.get_cached_value("Salary Component", salary_component, fieldname)
+
 	def validate(self):
 		self.status = self.get_status()
+		# amounts are recalculated from the latest inputs on every save
+		self.is_stale = 0
 		validate_active_employee(self.employee)
 		self.validate_dates()
 		self.check_existing()
@@ -86,23 +125,30 @@ class SalarySlip(TransactionBase):
 		if not self.salary_slip_based_on_timesheet:
 			self.get_date_details()
 
+		changed_inputs = set(self.flags.pop("changed_inputs", None) or ())
 		if not (len(self.get("earnings")) or len(self.get("deductions"))):
 			# get details from salary structure
 			self.get_emp_and_working_day_details()
 		else:
+			working_days_details = {field: flt(self.get(field)) for field in WORKING_DAYS_FIELDS}
 			self.get_working_days_details(lwp=self.leave_without_pay)
+			changed_inputs.update(
+				field for field, value in working_days_details.items() if flt(self.get(field)) != value
+			)
 
-		self.calculate_net_pay()
+		if changed_inputs and self.docstatus == 0 and not self.is_new() and self.salary_structure:
+			# only the components reading the changed inputs are evaluated again
+			self.recalculate_components(changed_inputs)
+		else:
+			self.calculate_net_pay()
 		self.compute_year_to_date()
 		self.compute_month_to_date()
 		self.compute_component_wise_year_to_date()
 		self.add_leave_balances()
 		self.compute_income_tax_breakup()
 
-		if frappe.db.get_single_value("Payroll Settings", "max_working_hours_against_timesheet"):
-			max_working_hours = frappe.db.get_single_value(
-				"Payroll Settings", "max_working_hours_against_timesheet"
-			)
+		if self.get_payroll_setting("max_working_hours_against_timesheet"):
+			max_working_hours = self.get_payroll_setting("max_working_hours_against_timesheet")
 			if self.salary_slip_based_on_timesheet and (self.total_working_hours > int(max_working_hours)):
 				frappe.msgprint(
 					_("Total working hours should not be greater than max working hours {0}").format(
@@ -125,6 +171,7 @@ class SalarySlip(TransactionBase):
 		else:
 			self.set_status()
 			self.update_status(self.name)
+			self.update_payroll_period_running_total()
 
 			make_loan_repayment_entry(self)
 
@@ -159,6 +206,7 @@ class SalarySlip(TransactionBase):
 		self.set_status()
 		self.update_status()
 		self.update_payment_status_for_gratuity()
+		self.update_payroll_period_running_total()
 
 		cancel_loan_repayment_entry(self)
 
@@ -191,7 +239,7 @@ class SalarySlip(TransactionBase):
 			frappe.throw(_("Cannot create Salary Slip for Employee who has left before Payroll Period"))
 
 	def is_rounding_total_disabled(self):
-		return cint(frappe.db.get_single_value("Payroll Settings", "disable_rounded_total"))
+		return cint(self.get_payroll_setting("disable_rounded_total"))
 
 	def check_existing(self):
 		if not self.salary_slip_based_on_timesheet:
@@ -253,16 +301,22 @@ class SalarySlip(TransactionBase):
 			struct = self.check_sal_struct(joining_date, relieving_date)
 
 			if struct:
-				self._salary_structure_doc = frappe.get_doc("Salary Structure", struct)
+				self._salary_structure_doc = self.get_salary_structure_doc(struct)
 				self.salary_slip_based_on_timesheet = (
 					self._salary_structure_doc.salary_slip_based_on_timesheet or 0
 				)
 				self.set_time_sheet()
 				self.pull_sal_struct()
-				ps = frappe.db.get_value(
-					"Payroll Settings", None, ["payroll_based_on", "consider_unmarked_attendance_as"], as_dict=1
-				)
-				return [ps.payroll_based_on, ps.consider_unmarked_attendance_as]
+				return [
+					self.get_payroll_setting("payroll_based_on"),
+					self.get_payroll_setting("consider_unmarked_attendance_as"),
+				]
+
+	def get_salary_structure_doc(self, salary_structure):
+		if self.payroll_run_context:
+			return self.payroll_run_context.get_salary_structure(salary_structure)
+
+		return frappe.get_doc("Salary Structure", salary_structure)
 
 	def set_time_sheet(self):
 		if self.salary_slip_based_on_timesheet:
@@ -283,6 +337,9 @@ class SalarySlip(TransactionBase):
 				self.append("timesheets", {"time_sheet": data.name, "working_hours": data.total_hours})
 
 	def check_sal_struct(self, joining_date, relieving_date):
+		if self.payroll_run_context:
+			return self.check_sal_struct_from_payroll_run_context(joining_date)
+
 		ss = frappe.qb.DocType("Salary Structure")
 		ssa = frappe.qb.DocType("Salary Structure Assignment")
 
@@ -311,12 +368,27 @@ class SalarySlip(TransactionBase):
 
 		st_name = query.run()
 
-		if st_name:
-			self.salary_structure = st_name[0][0]
-			return self.salary_structure
+		self.set_salary_structure(st_name[0][0] if st_name else None)
+		return self.salary_structure
 
-		else:
-			self.salary_structure = None
+	def check_sal_struct_from_payroll_run_context(self, joining_date):
+		on_date = max(getdate(self.start_date), getdate(self.end_date))
+		if joining_date:
+			on_date = max(on_date, getdate(joining_date))
+
+		payroll_frequency = None
+		if not self.salary_slip_based_on_timesheet and self.payroll_frequency:
+			payroll_frequency = self.payroll_frequency
+
+		self.set_salary_structure(
+			self.payroll_run_context.get_active_salary_structure(self.employee, on_date, payroll_frequency)
+		)
+		return self.salary_structure
+
+	def set_salary_structure(self, salary_structure):
+		self.salary_structure = salary_structure
+
+		if not salary_structure:
 			frappe.msgprint(
 				_("No active or default Salary Structure found for employee {0} for the given dates").format(
 					self.employee
@@ -343,9 +415,9 @@ class SalarySlip(TransactionBase):
 	def get_working_days_details(
 		self, joining_date=None, relieving_date=None, lwp=None, for_preview=0
 	):
-		payroll_based_on = frappe.db.get_value("Payroll Settings", None, "payroll_based_on")
-		include_holidays_in_total_working_days = frappe.db.get_single_value(
-			"Payroll Settings", "include_holidays_in_total_working_days"
+		payroll_based_on = self.get_payroll_setting("payroll_based_on")
+		include_holidays_in_total_working_days = self.get_payroll_setting(
+			"include_holidays_in_total_working_days"
 		)
 
 		if not (joining_date and relieving_date):
@@ -403,7 +475,7 @@ class SalarySlip(TransactionBase):
 				self.payment_days -= flt(absent)
 
 			consider_unmarked_attendance_as = (
-				frappe.db.get_value("Payroll Settings", None, "consider_unmarked_attendance_as") or "Present"
+				self.get_payroll_setting("consider_unmarked_attendance_as") or "Present"
 			)
 
 			if payroll_based_on == "Attendance" and consider_unmarked_attendance_as == "Absent":
@@ -500,27 +572,33 @@ class SalarySlip(TransactionBase):
 		return payment_days
 
 	def get_holidays_for_employee(self, start_date, end_date):
+		if self.payroll_run_context:
+			holidays = self.payroll_run_context.get_holiday_dates(self.employee, start_date, end_date)
+			if holidays is not None:
+				return holidays
+
 		return get_holiday_dates_for_employee(self.employee, start_date, end_date)
 
 	def calculate_lwp_or_ppl_based_on_leave_application(
 		self, holidays, working_days_list, relieving_date
 	):
 		lwp = 0
-		holidays = "','".join(holidays)
+		holidays = set(holidays)
 		daily_wages_fraction_for_half_day = (
-			flt(frappe.db.get_value("Payroll Settings", None, "daily_wages_fraction_for_half_day")) or 0.5
+			flt(self.get_payroll_setting("daily_wages_fraction_for_half_day")) or 0.5
 		)
+		leaves = self.get_lwp_or_ppl_leaves()
 
 		for d in working_days_list:
 			if relieving_date and d > relieving_date:
 				continue
 
-			leave = get_lwp_or_ppl_for_date(str(d), self.employee, holidays)
+			leave = get_lwp_or_ppl_leave_for_date(leaves.get(d), is_holiday=cstr(d) in holidays)
 			if leave:
 				equivalent_lwp_count = 0
-				is_half_day_leave = cint(leave[0].is_half_day)
-				is_partially_paid_leave = cint(leave[0].is_ppl)
-				fraction_of_daily_salary_per_leave = flt(leave[0].fraction_of_daily_salary_per_leave)
+				is_half_day_leave = cint(leave.is_half_day)
+				is_partially_paid_leave = cint(leave.is_ppl)
+				fraction_of_daily_salary_per_leave = flt(leave.fraction_of_daily_salary_per_leave)
 
 				equivalent_lwp_count = (1 - daily_wages_fraction_for_half_day) if is_half_day_leave else 1
 
@@ -533,6 +611,19 @@ class SalarySlip(TransactionBase):
 
 		return lwp
 
+	def get_lwp_or_ppl_leaves(self):
+		"""Returns the day-wise LWP/PPL leave map for the slip period.
+		Uses the map handed over by Payroll Entry if available, else fetches it"""
+		if getattr(self, "_lwp_or_ppl_leaves", None) is None and self.payroll_run_context:
+			self._lwp_or_ppl_leaves = self.payroll_run_context.get_lwp_or_ppl_leaves(self.employee)
+
+		if getattr(self, "_lwp_or_ppl_leaves", None) is None:
+			self._lwp_or_ppl_leaves = get_lwp_or_ppl_leaves_for_period(
+				[self.employee], self.start_date, self.end_date
+			).get(self.employee, {})
+
+		return self._lwp_or_ppl_leaves
+
 	def calculate_lwp_ppl_and_absent_days_based_on_attendance(self, holidays, relieving_date):
 		lwp = 0
 		absent = 0
@@ -542,14 +633,17 @@ class SalarySlip(TransactionBase):
 			end_date = relieving_date
 
 		daily_wages_fraction_for_half_day = (
-			flt(frappe.db.get_value("Payroll Settings", None, "daily_wages_fraction_for_half_day")) or 0.5
+			flt(self.get_payroll_setting("daily_wages_fraction_for_half_day")) or 0.5
 		)
 
-		leave_types = frappe.get_all(
-			"Leave Type",
-			or_filters=[["is_ppl", "=", 1], ["is_lwp", "=", 1]],
-			fields=["name", "is_lwp", "is_ppl", "fraction_of_daily_salary_per_leave", "include_holiday"],
-		)
+		if self.payroll_run_context:
+			leave_types = self.payroll_run_context.leave_types
+		else:
+			leave_types = frappe.get_all(
+				"Leave Type",
+				or_filters=[["is_ppl", "=", 1], ["is_lwp", "=", 1]],
+				fields=["name", "is_lwp", "is_ppl", "fraction_of_daily_salary_per_leave", "include_holiday"],
+			)
 
 		leave_type_map = {}
 		for leave_type in leave_types:
@@ -933,9 +1027,55 @@ class SalarySlip(TransactionBase):
 			)
 		return tax_deducted
 
+	@frappe.whitelist()
+	def recalculate_components(self, changed):
+		"""Recalculates the draft salary slip after inputs read by formulas change, eg: `payment_days`,
+		a component amount or an assignment field. Only structure components depending on them are
+		evaluated again, others keep their amounts"""
+		if self.docstatus != 0:
+			frappe.throw(_("Only draft Salary Slips can be recalculated"))
+
+		if not self.salary_structure:
+			return
+
+		if isinstance(changed, str):
+			changed = frappe.parse_json(changed)
+
+		self._salary_structure_doc = self.get_salary_structure_doc(self.salary_structure)
+		self._components_to_recalculate = self.get_component_dependency_graph().get_affected_components(
+			changed
+		)
+		try:
+			self.calculate_net_pay()
+		finally:
+			self._components_to_recalculate = None
+
+	def refresh_amounts(self):
+		"""Saves the draft salary slip recalculated after its attendance, leaves, additional salaries or
+		timesheets changed. Only the components affected by changed payment days or additional salaries
+		are evaluated again, slips based on timesheets are calculated from scratch."""
+		if self.salary_slip_based_on_timesheet or not self.salary_structure:
+			# rows are loaded again from the salary structure and timesheets on save
+			self.set("earnings", [])
+			self.set("deductions", [])
+		else:
+			# rows of additional salaries are added again on save, without the cancelled ones
+			changed = set()
+			for component_type in ("earnings", "deductions"):
+				changed.update(d.abbr for d in self.get(component_type) if d.additional_salary)
+				changed.update(
+					get_salary_component_data(d.component).abbr
+					for d in self.get_applicable_additional_salaries(component_type)
+				)
+				self.set(component_type, [d for d in self.get(component_type) if not d.additional_salary])
+
+			self.flags.changed_inputs = changed
+
+		self.save()
+
 	def calculate_component_amounts(self, component_type):
 		if not getattr(self, "_salary_structure_doc", None):
-			self._salary_structure_doc = frappe.get_doc("Salary Structure", self.salary_structure)
+			self._salary_structure_doc = self.get_salary_structure_doc(self.salary_structure)
 
 		self.add_structure_components(component_type)
 		self.add_additional_salary_components(component_type)
@@ -947,14 +1087,22 @@ class SalarySlip(TransactionBase):
 	def add_structure_components(self, component_type):
 		self.data, self.default_data = self.get_data_for_eval()
 
-		timesheet_component = frappe.db.get_value(
-			"Salary Structure", self.salary_structure, "salary_component"
-		)
+		timesheet_component = self.get_timesheet_component()
+		components_to_recalculate = getattr(self, "_components_to_recalculate", None)
+		evaluation_order = self.get_component_dependency_graph().get_evaluation_order(component_type)
 
-		for struct_row in self._salary_structure_doc.get(component_type):
+		for struct_row in evaluation_order:
 			if self.salary_slip_based_on_timesheet and struct_row.salary_component == timesheet_component:
 				continue
 
+			# statistical components have no row keeping their amount, so they are always evaluated
+			if (
+				components_to_recalculate is not None
+				and not struct_row.statistical_component
+				and struct_row.abbr not in components_to_recalculate
+			):
+				continue
+
 			amount = self.eval_condition_and_formula(struct_row, self.data)
 			if struct_row.statistical_component:
 				# update statitical component amount in reference data based on payment days
@@ -972,8 +1120,8 @@ class SalarySlip(TransactionBase):
 			else:
 				# default behavior, the system does not add if component amount is zero
 				# if remove_if_zero_valued is unchecked, then ask system to add component row
-				remove_if_zero_valued = frappe.get_cached_value(
-					"Salary Component", struct_row.salary_component, "remove_if_zero_valued"
+				remove_if_zero_valued = self.get_salary_component_value(
+					struct_row.salary_component, "remove_if_zero_valued"
 				)
 
 				default_amount = 0
@@ -993,27 +1141,50 @@ class SalarySlip(TransactionBase):
 						remove_if_zero_valued=remove_if_zero_valued,
 					)
 
+		if evaluation_order != self._salary_structure_doc.get(component_type):
+			self.sort_component_rows(component_type)
+
+	def sort_component_rows(self, component_type):
+		"""Orders component rows like the salary structure, since they are added in order of evaluation"""
+		positions = {}
+		for idx, struct_row in enumerate(self._salary_structure_doc.get(component_type)):
+			positions.setdefault(struct_row.salary_component, idx)
+
+		self.set(
+			component_type,
+			sorted(
+				self.get(component_type),
+				key=lambda d: positions.get(d.salary_component, len(positions)),
+			),
+		)
+
+	def get_component_dependency_graph(self):
+		return get_component_dependency_graph(
+			self._salary_structure_doc, self.get_salary_structure_modified()
+		)
+
+	def get_timesheet_component(self):
+		if self.payroll_run_context and self.salary_structure:
+			return self.payroll_run_context.get_salary_structure(self.salary_structure).salary_component
+
+		return frappe.db.get_value("Salary Structure", self.salary_structure, "salary_component")
+
 	def get_data_for_eval(self):
-		"""Returns data for evaluating formula"""
-		data = frappe._dict()
-		employee = frappe.get_doc("Employee", self.employee).as_dict()
+		"""Returns data for evaluating formula.
+
+		Data is a chain of the component amounts over the salary slip, employee and salary structure
+		assignment fields and zero amounts of all components, so copies only copy the amounts.
+		Only fields read by the salary structure and tax slab are loaded, when they are known."""
+		referenced_names = self.get_referenced_names_for_eval()
+		employee = self.get_employee_for_eval(referenced_names)
 
 		start_date = getdate(self.start_date)
 		date_to_validate = (
 			employee.date_of_joining if employee.date_of_joining > start_date else start_date
 		)
 
-		salary_structure_assignment = frappe.get_value(
-			"Salary Structure Assignment",
-			{
-				"employee": self.employee,
-				"salary_structure": self.salary_structure,
-				"from_date": ("<=", date_to_validate),
-				"docstatus": 1,
-			},
-			"*",
-			order_by="from_date desc",
-			as_dict=True,
+		salary_structure_assignment = self.get_salary_structure_assignment_for_eval(
+			date_to_validate, referenced_names
 		)
 
 		if not salary_structure_assignment:
@@ -1026,16 +1197,15 @@ class SalarySlip(TransactionBase):
 				)
 			)
 
-		data.update(salary_structure_assignment)
-		data.update(employee)
-		data.update(self.as_dict())
-
-		# set values for components
-		salary_components = frappe.get_all("Salary Component", fields=["salary_component_abbr"])
-		for sc in salary_components:
-			data.setdefault(sc.salary_component_abbr, 0)
+		data = ChainMap(
+			{},
+			self.get_fields_for_eval(referenced_names),
+			employee,
+			salary_structure_assignment,
+			self.get_salary_component_abbreviation_seed(),
+		)
 
-		# shallow copy of data to store default amounts (without payment days) for tax calculation
+		# copy of data to store default amounts (without payment days) for tax calculation
 		default_data = data.copy()
 
 		for key in ("earnings", "deductions"):
@@ -1045,18 +1215,103 @@ class SalarySlip(TransactionBase):
 
 		return data, default_data
 
+	def get_referenced_names_for_eval(self) -> set[str] | None:
+		"""Returns names read by the salary structure's formulas and conditions and the tax slab's
+		conditions, or None if they are not known"""
+		salary_structure_doc = getattr(self, "_salary_structure_doc", None)
+		if not salary_structure_doc:
+			return None
+
+		referenced_names = get_structure_referenced_names(
+			salary_structure_doc, self.get_salary_structure_modified()
+		)
+		if referenced_names is None:
+			return None
+
+		if tax_slab := getattr(self, "tax_slab", None):
+			referenced_names = referenced_names | get_income_tax_slab_evaluator(tax_slab).referenced_names
+
+		return referenced_names
+
+	def get_fields_for_eval(self, referenced_names=None) -> dict:
+		if referenced_names is None:
+			return self.as_dict()
+
+		valid_columns = self.meta.get_valid_columns()
+		table_fields = {df.fieldname for df in self.meta.get_table_fields()}
+
+		data = {}
+		for fieldname in referenced_names:
+			if fieldname in table_fields:
+				data[fieldname] = [d.as_dict() for d in self.get(fieldname)]
+			elif fieldname in valid_columns:
+				data[fieldname] = self.get(fieldname)
+
+		return data
+
+	def get_employee_for_eval(self, referenced_names=None):
+		if self.payroll_run_context and (
+			employee := self.payroll_run_context.get_employee(self.employee)
+		):
+			return employee
+
+		meta = frappe.get_meta("Employee")
+		if referenced_names is None or any(
+			df.fieldname in referenced_names for df in meta.get_table_fields()
+		):
+			return frappe.get_doc("Employee", self.employee).as_dict()
+
+		fields = {"date_of_joining"} | referenced_names.intersection(meta.get_valid_columns())
+		return frappe.db.get_value("Employee", self.employee, list(fields), as_dict=True)
+
+	def get_salary_structure_assignment_for_eval(self, date_to_validate, referenced_names=None):
+		if self.payroll_run_context:
+			return self.payroll_run_context.get_salary_structure_assignment(
+				self.employee, self.salary_structure, date_to_validate
+			)
+
+		fields = "*"
+		if referenced_names is not None:
+			fields = list(
+				{"name"}
+				| referenced_names.intersection(
+					frappe.get_meta("Salary Structure Assignment").get_valid_columns()
+				)
+			)
+
+		return frappe.get_value(
+			"Salary Structure Assignment",
+			{
+				"employee": self.employee,
+				"salary_structure": self.salary_structure,
+				"from_date": ("<=", date_to_validate),
+				"docstatus": 1,
+			},
+			fields,
+			order_by="from_date desc",
+			as_dict=True,
+		)
+
+	def get_salary_component_abbreviation_seed(self) -> dict:
+		if self.payroll_run_context:
+			return self.payroll_run_context.get_salary_component_abbreviation_seed()
+
+		return get_salary_component_abbreviation_seed()
+
 	def eval_condition_and_formula(self, struct_row, data):
 		try:
-			condition = sanitize_expression(struct_row.condition)
-			if condition:
-				if not frappe.safe_eval(condition, self.whitelisted_globals, data):
+			compiled = get_compiled_condition_and_formula(
+				struct_row, self.get_salary_structure_modified()
+			)
+			if compiled.condition:
+				if not self.evaluate_compiled(compiled.condition, compiled.condition_inputs, data):
 					return None
 			amount = struct_row.amount
 			if struct_row.amount_based_on_formula:
-				formula = sanitize_expression(struct_row.formula)
-				if formula:
+				if compiled.formula:
 					amount = flt(
-						frappe.safe_eval(formula, self.whitelisted_globals, data), struct_row.precision("amount")
+						self.evaluate_compiled(compiled.formula, compiled.formula_inputs, data),
+						struct_row.precision("amount"),
 					)
 			if amount:
 				data[struct_row.abbr] = amount
@@ -1086,13 +1341,25 @@ class SalarySlip(TransactionBase):
 			)
 			raise
 
+	def evaluate_compiled(self, code, inputs, data):
+		"""Evaluates a compiled condition or formula, sharing results between the salary slips of a
+		payroll run when they depend only on their `inputs`"""
+		if self.payroll_run_context and inputs is not None:
+			return self.payroll_run_context.evaluate_expression(
+				code, inputs, self.whitelisted_globals, data
+			)
+
+		return safe_eval_compiled(code, self.whitelisted_globals, data)
+
+	def get_salary_structure_modified(self):
+		salary_structure_doc = getattr(self, "_salary_structure_doc", None)
+		return salary_structure_doc.modified if salary_structure_doc else None
+
 	def add_employee_benefits(self):
 		for struct_row in self._salary_structure_doc.get("earnings"):
 			if struct_row.is_flexible_benefit == 1:
 				if (
-					frappe.db.get_value(
-						"Salary Component", struct_row.salary_component, "pay_against_benefit_claim"
-					)
+					self.get_salary_component_value(struct_row.salary_component, "pay_against_benefit_claim")
 					!= 1
 				):
 					benefit_component_amount = get_benefit_component_amount(
@@ -1103,18 +1370,29 @@ class SalarySlip(TransactionBase):
 						self._salary_structure_doc,
 						self.payroll_frequency,
 						self.payroll_period,
+						self.get_benefit_applications(),
 					)
 					if benefit_component_amount:
 						self.update_component_row(struct_row, benefit_component_amount, "earnings")
 				else:
-					benefit_claim_amount = get_benefit_claim_amount(
-						self.employee, self.start_date, self.end_date, struct_row.salary_component
-					)
+					benefit_claim_amount = self.get_benefit_claim_amount(struct_row.salary_component)
 					if benefit_claim_amount:
 						self.update_component_row(struct_row, benefit_claim_amount, "earnings")
 
 		self.adjust_benefits_in_last_payroll_period(self.payroll_period)
 
+	def get_benefit_applications(self) -> dict | None:
+		if self.payroll_run_context and self.payroll_period:
+			return self.payroll_run_context.get_benefit_applications(self.payroll_period.name)
+
+	def get_benefit_claim_amount(self, salary_component):
+		if self.payroll_run_context:
+			return self.payroll_run_context.get_benefit_claim_amounts(
+				self.employee, self.start_date, self.end_date, pay_against_benefit_claim=1
+			).get(salary_component, 0)
+
+		return get_benefit_claim_amount(self.employee, self.start_date, self.end_date, salary_component)
+
 	def adjust_benefits_in_last_payroll_period(self, payroll_period):
 		if payroll_period:
 			if getdate(payroll_period.end_date) <= getdate(self.end_date):
@@ -1128,11 +1406,7 @@ class SalarySlip(TransactionBase):
 						self.update_component_row(frappe._dict(last_benefit.struct_row), amount, "earnings")
 
 	def add_additional_salary_components(self, component_type):
-		additional_salaries = get_additional_salaries(
-			self.employee, self.start_date, self.end_date, component_type
-		)
-
-		for additional_salary in additional_salaries:
+		for additional_salary in self.get_applicable_additional_salaries(component_type):
 			self.update_component_row(
 				get_salary_component_data(additional_salary.component),
 				additional_salary.amount,
@@ -1141,6 +1415,17 @@ class SalarySlip(TransactionBase):
 				is_recurring=additional_salary.is_recurring,
 			)
 
+	def get_applicable_additional_salaries(self, component_type) -> list:
+		additional_salary_list = None
+		if self.payroll_run_context:
+			additional_salary_list = self.payroll_run_context.get_additional_salaries(
+				self.employee, self.start_date, self.end_date, component_type
+			)
+
+		return get_additional_salaries(
+			self.employee, self.start_date, self.end_date, component_type, additional_salary_list
+		)
+
 	def add_tax_components(self):
 		# Calculate variable_based_on_taxable_salary after all components updated in salary slip
 		tax_components, self.other_deduction_components = [], []
@@ -1438,6 +1723,18 @@ class SalarySlip(TransactionBase):
 		variable_based_on_taxable_salary=0,
 		field_to_select="amount",
 	):
+		running_total = self.get_payroll_period_running_total(end_date)
+		if running_total and getdate(start_date) == getdate(self.payroll_period.start_date):
+			return running_total.get_amount(
+				parentfield,
+				salary_component=salary_component,
+				is_tax_applicable=is_tax_applicable,
+				is_flexible_benefit=is_flexible_benefit,
+				exempted_from_income_tax=exempted_from_income_tax,
+				variable_based_on_taxable_salary=variable_based_on_taxable_salary,
+				field_to_select=field_to_select,
+			)
+
 		ss = frappe.qb.DocType("Salary Slip")
 		sd = frappe.qb.DocType("Salary Detail")
 
@@ -1475,6 +1772,25 @@ class SalarySlip(TransactionBase):
 
 		return flt(result[0][0]) if result else 0.0
 
+	def get_payroll_period_running_total(self, date):
+		"""Returns running totals of the employee for the payroll period if they only include
+		salary slips ending on or before `date`, so they match the slips queried till that date"""
+		if not self.payroll_period:
+			return
+
+		if not hasattr(self, "_payroll_period_running_total"):
+			self._payroll_period_running_total = get_payroll_period_running_totals(
+				[self.employee], self.payroll_period.name
+			).get(self.employee)
+
+		running_total = self._payroll_period_running_total
+		if running_total and running_total.covers(date):
+			return running_total
+
+	def update_payroll_period_running_total(self):
+		if self.payroll_period:
+			update_running_total(self.employee, self.payroll_period)
+
 	def get_tax_paid_in_period(self, start_date, end_date, tax_component):
 		# find total_tax_paid, tax paid for benefit, additional_salary
 		total_tax_paid = self.get_salary_slip_details(
@@ -1593,9 +1909,7 @@ class SalarySlip(TransactionBase):
 
 	def get_amount_based_on_payment_days(self, row, joining_date, relieving_date):
 		amount, additional_amount = row.amount, row.additional_amount
-		timesheet_component = frappe.db.get_value(
-			"Salary Structure", self.salary_structure, "salary_component"
-		)
+		timesheet_component = self.get_timesheet_component()
 
 		if (
 			self.salary_structure
@@ -1632,9 +1946,7 @@ class SalarySlip(TransactionBase):
 			amount = flt(row.default_amount) + flt(row.additional_amount)
 
 		# apply rounding
-		if frappe.get_cached_value(
-			"Salary Component", row.salary_component, "round_to_the_nearest_integer"
-		):
+		if self.get_salary_component_value(row.salary_component, "round_to_the_nearest_integer"):
 			amount, additional_amount = rounded(amount or 0), rounded(additional_amount or 0)
 
 		return amount, additional_amount
@@ -1650,6 +1962,21 @@ class SalarySlip(TransactionBase):
 		)
 
 		# get total benefits claimed
+		total_benefits_claimed = self.get_total_benefits_claimed()
+
+		unclaimed_taxable_benefits = (
+			total_benefits_paid - total_benefits_claimed
+		) + self.current_taxable_earnings_for_payment_days.flexi_benefits
+		return unclaimed_taxable_benefits
+
+	def get_total_benefits_claimed(self):
+		if self.payroll_run_context:
+			return sum(
+				self.payroll_run_context.get_benefit_claim_amounts(
+					self.employee, self.payroll_period.start_date, self.end_date
+				).values()
+			)
+
 		BenefitClaim = frappe.qb.DocType("Employee Benefit Claim")
 		total_benefits_claimed = (
 			frappe.qb.from_(BenefitClaim)
@@ -1660,16 +1987,20 @@ class SalarySlip(TransactionBase):
 				& (BenefitClaim.claim_date.between(self.payroll_period.start_date, self.end_date))
 			)
 		).run()
-		total_benefits_claimed = flt(total_benefits_claimed[0][0]) if total_benefits_claimed else 0
-
-		unclaimed_taxable_benefits = (
-			total_benefits_paid - total_benefits_claimed
-		) + self.current_taxable_earnings_for_payment_days.flexi_benefits
-		return unclaimed_taxable_benefits
+		return flt(total_benefits_claimed[0][0]) if total_benefits_claimed else 0
 
 	def get_total_exemption_amount(self):
 		total_exemption_amount = 0
-		if self.tax_slab.allow_tax_exemption:
+		if self.tax_slab.allow_tax_exemption and self.payroll_run_context:
+			total_exemption_amount = (
+				self.payroll_run_context.get_tax_exemption_amount(
+					self.employee,
+					self.payroll_period.name,
+					based_on_proof=bool(self.deduct_tax_for_unsubmitted_tax_exemption_proof),
+				)
+				or 0
+			)
+		elif self.tax_slab.allow_tax_exemption:
 			if self.deduct_tax_for_unsubmitted_tax_exemption_proof:
 				exemption_proof = frappe.db.get_value(
 					"Employee Tax Exemption Proof Submission",
@@ -1723,9 +2054,14 @@ class SalarySlip(TransactionBase):
 		return total
 
 	def get_joining_and_relieving_dates(self, raise_exception=True):
-		joining_date, relieving_date = frappe.get_cached_value(
-			"Employee", self.employee, ["date_of_joining", "relieving_date"]
-		)
+		if self.payroll_run_context and (
+			employee := self.payroll_run_context.get_employee(self.employee)
+		):
+			joining_date, relieving_date = employee.date_of_joining, employee.relieving_date
+		else:
+			joining_date, relieving_date = frappe.get_cached_value(
+				"Employee", self.employee, ["date_of_joining", "relieving_date"]
+			)
 
 		if not joining_date and raise_exception:
 			frappe.throw(
@@ -1736,7 +2072,21 @@ class SalarySlip(TransactionBase):
 
 	def email_salary_slip(self):
 		receiver = frappe.db.get_value("Employee", self.employee, "prefered_email")
-		payroll_settings = frappe.get_single("Payroll Settings")
+		email_args = self.get_email_args(receiver, frappe.get_single("Payroll Settings"))
+
+		if email_args:
+			if not frappe.flags.in_test:
+				enqueue(method=frappe.sendmail, queue="short", timeout=300, is_async=True, **email_args)
+			else:
+				frappe.sendmail(**email_args)
+		else:
+			msgprint(_("{0}: Employee email not found, hence email not sent").format(self.employee_name))
+
+	def get_email_args(self, receiver, payroll_settings, print_format=None) -> dict | None:
+		"""Returns arguments to email the salary slip as a PDF, None if there is no receiver"""
+		if not receiver:
+			return None
+
 		message = "Please see attachment"
 		password = None
 		if payroll_settings.encrypt_salary_slips_in_emails:
@@ -1746,23 +2096,23 @@ class SalarySlip(TransactionBase):
 				payroll_settings.password_policy
 			)
 
-		if receiver:
-			email_args = {
-				"recipients": [receiver],
-				"message": _(message),
-				"subject": "Salary Slip - from {0} to {1}".format(self.start_date, self.end_date),
-				"attachments": [
-					frappe.attach_print(self.doctype, self.name, file_name=self.name, password=password)
-				],
-				"reference_doctype": self.doctype,
-				"reference_name": self.name,
-			}
-			if not frappe.flags.in_test:
-				enqueue(method=frappe.sendmail, queue="short", timeout=300, is_async=True, **email_args)
-			else:
-				frappe.sendmail(**email_args)
-		else:
-			msgprint(_("{0}: Employee email not found, hence email not sent").format(self.employee_name))
+		return {
+			"recipients": [receiver],
+			"message": _(message),
+			"subject": "Salary Slip - from {0} to {1}".format(self.start_date, self.end_date),
+			"attachments": [
+				frappe.attach_print(
+					self.doctype,
+					self.name,
+					file_name=self.name,
+					print_format=print_format,
+					doc=self,
+					password=password,
+				)
+			],
+			"reference_doctype": self.doctype,
+			"reference_name": self.name,
+		}
 
 	def update_status(self, salary_slip=None):
 		for data in self.timesheets:
@@ -1852,20 +2202,24 @@ class SalarySlip(TransactionBase):
 		year_to_date = 0
 		period_start_date, period_end_date = self.get_year_to_date_period()
 
-		salary_slip_sum = frappe.get_list(
-			"Salary Slip",
-			fields=["sum(net_pay) as net_sum", "sum(gross_pay) as gross_sum"],
-			filters={
-				"employee": self.employee,
-				"start_date": [">=", period_start_date],
-				"end_date": ["<", period_end_date],
-				"name": ["!=", self.name],
-				"docstatus": 1,
-			},
-		)
+		if running_total := self.get_year_to_date_running_total():
+			year_to_date = flt(running_total.net_pay)
+			gross_year_to_date = flt(running_total.gross_pay)
+		else:
+			salary_slip_sum = frappe.get_list(
+				"Salary Slip",
+				fields=["sum(net_pay) as net_sum", "sum(gross_pay) as gross_sum"],
+				filters={
+					"employee": self.employee,
+					"start_date": [">=", period_start_date],
+					"end_date": ["<", period_end_date],
+					"name": ["!=", self.name],
+					"docstatus": 1,
+				},
+			)
 
-		year_to_date = flt(salary_slip_sum[0].net_sum) if salary_slip_sum else 0.0
-		gross_year_to_date = flt(salary_slip_sum[0].gross_sum) if salary_slip_sum else 0.0
+			year_to_date = flt(salary_slip_sum[0].net_sum) if salary_slip_sum else 0.0
+			gross_year_to_date = flt(salary_slip_sum[0].gross_sum) if salary_slip_sum else 0.0
 
 		year_to_date += self.net_pay
 		gross_year_to_date += self.gross_pay
@@ -1893,33 +2247,42 @@ class SalarySlip(TransactionBase):
 		self.month_to_date = month_to_date
 
 	def compute_component_wise_year_to_date(self):
-		period_start_date, period_end_date = self.get_year_to_date_period()
-
-		ss = frappe.qb.DocType("Salary Slip")
-		sd = frappe.qb.DocType("Salary Detail")
+		component_totals = self.get_component_wise_year_to_date()
 
 		for key in ("earnings", "deductions"):
 			for component in self.get(key):
-				year_to_date = 0
-				component_sum = (
-					frappe.qb.from_(sd)
-					.inner_join(ss)
-					.on(sd.parent == ss.name)
-					.select(Sum(sd.amount).as_("sum"))
-					.where(
-						(ss.employee == self.employee)
-						& (sd.salary_component == component.salary_component)
-						& (ss.start_date >= period_start_date)
-						& (ss.end_date < period_end_date)
-						& (ss.name != self.name)
-						& (ss.docstatus == 1)
-					)
-				).run()
-
-				year_to_date = flt(component_sum[0][0]) if component_sum else 0.0
+				year_to_date = flt(component_totals.get(component.salary_component))
 				year_to_date += component.amount
 				component.year_to_date = year_to_date
 
+	def get_component_wise_year_to_date(self) -> dict:
+		"""Returns component totals of other submitted salary slips in the year to date period"""
+		if running_total := self.get_year_to_date_running_total():
+			return running_total.get_component_totals()
+
+		period_start_date, period_end_date = self.get_year_to_date_period()
+		if self.payroll_run_context:
+			return self.payroll_run_context.get_component_wise_year_to_date(
+				self.employee, period_start_date, period_end_date
+			)
+
+		return get_component_wise_year_to_date(
+			[self.employee], period_start_date, period_end_date, exclude_salary_slip=self.name
+		).get(self.employee, {})
+
+	def get_year_to_date_running_total(self):
+		"""Returns running totals of the payroll period if they match the salary slips summed up for
+		year to date values, ie: they exclude this slip and any slip ending on the last day of the period"""
+		if self.docstatus == 1 and getattr(self, "_action", None) != "submit":
+			return
+
+		running_total = self.get_payroll_period_running_total(self.start_date)
+		if running_total and (
+			not running_total.last_salary_slip_end_date
+			or getdate(running_total.last_salary_slip_end_date) < getdate(self.payroll_period.end_date)
+		):
+			return running_total
+
 	def get_year_to_date_period(self):
 		if self.payroll_period:
 			period_start_date = self.payroll_period.start_date
@@ -1935,7 +2298,7 @@ class SalarySlip(TransactionBase):
 	def add_leave_balances(self):
 		self.set("leave_details", [])
 
-		if frappe.db.get_single_value("Payroll Settings", "show_leave_balances_in_salary_slip"):
+		if self.get_payroll_setting("show_leave_balances_in_salary_slip"):
 			from hrms.hr.doctype.leave_application.leave_application import get_leave_details
 
 			leave_details = get_leave_details(self.employee, self.end_date)
@@ -1966,6 +2329,43 @@ def unlink_ref_doc_from_salary_slip(doc, method=None):
 			frappe.db.set_value("Salary Slip", ss_doc.name, "journal_entry", "")
 
 
+def mark_salary_slips_as_stale(doc, method=None):
+	"""Marks draft Salary Slips of the employee overlapping the dates of an Attendance,
+	Leave Application, Additional Salary or Timesheet as stale when it is submitted or cancelled"""
+	if not doc.get("employee"):
+		return
+
+	from_date, to_date = get_dates_affecting_salary_slips(doc)
+	if not (from_date and to_date):
+		return
+
+	SalarySlip = frappe.qb.DocType("Salary Slip")
+	(
+		frappe.qb.update(SalarySlip)
+		.set(SalarySlip.is_stale, 1)
+		.where(
+			(SalarySlip.employee == doc.employee)
+			& (SalarySlip.docstatus == 0)
+			& (SalarySlip.start_date <= to_date)
+			& (SalarySlip.end_date >= from_date)
+		)
+	).run()
+
+
+def get_dates_affecting_salary_slips(doc) -> tuple:
+	if doc.doctype == "Attendance":
+		return doc.attendance_date, doc.attendance_date
+
+	if doc.doctype == "Additional Salary" and not doc.is_recurring:
+		return doc.payroll_date, doc.payroll_date
+
+	if doc.doctype == "Timesheet":
+		return doc.start_date, doc.end_date
+
+	# Leave Application and recurring Additional Salary
+	return doc.from_date, doc.to_date
+
+
 def generate_password_for_pdf(policy_template, employee):
 	employee = frappe.get_doc("Employee", employee)
 	return policy_template.format(**employee.as_dict())
@@ -1988,105 +2388,163 @@ def get_salary_component_data(component):
 	)
 
 
+def get_salary_component_abbreviation_seed() -> dict:
+	"""Returns zero amounts of all salary components by abbreviation, cached per site.
+	Shared by all salary slips, so it must not be modified"""
+	return frappe.cache().get_value(
+		"salary_component_abbreviation_seed",
+		lambda: dict.fromkeys(
+			frappe.get_all("Salary Component", pluck="salary_component_abbr"),
+			0,
+		),
+	)
+
+
 def calculate_tax_by_tax_slab(
 	annual_taxable_earning, tax_slab, eval_globals=None, eval_locals=None
 ):
-	eval_locals.update({"annual_taxable_earning": annual_taxable_earning})
-	tax_amount = 0
-	for slab in tax_slab.slabs:
-		cond = cstr(slab.condition).strip()
-		if cond and not eval_tax_slab_condition(cond, eval_globals, eval_locals):
-			continue
-		if not slab.to_amount and annual_taxable_earning >= slab.from_amount:
-			tax_amount += (annual_taxable_earning - slab.from_amount + 1) * slab.percent_deduction * 0.01
-			continue
-
-		if annual_taxable_earning >= slab.from_amount and annual_taxable_earning < slab.to_amount:
-			tax_amount += (annual_taxable_earning - slab.from_amount + 1) * slab.percent_deduction * 0.01
-		elif annual_taxable_earning >= slab.from_amount and annual_taxable_earning >= slab.to_amount:
-			tax_amount += (slab.to_amount - slab.from_amount + 1) * slab.percent_deduction * 0.01
+	return get_income_tax_slab_evaluator(tax_slab).calculate(
+		annual_taxable_earning, eval_globals, eval_locals
+	)
 
-	# other taxes and charges on income tax
-	for d in tax_slab.other_taxes_and_charges:
-		if flt(d.min_taxable_income) and flt(d.min_taxable_income) > annual_taxable_earning:
-			continue
 
-		if flt(d.max_taxable_income) and flt(d.max_taxable_income) < annual_taxable_earning:
-			continue
+def get_tax_exemption_amounts(employees: list, payroll_period: str, based_on_proof: bool) -> dict:
+	"""Returns exemption amounts of the employees' submitted tax exemption proofs
+	(or declarations, if not `based_on_proof`) for the payroll period, indexed by employee"""
+	if based_on_proof:
+		doctype, fieldname = "Employee Tax Exemption Proof Submission", "exemption_amount"
+	else:
+		doctype, fieldname = "Employee Tax Exemption Declaration", "total_exemption_amount"
+
+	exemption_amounts = {}
+	for d in frappe.get_all(
+		doctype,
+		filters={"employee": ("in", employees), "payroll_period": payroll_period, "docstatus": 1},
+		fields=["employee", fieldname],
+		# latest one, like `frappe.db.get_value` picks for a single slip
+		order_by="modified desc",
+	):
+		exemption_amounts.setdefault(d.employee, d.get(fieldname))
 
-		tax_amount += tax_amount * flt(d.percent) / 100
+	return exemption_amounts
 
-	return tax_amount
 
+def get_component_wise_year_to_date(
+	employees: list, start_date, end_date, exclude_salary_slip: str | None = None
+) -> dict:
+	"""Returns component totals of submitted salary slips starting on or after `start_date`
+	and ending before `end_date`, as {employee: {salary_component: amount}}"""
+	if not employees:
+		return {}
 
-def eval_tax_slab_condition(condition, eval_globals=None, eval_locals=None):
-	if not eval_globals:
-		eval_globals = {
-			"int": int,
-			"float": float,
-			"long": int,
-			"round": round,
-			"date": date,
-			"getdate": getdate,
-		}
+	ss = frappe.qb.DocType("Salary Slip")
+	sd = frappe.qb.DocType("Salary Detail")
 
-	try:
-		condition = condition.strip()
-		if condition:
-			return frappe.safe_eval(condition, eval_globals, eval_locals)
-	except NameError as err:
-		frappe.throw(
-			_("{0} <br> This error can be due to missing or deleted field.").format(err),
-			title=_("Name error"),
+	query = (
+		frappe.qb.from_(sd)
+		.inner_join(ss)
+		.on(sd.parent == ss.name)
+		.select(ss.employee, sd.salary_component, Sum(sd.amount).as_("amount"))
+		.where(
+			(ss.employee.isin(employees))
+			& (ss.start_date >= start_date)
+			& (ss.end_date < end_date)
+			& (ss.docstatus == 1)
 		)
-	except SyntaxError as err:
-		frappe.throw(_("Syntax error in condition: {0} in Income Tax Slab").format(err))
-	except Exception as e:
-		frappe.throw(_("Error in formula or condition: {0} in Income Tax Slab").format(e))
-		raise
+		.groupby(ss.employee, sd.salary_component)
+	)
+
+	if exclude_salary_slip:
+		query = query.where(ss.name != exclude_salary_slip)
+
+	year_to_date = {}
+	for row in query.run(as_dict=True):
+		year_to_date.setdefault(row.employee, {})[row.salary_component] = flt(row.amount)
+
+	return year_to_date
+
 
+def get_lwp_or_ppl_leaves_for_period(employees: list, start_date, end_date) -> dict:
+	"""Returns approved LWP/PPL leave applications overlapping the period, fetched in a single query
+	for all employees and expanded into a day-wise map like
+	{
+	        "HREMP00001": {
+	                datetime.date(2023, 1, 2): [{"name": "HR-LAP-2023-00001", "is_half_day": 0, ...}],
+	        }
+	}
+	"""
+	if not employees:
+		return {}
 
-def get_lwp_or_ppl_for_date(date, employee, holidays):
 	LeaveApplication = frappe.qb.DocType("Leave Application")
 	LeaveType = frappe.qb.DocType("Leave Type")
 
-	is_half_day = (
-		frappe.qb.terms.Case()
-		.when(
-			(
-				(LeaveApplication.half_day_date == date)
-				| (LeaveApplication.from_date == LeaveApplication.to_date)
-			),
-			LeaveApplication.half_day,
-		)
-		.else_(0)
-	).as_("is_half_day")
-
-	query = (
+	leave_applications = (
 		frappe.qb.from_(LeaveApplication)
 		.inner_join(LeaveType)
 		.on((LeaveType.name == LeaveApplication.leave_type))
 		.select(
 			LeaveApplication.name,
+			LeaveApplication.employee,
+			LeaveApplication.from_date,
+			LeaveApplication.to_date,
+			LeaveApplication.half_day,
+			LeaveApplication.half_day_date,
 			LeaveType.is_ppl,
 			LeaveType.fraction_of_daily_salary_per_leave,
-			(is_half_day),
+			LeaveType.include_holiday,
 		)
 		.where(
 			(((LeaveType.is_lwp == 1) | (LeaveType.is_ppl == 1)))
 			& (LeaveApplication.docstatus == 1)
 			& (LeaveApplication.status == "Approved")
-			& (LeaveApplication.employee == employee)
+			& (LeaveApplication.employee.isin(employees))
 			& ((LeaveApplication.salary_slip.isnull()) | (LeaveApplication.salary_slip == ""))
-			& ((LeaveApplication.from_date <= date) & (date <= LeaveApplication.to_date))
+			& (LeaveApplication.from_date <= end_date)
+			& (LeaveApplication.to_date >= start_date)
 		)
-	)
+	).run(as_dict=True)
+
+	start_date, end_date = getdate(start_date), getdate(end_date)
+	leaves = {}
+
+	for application in leave_applications:
+		employee_leaves = leaves.setdefault(application.employee, {})
+		from_date = max(getdate(application.from_date), start_date)
+		to_date = min(getdate(application.to_date), end_date)
+		half_day_date = getdate(application.half_day_date) if application.half_day_date else None
+
+		for day in range(date_diff(to_date, from_date) + 1):
+			leave_date = add_days(from_date, day)
+			is_half_day = (
+				application.half_day
+				if (half_day_date == leave_date or application.from_date == application.to_date)
+				else 0
+			)
 
-	# if it's a holiday only include if leave type has "include holiday" enabled
-	if date in holidays:
-		query = query.where((LeaveType.include_holiday == "1"))
+			employee_leaves.setdefault(leave_date, []).append(
+				frappe._dict(
+					{
+						"name": application.name,
+						"is_ppl": application.is_ppl,
+						"fraction_of_daily_salary_per_leave": application.fraction_of_daily_salary_per_leave,
+						"include_holiday": application.include_holiday,
+						"is_half_day": cint(is_half_day),
+					}
+				)
+			)
+
+	return leaves
+
+
+def get_lwp_or_ppl_leave_for_date(leaves: list | None, is_holiday: bool = False) -> dict | None:
+	"""Returns the applicable leave out of the leaves applied for a day.
+	If it's a holiday only leave types with "include holiday" enabled are considered"""
+	for leave in leaves or []:
+		if is_holiday and not cint(leave.include_holiday):
+			continue
 
-	return query.run(as_dict=True)
+		return leave
 
 
 @frappe.whitelist()
@@ -0,0 +1,117 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import frappe
+from frappe import _
+
+from hrms.payroll.doctype.payroll_run_log.payroll_run_log import (
+	log_payroll_phase,
+	measure_salary_slip,
+)
+
+# salary slips are emailed by at most these many jobs at a time
+MAX_EMAIL_JOBS = 4
+# salary slips whose emails are queued before the delivery status is committed
+EMAIL_BATCH_SIZE = 50
+
+
+def enqueue_salary_slip_emails(salary_slips: list[str], payroll_entry: str | None = None) -> None:
+	"""Emails submitted salary slips in background jobs, so that rendering the PDFs does not hold up
+	the job submitting them. Salary slips whose emails are already queued are skipped."""
+	if not salary_slips or not frappe.db.get_single_value(
+		"Payroll Settings", "email_salary_slip_to_employee"
+	):
+		return
+
+	SalarySlip = frappe.qb.DocType("Salary Slip")
+	salary_slips = (
+		frappe.qb.from_(SalarySlip)
+		.select(SalarySlip.name)
+		.where(
+			(SalarySlip.name.isin(salary_slips))
+			& (SalarySlip.docstatus == 1)
+			& (SalarySlip.email_status.isnull() | (SalarySlip.email_status != "Email Queued"))
+		)
+		.orderby(SalarySlip.name)
+	).run(pluck=True)
+
+	if not salary_slips:
+		return
+
+	set_email_status(salary_slips, "Queued")
+
+	job_size = -(-len(salary_slips) // MAX_EMAIL_JOBS)
+	job_size = max(job_size, EMAIL_BATCH_SIZE)
+	for i in range(0, len(salary_slips), job_size):
+		frappe.enqueue(
+			email_salary_slips,
+			queue="long",
+			timeout=3000,
+			enqueue_after_commit=True,
+			now=frappe.flags.in_test,
+			salary_slips=salary_slips[i : i + job_size],
+			payroll_entry=payroll_entry,
+		)
+
+
+@log_payroll_phase("Emailing")
+def email_salary_slips(salary_slips: list[str], payroll_entry: str | None = None) -> None:
+	"""Renders and queues emails for the salary slips, recording the email status of each.
+	Delivery happens later from the Email Queue, which references the salary slip.
+
+	Payroll Settings, the print format and employee emails are loaded once for all salary slips,
+	and emails are added to the Email Queue directly instead of through another job."""
+	payroll_settings = frappe.get_cached_doc("Payroll Settings")
+	print_format = frappe.get_meta("Salary Slip").default_print_format
+
+	employees = frappe.get_all(
+		"Salary Slip", filters={"name": ("in", salary_slips)}, pluck="employee", distinct=True
+	)
+	receivers = dict(
+		frappe.get_all(
+			"Employee",
+			filters={"name": ("in", employees)},
+			fields=["name", "prefered_email"],
+			as_list=True,
+		)
+	)
+
+	savepoint = "salary_slip_email"
+	for count, name in enumerate(salary_slips, start=1):
+		try:
+			frappe.db.savepoint(savepoint)
+			salary_slip = frappe.get_doc("Salary Slip", name)
+			with measure_salary_slip(salary_slip.employee) as measured:
+				measured.salary_structure = salary_slip.salary_structure
+				email_args = salary_slip.get_email_args(
+					receivers.get(salary_slip.employee), payroll_settings, print_format
+				)
+				if email_args:
+					frappe.sendmail(**email_args)
+					status = "Email Queued"
+				else:
+					status = "Not Sent"
+		except Exception:
+			frappe.db.rollback(save_point=savepoint)
+			frappe.log_error(
+				title=_("Salary Slip {0} could not be emailed").format(name),
+				reference_doctype="Salary Slip",
+				reference_name=name,
+			)
+			status = "Failed"
+
+		set_email_status([name], status)
+		if not count % EMAIL_BATCH_SIZE:
+			frappe.db.commit()  # nosemgrep
+
+	frappe.db.commit()  # nosemgrep
+
+
+def set_email_status(salary_slips: list[str], status: str) -> None:
+	SalarySlip = frappe.qb.DocType("Salary Slip")
+	(
+		frappe.qb.update(SalarySlip)
+		.set(SalarySlip.email_status, status)
+		.where(SalarySlip.name.isin(salary_slips))
+	).run()
+
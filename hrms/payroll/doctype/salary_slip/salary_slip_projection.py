@@ -0,0 +1,251 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+from copy import deepcopy
+
+import frappe
+from frappe.utils import add_days, date_diff, getdate
+
+from hrms.payroll.doctype.payroll_entry.payroll_entry import get_start_end_dates
+from hrms.payroll.utils import get_referenced_names
+
+# fields of a preview salary slip that change with the number of days in the period
+DAY_BASED_FIELDS = ("total_working_days", "payment_days")
+# fields of a salary slip that change with every period
+DATE_BASED_FIELDS = ("start_date", "end_date", "posting_date")
+
+
+class SalarySlipProjection:
+	"""Projects salary slips of employees for the remaining periods of a payroll period.
+
+	Instead of evaluating a preview slip for every remaining period, an employee's salary structure
+	is evaluated once per kind of period and the result is reused for the other periods of that kind.
+	Periods are of the same kind if the same salary structure assignment applies to them and, when
+	formulas depend on the number of days, they are equally long.
+
+	The last period of the payroll period, periods with additional salaries and structures with
+	flexible benefits or date based formulas are evaluated period by period.
+	Variable tax components of reused periods are not recomputed, so projections are meant for
+	earnings and exemptions.
+	"""
+
+	def __init__(self, company: str, start_date, end_date):
+		self.company = company
+		self.start_date = getdate(start_date)
+		self.end_date = getdate(end_date)
+
+		self.last_salary_slips = {}
+		self.assignments = {}
+		self.additional_salary_dates = {}
+		self.structure_dependencies = {}
+
+	def project(self, employees: dict) -> dict:
+		"""Returns projected salary slips (as dicts) for the remaining periods, indexed by employee.
+
+		Args:
+		        employees (dict): employee details indexed by employee, with `salary_structure`,
+		        `date_of_joining` and `relieving_date`
+		"""
+		if not employees:
+			return {}
+
+		employee_list = list(employees)
+		self.load_last_salary_slips(employee_list)
+		self.load_assignments(employee_list)
+		self.load_additional_salary_dates(employee_list)
+
+		future_salary_slips = {}
+		for employee, details in employees.items():
+			if salary_slips := self.project_for_employee(employee, frappe._dict(details)):
+				future_salary_slips[employee] = salary_slips
+
+		return future_salary_slips
+
+	def project_for_employee(self, employee: str, details: dict) -> list[dict]:
+		last_ss = self.last_salary_slips.get(employee)
+		if last_ss and getdate(last_ss.end_date) == self.end_date:
+			return []
+
+		if last_ss:
+			start_date = getdate(add_days(last_ss.end_date, 1))
+		else:
+			start_date = self.start_date
+			last_ss = frappe._dict(
+				{"payroll_frequency": "Monthly", "salary_structure": details.salary_structure}
+			)
+
+		salary_slips = []
+		evaluated_slips = {}
+		for start_date, end_date in self.get_periods(
+			start_date, last_ss.payroll_frequency, details.relieving_date
+		):
+			key = self.get_period_key(employee, details, last_ss.salary_structure, start_date, end_date)
+			if key and key in evaluated_slips:
+				salary_slips.append(self.copy_for_period(evaluated_slips[key], start_date, end_date))
+				continue
+
+			try:
+				salary_slip = self.evaluate(
+					employee, last_ss.salary_structure, last_ss.payroll_frequency, start_date, end_date
+				)
+			except Exception:
+				break
+
+			if key:
+				evaluated_slips[key] = salary_slip
+			salary_slips.append(salary_slip)
+
+		return salary_slips
+
+	def get_periods(self, start_date, payroll_frequency: str, relieving_date=None) -> list[tuple]:
+		periods = []
+		while start_date < self.end_date and (not relieving_date or start_date < getdate(relieving_date)):
+			end_date = getdate(get_start_end_dates(payroll_frequency, start_date).end_date)
+			periods.append((start_date, end_date))
+			start_date = getdate(add_days(end_date, 1))
+
+		return periods
+
+	def get_period_key(
+		self, employee: str, details: dict, salary_structure: str, start_date, end_date
+	) -> tuple | None:
+		"""Returns a key shared by periods that evaluate to the same salary slip,
+		or None if the period has to be evaluated on its own"""
+		dependencies = self.get_structure_dependencies(salary_structure)
+		if dependencies.period_specific or end_date >= self.end_date:
+			return None
+
+		if self.has_additional_salary(employee, start_date, end_date):
+			return None
+
+		date_to_validate = start_date
+		if details.date_of_joining and getdate(details.date_of_joining) > start_date:
+			date_to_validate = getdate(details.date_of_joining)
+
+		key = (self.get_assignment(employee, salary_structure, date_to_validate),)
+		if dependencies.day_based:
+			key += (date_diff(end_date, start_date) + 1,)
+
+		return key
+
+	def evaluate(self, employee: str, salary_structure: str, payroll_frequency: str, start_date, end_date):
+		ss = frappe.new_doc("Salary Slip")
+		ss.employee = employee
+		ss.start_date = start_date
+		ss.end_date = end_date
+		ss.salary_structure = salary_structure
+		ss.payroll_frequency = payroll_frequency
+		ss.company = self.company
+		ss.process_salary_structure(for_preview=1)
+
+		return ss.as_dict()
+
+	def copy_for_period(self, salary_slip: dict, start_date, end_date) -> dict:
+		salary_slip = deepcopy(salary_slip)
+		salary_slip.start_date = start_date
+		salary_slip.end_date = end_date
+		salary_slip.total_working_days = salary_slip.payment_days = date_diff(end_date, start_date) + 1
+
+		return salary_slip
+
+	def get_structure_dependencies(self, salary_structure: str) -> frappe._dict:
+		"""Returns whether the structure's amounts change with every period or with its number of days"""
+		if salary_structure not in self.structure_dependencies:
+			dependencies = frappe._dict(period_specific=False, day_based=False)
+
+			if salary_structure:
+				structure = frappe.get_cached_doc("Salary Structure", salary_structure)
+				rows = structure.get("earnings") + structure.get("deductions")
+				try:
+					names = set()
+					for row in rows:
+						names |= get_referenced_names(row.condition)
+						if row.amount_based_on_formula:
+							names |= get_referenced_names(row.formula)
+				except SyntaxError:
+					# let the evaluation of every period surface the error
+					dependencies.period_specific = True
+				else:
+					dependencies.period_specific = any(row.is_flexible_benefit for row in rows) or bool(
+						names.intersection(DATE_BASED_FIELDS)
+					)
+					dependencies.day_based = bool(names.intersection(DAY_BASED_FIELDS))
+
+			self.structure_dependencies[salary_structure] = dependencies
+
+		return self.structure_dependencies[salary_structure]
+
+	def load_last_salary_slips(self, employees: list[str]) -> None:
+		salary_slips = frappe.get_all(
+			"Salary Slip",
+			filters={
+				"employee": ("in", employees),
+				"docstatus": 1,
+				"start_date": ("between", [self.start_date, self.end_date]),
+			},
+			fields=["employee", "start_date", "end_date", "salary_structure", "payroll_frequency"],
+			order_by="start_date desc",
+		)
+
+		for salary_slip in salary_slips:
+			self.last_salary_slips.setdefault(salary_slip.employee, salary_slip)
+
+	def load_assignments(self, employees: list[str]) -> None:
+		assignments = frappe.get_all(
+			"Salary Structure Assignment",
+			filters={"employee": ("in", employees), "docstatus": 1},
+			fields=["name", "employee", "salary_structure", "from_date"],
+			order_by="from_date desc",
+		)
+
+		for assignment in assignments:
+			self.assignments.setdefault(assignment.employee, []).append(assignment)
+
+	def get_assignment(self, employee: str, salary_structure: str, on_date) -> str | None:
+		for assignment in self.assignments.get(employee, []):
+			if assignment.salary_structure == salary_structure and getdate(assignment.from_date) <= on_date:
+				return assignment.name
+
+	def load_additional_salary_dates(self, employees: list[str]) -> None:
+		AdditionalSalary = frappe.qb.DocType("Additional Salary")
+
+		additional_salaries = (
+			frappe.qb.from_(AdditionalSalary)
+			.select(
+				AdditionalSalary.employee,
+				AdditionalSalary.is_recurring,
+				AdditionalSalary.payroll_date,
+				AdditionalSalary.from_date,
+				AdditionalSalary.to_date,
+			)
+			.where(
+				(AdditionalSalary.employee.isin(employees))
+				& (AdditionalSalary.docstatus == 1)
+				& (AdditionalSalary.disabled == 0)
+				& (
+					(
+						(AdditionalSalary.is_recurring == 1)
+						& (AdditionalSalary.from_date <= self.end_date)
+						& (AdditionalSalary.to_date >= self.start_date)
+					)
+					| (
+						(AdditionalSalary.is_recurring == 0)
+						& (AdditionalSalary.payroll_date[self.start_date : self.end_date])
+					)
+				)
+			)
+		).run(as_dict=True)
+
+		for d in additional_salaries:
+			if d.is_recurring:
+				dates = (getdate(d.from_date), getdate(d.to_date))
+			else:
+				dates = (getdate(d.payroll_date), getdate(d.payroll_date))
+
+			self.additional_salary_dates.setdefault(d.employee, []).append(dates)
+
+	def has_additional_salary(self, employee: str, start_date, end_date) -> bool:
+		return any(
+			from_date <= end_date and to_date >= start_date
+			for from_date, to_date in self.additional_salary_dates.get(employee, [])
+		)
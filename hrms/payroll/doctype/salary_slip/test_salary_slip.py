@@ -724,6 +724,58 @@ class TestSalarySlip(FrappeTestCase):
 				year_to_date[entry.salary_component] += entry.amount
 				self.assertEqual(year_to_date[entry.salary_component], entry.year_to_date)
 
+	def test_component_wise_year_to_date_for_employees(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip import get_component_wise_year_to_date
+		from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+
+		payroll_period = create_payroll_period(name="_Test Payroll Period", company="_Test Company")
+		employees = [
+			make_employee(f"test_batch_ytd{i}@salary.com", company="_Test Company") for i in range(2)
+		]
+
+		for employee in employees:
+			salary_structure = make_salary_structure(
+				"Monthly Salary Structure Test for Batch YTD",
+				"Monthly",
+				employee=employee,
+				company="_Test Company",
+				currency="INR",
+				payroll_period=payroll_period,
+			)
+			create_salary_slips_for_payroll_period(
+				employee, salary_structure.name, payroll_period, deduct_random=False, num=2
+			)
+
+		year_to_date = get_component_wise_year_to_date(
+			employees, payroll_period.start_date, payroll_period.end_date
+		)
+
+		for employee in employees:
+			slip = frappe.get_last_doc("Salary Slip", filters={"employee": employee})
+			for row in slip.earnings + slip.deductions:
+				self.assertEqual(year_to_date[employee][row.salary_component], row.year_to_date)
+
+	def test_tax_exemption_amounts_of_latest_proof_submission(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip import get_tax_exemption_amounts
+
+		payroll_period = create_payroll_period(name="_Test Payroll Period", company="_Test Company")
+		employee = make_employee("test_tax_exemption_proofs@salary.com", company="_Test Company")
+		frappe.db.delete("Employee Tax Exemption Proof Submission", {"employee": employee})
+		create_exemption_category()
+
+		create_proof_submission(employee, payroll_period, 50000)
+		create_proof_submission(employee, payroll_period, 20000)
+
+		# exemption of the payroll run matches the one of a single slip
+		exemption_amount = frappe.db.get_value(
+			"Employee Tax Exemption Proof Submission",
+			{"employee": employee, "payroll_period": payroll_period.name, "docstatus": 1},
+			["exemption_amount"],
+		)
+		exemption_amounts = get_tax_exemption_amounts([employee], payroll_period.name, True)
+		self.assertEqual(exemption_amounts[employee], exemption_amount)
+		self.assertEqual(exemption_amounts[employee], 20000)
+
 	def test_tax_for_payroll_period(self):
 		data = {}
 		# test the impact of tax exemption declaration, tax exemption proof submission
@@ -867,6 +919,132 @@ class TestSalarySlip(FrappeTestCase):
 			ss.earnings[2].amount, flt(ss.earnings[0].amount * 0.5, ss.earnings[0].precision("amount"))
 		)
 
+	def test_recalculate_components(self):
+		from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+
+		employee = make_employee("test_recalculate_components@salary.com", company="_Test Company")
+		salary_structure = make_salary_structure(
+			"Structure to test recalculation", "Monthly", employee=employee, company="_Test Company"
+		)
+		ss = make_salary_slip(salary_structure.name, employee=employee)
+		evaluated = record_evaluated_components(ss)
+
+		# Arrear does not depend on payment days, its amount is kept instead of being evaluated again
+		arrear = next(d for d in ss.earnings if d.abbr == "A")
+		arrear.amount = 100
+
+		ss.payment_days -= 1
+		ss.recalculate_components(["payment_days"])
+		recalculated = [(d.salary_component, d.amount) for d in ss.earnings + ss.deductions]
+
+		affected = ss.get_component_dependency_graph().get_affected_components(["payment_days"])
+		self.assertNotIn("A", affected)
+		self.assertEqual(
+			set(evaluated),
+			{
+				row.abbr
+				for row in salary_structure.earnings + salary_structure.deductions
+				if row.abbr in affected or row.statistical_component
+			},
+		)
+		self.assertEqual(arrear.amount, 100)
+
+		# affected components match a full recalculation
+		evaluated.clear()
+		arrear.amount = 0
+		ss.calculate_net_pay()
+		self.assertIn("A", evaluated)
+		self.assertEqual(
+			recalculated,
+			[(d.salary_component, 100 if d.abbr == "A" else d.amount) for d in ss.earnings + ss.deductions],
+		)
+
+	def test_refresh_amounts_of_stale_salary_slip(self):
+		from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+
+		employee = make_employee("test_refresh_salary_slip@salary.com", company="_Test Company")
+		salary_structure = make_salary_structure(
+			"Structure to test refresh", "Monthly", employee=employee, company="_Test Company"
+		)
+		ss = make_salary_slip(salary_structure.name, employee=employee)
+		ss.insert()
+		gross_pay = ss.gross_pay
+
+		frappe.get_doc(
+			{
+				"doctype": "Additional Salary",
+				"employee": employee,
+				"company": "_Test Company",
+				"salary_component": "Overtime",
+				"payroll_date": ss.start_date,
+				"amount": 1000,
+				"type": "Earning",
+				"currency": ss.currency,
+			}
+		).submit()
+
+		ss.reload()
+		self.assertTrue(ss.is_stale)
+		evaluated = record_evaluated_components(ss)
+		ss.refresh_amounts()
+
+		# only Overtime and components reading it are evaluated again, payment days did not change
+		self.assertEqual(set(evaluated) - {"SC"}, {"OT"})
+		self.assertEqual(ss.gross_pay, gross_pay + 1000)
+		self.assertFalse(ss.is_stale)
+
+	def test_attendance_marks_salary_slip_as_stale(self):
+		from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+
+		employee = make_employee("test_stale_attendance@salary.com", company="_Test Company")
+		salary_structure = make_salary_structure(
+			"Structure to test stale attendance", "Monthly", employee=employee, company="_Test Company"
+		)
+		ss = make_salary_slip(salary_structure.name, employee=employee)
+		ss.insert()
+		self.assertFalse(ss.is_stale)
+
+		attendance = frappe.get_doc(
+			{
+				"doctype": "Attendance",
+				"employee": employee,
+				"attendance_date": ss.start_date,
+				"status": "Absent",
+				"company": "_Test Company",
+			}
+		)
+		attendance.submit()
+		self.assertTrue(frappe.db.get_value("Salary Slip", ss.name, "is_stale"))
+
+		frappe.db.set_value("Salary Slip", ss.name, "is_stale", 0)
+		attendance.cancel()
+		self.assertTrue(frappe.db.get_value("Salary Slip", ss.name, "is_stale"))
+
+	def test_data_for_eval(self):
+		from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
+
+		employee = make_employee("test_data_for_eval@salary.com", company="_Test Company")
+		salary_structure = make_salary_structure(
+			"Structure to test data for eval", "Monthly", employee=employee, company="_Test Company"
+		)
+		ss = make_salary_slip(salary_structure.name, employee=employee)
+		data, default_data = ss.get_data_for_eval()
+
+		# base is read by formulas, other assignment and employee fields are not loaded
+		self.assertEqual(data["base"], 50000)
+		self.assertNotIn("cell_number", data)
+
+		# every component abbreviation resolves, with amounts of the slip's components
+		self.assertEqual(data["BS"], ss.earnings[0].amount)
+		self.assertTrue(
+			all(abbr in data for abbr in frappe.get_all("Salary Component", pluck="salary_component_abbr"))
+		)
+
+		# copies share everything but the component amounts
+		default_data["BS"] = 0
+		self.assertEqual(data["BS"], ss.earnings[0].amount)
+		self.assertEqual(data.maps[1:], default_data.maps[1:])
+
 	def test_tax_for_recurring_additional_salary(self):
 		frappe.db.sql("""delete from `tabPayroll Period`""")
 		frappe.db.sql("""delete from `tabSalary Component`""")
@@ -1187,6 +1365,41 @@ class TestSalarySlip(FrappeTestCase):
 
 		self.assertEqual(ss.payment_days, (days_between_start_and_relieving - len(holidays)))
 
+	def test_lwp_or_ppl_leaves_for_period(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip import get_lwp_or_ppl_leaves_for_period
+
+		emp_id = make_employee("test_lwp_or_ppl_leaves_for_period@salary.com")
+		frappe.db.set_value("Employee", emp_id, {"relieving_date": None, "status": "Active"})
+
+		month_start_date = get_first_day(nowdate())
+		first_sunday = get_first_sunday(for_date=month_start_date)
+		leave_start_date = add_days(first_sunday, 1)
+		leave_end_date = add_days(first_sunday, 3)
+
+		make_leave_application(
+			emp_id,
+			leave_start_date,
+			leave_end_date,
+			"Leave Without Pay",
+			half_day=True,
+			half_day_date=leave_end_date,
+		)
+
+		leaves = get_lwp_or_ppl_leaves_for_period(
+			[emp_id], month_start_date, get_last_day(nowdate())
+		).get(emp_id)
+
+		self.assertEqual(len(leaves), 3)
+		self.assertEqual(leaves[getdate(leave_start_date)][0].is_half_day, 0)
+		self.assertEqual(leaves[getdate(leave_end_date)][0].is_half_day, 1)
+
+		ss = make_employee_salary_slip(
+			"test_lwp_or_ppl_leaves_for_period@salary.com",
+			"Monthly",
+			"Test Payment Based On Leave Application",
+		)
+		self.assertEqual(ss.leave_without_pay, 2.5)
+
 	def test_zero_value_component(self):
 		from hrms.payroll.doctype.salary_structure.test_salary_structure import make_salary_structure
 
@@ -1740,6 +1953,19 @@ def create_salary_slips_for_payroll_period(
 	return deducted_dates
 
 
+def record_evaluated_components(salary_slip) -> list[str]:
+	"""Returns a list the salary slip appends abbreviations of evaluated structure components to"""
+	evaluated = []
+	eval_condition_and_formula = salary_slip.eval_condition_and_formula
+
+	def record(struct_row, data):
+		evaluated.append(struct_row.abbr)
+		return eval_condition_and_formula(struct_row, data)
+
+	salary_slip.eval_condition_and_formula = record
+	return evaluated
+
+
 def create_additional_salary(employee, payroll_period, amount):
 	salary_date = add_months(payroll_period.start_date, random.randint(0, 11))
 	frappe.get_doc(
@@ -1803,6 +2029,8 @@ def setup_test():
 		"Employee Benefit Claim",
 		"Salary Structure Assignment",
 		"Payroll Period",
+		"Payroll Period Running Total",
+		"Payroll Period Component Total",
 	]:
 		frappe.db.sql("delete from `tab%s`" % dt)
 
@@ -0,0 +1,228 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, cstr, flt, getdate
+
+# assignments submitted per savepoint
+CHUNK_SIZE = 100
+
+
+class BulkSalaryStructureAssignment:
+	"""Assigns a Salary Structure to a large number of employees.
+
+	Employee details and existing assignments are loaded for all employees with a few queries, so
+	employees that can not be assigned the structure are reported as failed, and the ones that have
+	it already are skipped, without stopping the rest. Valid assignments are then submitted as
+	documents in chunks, each within a savepoint. A chunk that fails is retried one assignment at a
+	time to find the failing employees. When run in a background job, each chunk is committed, and
+	a rerun skips the employees assigned before the job was stopped.
+	"""
+
+	def __init__(
+		self,
+		salary_structure,
+		from_date,
+		payroll_payable_account=None,
+		base=None,
+		variable=None,
+		income_tax_slab=None,
+		payroll_cost_centers=None,
+	):
+		from hrms.payroll.doctype.salary_structure.salary_structure import get_payroll_payable_account
+
+		self.salary_structure = salary_structure
+		self.from_date = getdate(from_date)
+		self.payroll_payable_account = get_payroll_payable_account(
+			salary_structure, payroll_payable_account
+		)
+		self.base = flt(base)
+		self.variable = flt(variable)
+		self.income_tax_slab = income_tax_slab
+		# cost center split shared by all assignments, defaults to the employee's cost center
+		self.payroll_cost_centers = [frappe._dict(d) for d in payroll_cost_centers or []]
+
+		self.assigned = []
+		self.skipped = []
+		# {employee: reason}
+		self.failed = {}
+
+		self.validate()
+
+	def validate(self):
+		if self.income_tax_slab:
+			income_tax_slab_currency = frappe.db.get_value(
+				"Income Tax Slab", self.income_tax_slab, "currency"
+			)
+			if self.salary_structure.currency != income_tax_slab_currency:
+				frappe.throw(
+					_("Currency of selected Income Tax Slab should be {0} instead of {1}").format(
+						self.salary_structure.currency, income_tax_slab_currency
+					)
+				)
+
+		if self.payroll_cost_centers:
+			total_percentage = sum(flt(d.percentage) for d in self.payroll_cost_centers)
+			if total_percentage != 100:
+				frappe.throw(_("Total percentage against cost centers should be 100"))
+
+	def run(
+		self, employees: list[str], publish_progress: bool = True, commit: bool = False
+	) -> frappe._dict:
+		"""Assigns the salary structure to the employees and returns the names of the assignments
+		created, employees skipped as they already have it and failures indexed by employee"""
+		employees = list(dict.fromkeys(employees))
+		employee_details = self.get_employee_details(employees)
+
+		valid = []
+		for employee in employees:
+			details = employee_details.get(employee)
+			if reason := self.get_invalid_reason(employee, details):
+				self.failed[employee] = reason
+			elif details.has_same_assignment:
+				self.skipped.append(employee)
+			else:
+				valid.append(details)
+
+		for count, start in enumerate(range(0, len(valid), CHUNK_SIZE), start=1):
+			self.insert_chunk(valid[start : start + CHUNK_SIZE])
+			if commit:
+				frappe.db.commit()  # nosemgrep
+
+			if publish_progress:
+				frappe.publish_progress(
+					min(count * CHUNK_SIZE, len(valid)) * 100 / len(valid),
+					title=_("Assigning Structures..."),
+				)
+
+		return frappe._dict(assigned=self.assigned, skipped=self.skipped, failed=self.failed)
+
+	def get_employee_details(self, employees: list[str]) -> dict:
+		Employee = frappe.qb.DocType("Employee")
+		Department = frappe.qb.DocType("Department")
+		EmployeeGrade = frappe.qb.DocType("Employee Grade")
+
+		details = (
+			frappe.qb.from_(Employee)
+			.left_join(Department)
+			.on(Employee.department == Department.name)
+			.left_join(EmployeeGrade)
+			.on(Employee.grade == EmployeeGrade.name)
+			.select(
+				Employee.name.as_("employee"),
+				Employee.employee_name,
+				Employee.department,
+				Employee.designation,
+				Employee.grade,
+				Employee.date_of_joining,
+				Employee.relieving_date,
+				Employee.payroll_cost_center,
+				Department.payroll_cost_center.as_("department_payroll_cost_center"),
+				EmployeeGrade.default_base_pay,
+			)
+			.where(Employee.name.isin(employees))
+		).run(as_dict=True)
+		details = {d.employee: d for d in details}
+
+		Assignment = frappe.qb.DocType("Salary Structure Assignment")
+		existing_assignments = (
+			frappe.qb.from_(Assignment)
+			.select(Assignment.employee, Assignment.salary_structure, Assignment.company)
+			.where(
+				(Assignment.employee.isin(employees))
+				& (Assignment.from_date == self.from_date)
+				& (Assignment.docstatus == 1)
+			)
+		).run(as_dict=True)
+
+		for assignment in existing_assignments:
+			if not (d := details.get(assignment.employee)):
+				continue
+
+			d.has_assignment = True
+			if (
+				assignment.salary_structure == self.salary_structure.name
+				and assignment.company == self.salary_structure.company
+			):
+				d.has_same_assignment = True
+
+		return details
+
+	def get_invalid_reason(self, employee: str, details: dict | None) -> str | None:
+		if not details:
+			return _("Employee {0} not found").format(employee)
+
+		if details.has_same_assignment:
+			return None
+
+		if details.has_assignment:
+			return _("Salary Structure Assignment for Employee already exists")
+
+		if details.date_of_joining and self.from_date < getdate(details.date_of_joining):
+			return _("From Date {0} cannot be before employee's joining Date {1}").format(
+				self.from_date, details.date_of_joining
+			)
+
+		if details.relieving_date and self.from_date > getdate(details.relieving_date):
+			return _("From Date {0} cannot be after employee's relieving Date {1}").format(
+				self.from_date, details.relieving_date
+			)
+
+	def insert_chunk(self, chunk: list[dict]) -> None:
+		savepoint = "bulk_salary_structure_assignment"
+		frappe.db.savepoint(savepoint)
+
+		try:
+			assignments = [self.submit_assignment(details) for details in chunk]
+		except Exception as e:
+			frappe.db.rollback(save_point=savepoint)
+			if len(chunk) == 1:
+				self.failed[chunk[0].employee] = cstr(e) or e.__class__.__name__
+			else:
+				for details in chunk:
+					self.insert_chunk([details])
+		else:
+			self.assigned.extend(assignment.name for assignment in assignments)
+
+	def submit_assignment(self, details: dict) -> Document:
+		"""Submits the employee's assignment through the document lifecycle, so its validations,
+		hooks of other apps and version history run like for assignments made one at a time"""
+		assignment = frappe.new_doc("Salary Structure Assignment")
+		assignment.update(
+			{
+				"employee": details.employee,
+				"employee_name": details.employee_name,
+				"department": details.department,
+				"designation": details.designation,
+				"grade": details.grade,
+				"salary_structure": self.salary_structure.name,
+				"company": self.salary_structure.company,
+				"currency": self.salary_structure.currency,
+				"from_date": self.from_date,
+				"base": self.base or flt(details.default_base_pay),
+				"variable": self.variable,
+				"income_tax_slab": self.income_tax_slab,
+				"payroll_payable_account": self.payroll_payable_account,
+			}
+		)
+
+		# cost centers are set from the loaded employee details instead of being fetched per assignment
+		for d in self.get_payroll_cost_centers(details):
+			assignment.append(
+				"payroll_cost_centers", {"cost_center": d.cost_center, "percentage": cint(d.percentage)}
+			)
+
+		assignment.flags.ignore_permissions = True
+		assignment.submit()
+		return assignment
+
+	def get_payroll_cost_centers(self, details: dict) -> list[dict]:
+		if self.payroll_cost_centers:
+			return self.payroll_cost_centers
+
+		if cost_center := details.payroll_cost_center or details.department_payroll_cost_center:
+			return [frappe._dict(cost_center=cost_center, percentage=100)]
+
+		return []
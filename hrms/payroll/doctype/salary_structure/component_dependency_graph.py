@@ -0,0 +1,135 @@
+# Copyright (c) 2023, Frappe Technologies Pvt. Ltd. and Contributors
+# License: GNU General Public License v3. See license.txt
+
+from hrms.payroll.utils import get_referenced_names
+
+# names read by the amount of components that depend on payment days
+PAYMENT_DAYS_FIELDS = ("payment_days", "total_working_days")
+
+
+class ComponentDependencyGraph:
+	"""Dependencies between the components of a Salary Structure through their formulas and conditions.
+
+	A component depends on another if its formula or condition reads the other's abbreviation.
+	Components are evaluated in topological order within earnings and deductions, keeping the
+	order of the table wherever dependencies allow. Earnings and deductions are evaluated in
+	separate passes, so only dependencies within the same table are ordered. A component reading its
+	own abbreviation reads its previous amount, so it is not considered a dependency.
+	"""
+
+	def __init__(self, salary_structure):
+		self.rows = {"earnings": [], "deductions": []}
+		# {abbr: names read by the formula and condition, None if they can not be parsed}
+		self.references = {}
+
+		for component_type in self.rows:
+			for row in salary_structure.get(component_type):
+				self.rows[component_type].append(row)
+
+				# a component can have multiple rows, eg: with different conditions
+				references = get_row_references(row)
+				if row.abbr in self.references:
+					if references is None or self.references[row.abbr] is None:
+						references = None
+					else:
+						references |= self.references[row.abbr]
+
+				self.references[row.abbr] = references
+
+		self.dependencies = {
+			abbr: {name for name in names or () if name in self.references and name != abbr}
+			for abbr, names in self.references.items()
+		}
+
+		self.dependents = {abbr: set() for abbr in self.references}
+		for abbr, dependencies in self.dependencies.items():
+			for dependency in dependencies:
+				self.dependents[dependency].add(abbr)
+
+	def find_cycle(self, component_type: str) -> list[str] | None:
+		"""Returns abbreviations of components of the table depending on each other, starting and
+		ending with the same component, or None if there are no circular dependencies"""
+		abbreviations = {row.abbr for row in self.rows[component_type]}
+		visited, path = set(), []
+
+		def visit(abbr):
+			if abbr in path:
+				return path[path.index(abbr) :] + [abbr]
+			if abbr in visited:
+				return
+
+			visited.add(abbr)
+			path.append(abbr)
+			for dependency in sorted(self.dependencies[abbr] & abbreviations):
+				if cycle := visit(dependency):
+					return cycle
+			path.pop()
+
+		for row in self.rows[component_type]:
+			if cycle := visit(row.abbr):
+				return cycle
+
+	def get_evaluation_order(self, component_type: str) -> list:
+		"""Returns rows of the table ordered such that components are evaluated after the ones they
+		depend on. Rows are returned in table order if the components depend on each other"""
+		rows = self.rows[component_type]
+		abbreviations = {row.abbr for row in rows}
+		# {abbr: number of rows yet to be ordered}
+		remaining = {}
+		for row in rows:
+			remaining[row.abbr] = remaining.get(row.abbr, 0) + 1
+
+		ordered, pending = [], list(rows)
+		while pending:
+			# the first row in table order whose dependencies are ordered
+			row = next(
+				(
+					row
+					for row in pending
+					if not any(
+						remaining.get(abbr) for abbr in self.dependencies[row.abbr] & abbreviations
+					)
+				),
+				None,
+			)
+			if not row:
+				return list(rows)
+
+			ordered.append(row)
+			pending.remove(row)
+			remaining[row.abbr] -= 1
+
+		return ordered
+
+	def get_affected_components(self, changed_names) -> set[str]:
+		"""Returns abbreviations of components whose amount may change when the `changed_names`
+		(component abbreviations, salary slip, employee or assignment fields) change"""
+		changed_names = set(changed_names)
+		affected = set()
+
+		for abbr, names in self.references.items():
+			if names is None or abbr in changed_names or names.intersection(changed_names):
+				affected.add(abbr)
+
+		pending = list(affected)
+		while pending:
+			for dependent in self.dependents[pending.pop()]:
+				if dependent not in affected:
+					affected.add(dependent)
+					pending.append(dependent)
+
+		return affected
+
+
+def get_row_references(row) -> set[str] | None:
+	try:
+		names = get_referenced_names(row.condition)
+		if row.amount_based_on_formula:
+			names |= get_referenced_names(row.formula)
+	except SyntaxError:
+		return None
+
+	if row.depends_on_payment_days:
+		names.update(PAYMENT_DAYS_FIELDS)
+
+	return names
@@ -1,8 +1,6 @@
 # Copyright (c) 2015, Frappe Technologies Pvt. Ltd. and Contributors
 # License: GNU General Public License v3. See license.txt
 
-import re
-
 import frappe
 from frappe import _
 from frappe.model.document import Document
@@ -11,6 +9,14 @@ from frappe.utils import cint, cstr, flt
 
 import erpnext
 
+from hrms.payroll.doctype.salary_structure.bulk_salary_structure_assignment import (
+	BulkSalaryStructureAssignment,
+)
+from hrms.payroll.doctype.salary_structure.component_dependency_graph import (
+	ComponentDependencyGraph,
+)
+from hrms.payroll.utils import clear_compiled_formula_cache
+
 
 class SalaryStructure(Document):
 	def validate(self):
@@ -19,9 +25,13 @@ class SalaryStructure(Document):
 		self.strip_condition_and_formula_fields()
 		self.validate_max_benefits_with_flexi()
 		self.validate_component_based_on_tax_slab()
+		self.validate_component_dependencies()
 		self.validate_payment_days_based_dependent_component()
 		self.validate_timesheet_component()
 
+	def on_update(self):
+		clear_compiled_formula_cache(self.name)
+
 	def set_missing_values(self):
 		overwritten_fields = [
 			"depends_on_payment_days",
@@ -61,15 +71,27 @@ class SalaryStructure(Document):
 		if flt(self.net_pay) < 0 and self.salary_slip_based_on_timesheet:
 			frappe.throw(_("Net pay cannot be negative"))
 
+	def validate_component_dependencies(self):
+		graph = ComponentDependencyGraph(self)
+		for component_type in ("earnings", "deductions"):
+			if cycle := graph.find_cycle(component_type):
+				frappe.throw(
+					_("Salary Components depend on each other in their formulas or conditions: {0}").format(
+						" &rarr; ".join(frappe.bold(abbr) for abbr in cycle)
+					),
+					title=_("Circular Dependency"),
+				)
+
 	def validate_payment_days_based_dependent_component(self):
 		abbreviations = self.get_component_abbreviations()
+		references = ComponentDependencyGraph(self).references
 		for component_type in ("earnings", "deductions"):
 			for row in self.get(component_type):
 				if (
 					row.formula
 					and row.depends_on_payment_days
-					# check if the formula contains any of the payment days components
-					and any(re.search(r"\b" + abbr + r"\b", row.formula) for abbr in abbreviations)
+					# check if the formula uses any of the payment days components
+					and (references[row.abbr] or set()).intersection(abbreviations)
 				):
 					message = _("Row #{0}: The {1} Component has the options {2} and {3} enabled.").format(
 						row.idx,
@@ -179,7 +201,9 @@ class SalaryStructure(Document):
 			if len(employees) > 20:
 				frappe.enqueue(
 					assign_salary_structure_for_employees,
-					timeout=600,
+					queue="long",
+					# allows about a second per assignment, never less than the long queue's default
+					timeout=max(1500, len(employees)),
 					employees=employees,
 					salary_structure=self,
 					payroll_payable_account=payroll_payable_account,
@@ -187,6 +211,7 @@ class SalaryStructure(Document):
 					base=base,
 					variable=variable,
 					income_tax_slab=income_tax_slab,
+					bulk=True,
 				)
 			else:
 				assign_salary_structure_for_employees(
@@ -210,7 +235,20 @@ def assign_salary_structure_for_employees(
 	base=None,
 	variable=None,
 	income_tax_slab=None,
+	bulk=False,
 ):
+	if bulk:
+		return bulk_assign_salary_structure(
+			employees,
+			salary_structure,
+			payroll_payable_account=payroll_payable_account,
+			from_date=from_date,
+			base=base,
+			variable=variable,
+			income_tax_slab=income_tax_slab,
+			commit=True,
+		)
+
 	salary_structures_assignments = []
 	existing_assignments_for = get_existing_assignments(employees, salary_structure, from_date)
 	count = 0
@@ -232,6 +270,61 @@ def assign_salary_structure_for_employees(
 		frappe.msgprint(_("Structures have been assigned successfully"))
 
 
+def bulk_assign_salary_structure(
+	employees,
+	salary_structure,
+	payroll_payable_account=None,
+	from_date=None,
+	base=None,
+	variable=None,
+	income_tax_slab=None,
+	payroll_cost_centers=None,
+	commit=False,
+):
+	"""Assigns the salary structure to employees in bulk, reporting employees it could not be
+	assigned to instead of stopping at the first failure. With `commit`, each chunk of assignments
+	is committed once submitted, so a background job that is stopped keeps the ones made so far."""
+	result = BulkSalaryStructureAssignment(
+		salary_structure,
+		from_date,
+		payroll_payable_account=payroll_payable_account,
+		base=base,
+		variable=variable,
+		income_tax_slab=income_tax_slab,
+		payroll_cost_centers=payroll_cost_centers,
+	).run(employees, commit=commit)
+
+	if result.skipped:
+		frappe.msgprint(
+			_(
+				"Skipping Salary Structure Assignment for the following employees, as Salary Structure Assignment records already exists against them. {0}"
+			).format("\n".join(result.skipped))
+		)
+
+	if result.failed:
+		failures = "<br>".join(
+			f"{employee}: {reason}" for employee, reason in sorted(result.failed.items())
+		)
+		frappe.log_error(
+			title=_("Salary Structure {0} could not be assigned to {1} employees").format(
+				salary_structure.name, len(result.failed)
+			),
+			message=failures,
+			reference_doctype="Salary Structure",
+			reference_name=salary_structure.name,
+		)
+		frappe.msgprint(
+			_("Salary Structure could not be assigned to the following employees:") + "<br>" + failures,
+			title=_("Assignment Failed"),
+			indicator="orange",
+		)
+
+	if result.assigned:
+		frappe.msgprint(_("Structures have been assigned successfully"))
+
+	return result
+
+
 def create_salary_structures_assignment(
 	employee,
 	salary_structure,
@@ -241,6 +334,26 @@ def create_salary_structures_assignment(
 	variable,
 	income_tax_slab=None,
 ):
+	payroll_payable_account = get_payroll_payable_account(salary_structure, payroll_payable_account)
+
+	assignment = frappe.new_doc("Salary Structure Assignment")
+	assignment.employee = employee
+	assignment.salary_structure = salary_structure.name
+	assignment.company = salary_structure.company
+	assignment.currency = salary_structure.currency
+	assignment.payroll_payable_account = payroll_payable_account
+	assignment.from_date = from_date
+	assignment.base = base
+	assignment.variable = variable
+	assignment.income_tax_slab = income_tax_slab
+	assignment.save(ignore_permissions=True)
+	assignment.submit()
+	return assignment.name
+
+
+def get_payroll_payable_account(salary_structure, payroll_payable_account=None):
+	"""Returns the payroll payable account for assignments of the salary structure after validating
+	its currency, defaulting to the company's"""
 	if not payroll_payable_account:
 		payroll_payable_account = frappe.db.get_value(
 			"Company", salary_structure.company, "default_payroll_payable_account"
@@ -261,19 +374,7 @@ def create_salary_structures_assignment(
 			)
 		)
 
-	assignment = frappe.new_doc("Salary Structure Assignment")
-	assignment.employee = employee
-	assignment.salary_structure = salary_structure.name
-	assignment.company = salary_structure.company
-	assignment.currency = salary_structure.currency
-	assignment.payroll_payable_account = payroll_payable_account
-	assignment.from_date = from_date
-	assignment.base = base
-	assignment.variable = variable
-	assignment.income_tax_slab = income_tax_slab
-	assignment.save(ignore_permissions=True)
-	assignment.submit()
-	return assignment.name
+	return payroll_payable_account
 
 
 def get_existing_assignments(employees, salary_structure, from_date):
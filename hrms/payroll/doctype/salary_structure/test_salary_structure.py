@@ -20,7 +20,10 @@ from hrms.payroll.doctype.salary_slip.test_salary_slip import (
 	make_earning_salary_component,
 	make_employee_salary_slip,
 )
-from hrms.payroll.doctype.salary_structure.salary_structure import make_salary_slip
+from hrms.payroll.doctype.salary_structure.salary_structure import (
+	bulk_assign_salary_structure,
+	make_salary_slip,
+)
 
 test_dependencies = ["Fiscal Year"]
 
@@ -111,6 +114,89 @@ class TestSalaryStructure(FrappeTestCase):
 		for row in salary_structure.deductions:
 			self.assertFalse(("\n" in row.formula) or ("\n" in row.condition))
 
+	def test_compiled_formula_cache(self):
+		from hrms.payroll.utils import get_compiled_condition_and_formula, safe_eval_compiled
+
+		salary_structure = make_salary_structure("Salary Structure Sample", "Monthly", dont_submit=True)
+		row = salary_structure.earnings[0]
+		row.amount_based_on_formula = 1
+		row.formula = "base * 2"
+		salary_structure.save()
+
+		compiled = get_compiled_condition_and_formula(row, salary_structure.modified)
+		self.assertIs(compiled, get_compiled_condition_and_formula(row, salary_structure.modified))
+		self.assertEqual(safe_eval_compiled(compiled.formula, {}, {"base": 100}), 200)
+
+		# saving the structure invalidates compiled formulas
+		row.formula = "base * 3"
+		salary_structure.save()
+
+		compiled = get_compiled_condition_and_formula(row, salary_structure.modified)
+		self.assertEqual(safe_eval_compiled(compiled.formula, {}, {"base": 100}), 300)
+
+	def test_compiled_expressions_are_as_restricted_as_safe_eval(self):
+		from hrms.payroll.utils import compile_expression, safe_eval_compiled
+
+		def eval_compiled(expression):
+			return safe_eval_compiled(compile_expression(expression), {}, {"base": 100})
+
+		for expression in (
+			"base * 2 if base > 50 else 0",
+			"round(base / 3, 2) + int(base > 50)",
+			"max(base, 120) - min(base, 20)",
+		):
+			with self.subTest(expression=expression):
+				self.assertEqual(eval_compiled(expression), frappe.safe_eval(expression, None, {"base": 100}))
+
+		for expression in (
+			"().__class__.__bases__[0].__subclasses__()",
+			"base.__class__",
+			"(lambda: 0).__globals__",
+			"getattr(base, '__class__')",
+			"_dict",
+			"(x := base)",
+			"__import__('os').getcwd()",
+			"import os",
+			"open('/etc/passwd')",
+		):
+			with self.subTest(expression=expression):
+				self.assertRaises(Exception, frappe.safe_eval, expression, None, {"base": 100})
+				self.assertRaises(Exception, eval_compiled, expression)
+
+	def test_component_dependencies(self):
+		from hrms.payroll.doctype.salary_structure.component_dependency_graph import (
+			ComponentDependencyGraph,
+		)
+
+		salary_structure = make_salary_structure("Salary Structure Sample", "Monthly", dont_submit=True)
+		basic = next(row for row in salary_structure.earnings if row.formula == "base")
+		hra = next(row for row in salary_structure.earnings if row.abbr == "H")
+
+		# Basic Salary reads HRA which comes after it in the table
+		basic.formula = "base - H"
+		graph = ComponentDependencyGraph(salary_structure)
+
+		order = [row.abbr for row in graph.get_evaluation_order("earnings")]
+		self.assertLess(order.index("H"), order.index("BS"))
+		self.assertLess(order.index("BS"), order.index("SA"))
+		self.assertEqual(len(order), len(salary_structure.earnings))
+		self.assertIsNone(graph.find_cycle("earnings"))
+		self.assertEqual(graph.get_affected_components(["H"]), {"H", "BS", "SA"})
+		self.assertEqual(graph.get_affected_components(["base"]), {"BS", "SA"})
+
+		# earnings and deductions are evaluated in separate passes, reading each other is not a cycle
+		deduction = salary_structure.deductions[0]
+		deduction.amount_based_on_formula = 1
+		deduction.formula = "BS * .1"
+		hra.amount_based_on_formula = 1
+		hra.formula = f"{deduction.abbr} * 2"
+		self.assertIsNone(ComponentDependencyGraph(salary_structure).find_cycle("earnings"))
+		self.assertIsNone(ComponentDependencyGraph(salary_structure).find_cycle("deductions"))
+
+		# HRA reading Special Allowance completes a cycle
+		hra.formula = "SA"
+		self.assertRaises(frappe.ValidationError, salary_structure.save)
+
 	def test_salary_structures_assignment(self):
 		company_currency = erpnext.get_default_currency()
 		salary_structure = make_salary_structure(
@@ -134,6 +220,68 @@ class TestSalaryStructure(FrappeTestCase):
 		self.assertEqual(salary_structure_assignment.base, 5000)
 		self.assertEqual(salary_structure_assignment.variable, 200)
 
+	def test_bulk_salary_structure_assignment(self):
+		salary_structure = make_salary_structure(
+			"Salary Structure Bulk Assignment", "Monthly", currency="INR", company="_Test Company"
+		)
+		employee1 = make_employee(
+			"test_bulk_assignment1@salary.com",
+			company="_Test Company",
+			date_of_joining="2013-01-01",
+			payroll_cost_center="_Test Cost Center - _TC",
+		)
+		employee2 = make_employee(
+			"test_bulk_assignment2@salary.com", company="_Test Company", date_of_joining="2013-01-01"
+		)
+		late_joinee = make_employee(
+			"test_bulk_assignment3@salary.com", company="_Test Company", date_of_joining="2014-01-01"
+		)
+
+		result = bulk_assign_salary_structure(
+			[employee1, employee2, late_joinee, "Invalid Employee"],
+			salary_structure,
+			from_date="2013-06-01",
+			base=5000,
+		)
+		self.assertEqual(len(result.assigned), 2)
+		self.assertEqual(set(result.failed), {late_joinee, "Invalid Employee"})
+
+		assignment = frappe.get_doc(
+			"Salary Structure Assignment", {"employee": employee1, "from_date": "2013-06-01"}
+		)
+		self.assertEqual(assignment.docstatus, 1)
+		self.assertEqual(assignment.base, 5000)
+		self.assertEqual(assignment.currency, "INR")
+		self.assertEqual(assignment.payroll_cost_centers[0].cost_center, "_Test Cost Center - _TC")
+		self.assertEqual(assignment.payroll_cost_centers[0].percentage, 100)
+
+		# employees with the assignment are skipped, cost centers can be split across assignments
+		result = bulk_assign_salary_structure(
+			[employee1],
+			salary_structure,
+			from_date="2013-06-01",
+			payroll_cost_centers=[
+				{"cost_center": "_Test Cost Center - _TC", "percentage": 60},
+				{"cost_center": "_Test Cost Center 2 - _TC", "percentage": 40},
+			],
+		)
+		self.assertEqual(result.skipped, [employee1])
+
+		result = bulk_assign_salary_structure(
+			[employee1],
+			salary_structure,
+			from_date="2013-07-01",
+			payroll_cost_centers=[
+				{"cost_center": "_Test Cost Center - _TC", "percentage": 60},
+				{"cost_center": "_Test Cost Center 2 - _TC", "percentage": 40},
+			],
+		)
+		assignment = frappe.get_doc("Salary Structure Assignment", result.assigned[0])
+		self.assertEqual(
+			[(d.cost_center, d.percentage) for d in assignment.payroll_cost_centers],
+			[("_Test Cost Center - _TC", 60), ("_Test Cost Center 2 - _TC", 40)],
+		)
+
 	def test_employee_grade_defaults(self):
 		salary_structure = make_salary_structure(
 			"Salary Structure - Lead", "Monthly", currency="INR", company="_Test Company"
@@ -4,10 +4,13 @@
 import frappe
 from frappe import _, scrub
 from frappe.query_builder.functions import Sum
-from frappe.utils import add_days, flt, getdate, rounded
+from frappe.utils import flt, rounded
 
-from hrms.payroll.doctype.payroll_entry.payroll_entry import get_start_end_dates
+from hrms.payroll.doctype.payroll_period_running_total.payroll_period_running_total import (
+	get_payroll_period_running_totals,
+)
 from hrms.payroll.doctype.salary_slip.salary_slip import calculate_tax_by_tax_slab
+from hrms.payroll.doctype.salary_slip.salary_slip_projection import SalarySlipProjection
 
 
 def execute(filters=None):
@@ -20,6 +23,7 @@ class IncomeTaxComputationReport(object):
 		self.columns = []
 		self.data = []
 		self.employees = frappe._dict()
+		self.running_totals = {}
 		self.payroll_period_start_date = None
 		self.payroll_period_end_date = None
 		if self.filters.payroll_period:
@@ -34,6 +38,7 @@ class IncomeTaxComputationReport(object):
 
 	def get_data(self):
 		self.get_employee_details()
+		self.get_running_totals()
 		self.get_future_salary_slips()
 		self.get_ctc()
 		self.get_tax_exempted_earnings_and_deductions()
@@ -114,74 +119,39 @@ class IncomeTaxComputationReport(object):
 		return employee_ss_assignments
 
 	def get_future_salary_slips(self):
-		self.future_salary_slips = frappe._dict()
-		for employee in list(self.employees.keys()):
-			last_ss = self.get_last_salary_slip(employee)
-			if last_ss and last_ss.end_date == self.payroll_period_end_date:
-				continue
-
-			relieving_date = self.employees[employee].get("relieving_date", "")
-			if last_ss:
-				ss_start_date = add_days(last_ss.end_date, 1)
-			else:
-				ss_start_date = self.payroll_period_start_date
-				last_ss = frappe._dict(
-					{
-						"payroll_frequency": "Monthly",
-						"salary_structure": self.employees[employee].get("salary_structure"),
-					}
-				)
-
-			while getdate(ss_start_date) < getdate(self.payroll_period_end_date) and (
-				not relieving_date or getdate(ss_start_date) < relieving_date
-			):
-				ss_end_date = get_start_end_dates(last_ss.payroll_frequency, ss_start_date).end_date
-
-				ss = frappe.new_doc("Salary Slip")
-				ss.employee = employee
-				ss.start_date = ss_start_date
-				ss.end_date = ss_end_date
-				ss.salary_structure = last_ss.salary_structure
-				ss.payroll_frequency = last_ss.payroll_frequency
-				ss.company = self.filters.company
-				try:
-					ss.process_salary_structure(for_preview=1)
-					self.future_salary_slips.setdefault(employee, []).append(ss.as_dict())
-				except Exception:
-					break
-
-				ss_start_date = add_days(ss_end_date, 1)
-
-	def get_last_salary_slip(self, employee):
-		last_salary_slip = frappe.db.get_value(
-			"Salary Slip",
-			{
-				"employee": employee,
-				"docstatus": 1,
-				"start_date": ["between", [self.payroll_period_start_date, self.payroll_period_end_date]],
-			},
-			["start_date", "end_date", "salary_structure", "payroll_frequency"],
-			order_by="start_date desc",
-			as_dict=1,
+		self.future_salary_slips = SalarySlipProjection(
+			self.filters.company, self.payroll_period_start_date, self.payroll_period_end_date
+		).project(self.employees)
+
+	def get_running_totals(self):
+		"""Totals of submitted salary slips maintained per employee for the payroll period"""
+		self.running_totals = get_payroll_period_running_totals(
+			list(self.employees.keys()), self.filters.payroll_period
 		)
 
-		return last_salary_slip
+	def get_employees_without_running_totals(self):
+		return [employee for employee in self.employees if employee not in self.running_totals]
 
 	def get_ctc(self):
 		# Get total earnings from existing salary slip
-		ss = frappe.qb.DocType("Salary Slip")
 		existing_ss = frappe._dict(
-			(
-				frappe.qb.from_(ss)
-				.select(ss.employee, Sum(ss.base_gross_pay).as_("amount"))
-				.where(ss.docstatus == 1)
-				.where(ss.employee.isin(list(self.employees.keys())))
-				.where(ss.start_date >= self.payroll_period_start_date)
-				.where(ss.end_date <= self.payroll_period_end_date)
-				.groupby(ss.employee)
-			).run()
+			{employee: d.base_gross_pay for employee, d in self.running_totals.items()}
 		)
 
+		if employees := self.get_employees_without_running_totals():
+			ss = frappe.qb.DocType("Salary Slip")
+			existing_ss.update(
+				(
+					frappe.qb.from_(ss)
+					.select(ss.employee, Sum(ss.base_gross_pay).as_("amount"))
+					.where(ss.docstatus == 1)
+					.where(ss.employee.isin(employees))
+					.where(ss.start_date >= self.payroll_period_start_date)
+					.where(ss.end_date <= self.payroll_period_end_date)
+					.groupby(ss.employee)
+				).run()
+			)
+
 		for employee in list(self.employees.keys()):
 			future_ss_earnings = self.get_future_earnings(employee)
 			ctc = flt(existing_ss.get(employee)) + future_ss_earnings
@@ -202,21 +172,31 @@ class IncomeTaxComputationReport(object):
 			return
 
 		# Get component totals from existing salary slips
-		ss = frappe.qb.DocType("Salary Slip")
-		ss_comps = frappe.qb.DocType("Salary Detail")
+		records = [
+			frappe._dict(
+				employee=employee, salary_component=component, amount=d.get_component_total(component)
+			)
+			for employee, d in self.running_totals.items()
+			for component in tax_exempted_components
+			if any(row.salary_component == component for row in d.components)
+		]
 
-		records = (
-			frappe.qb.from_(ss)
-			.inner_join(ss_comps)
-			.on(ss.name == ss_comps.parent)
-			.select(ss.name, ss.employee, ss_comps.salary_component, Sum(ss_comps.amount).as_("amount"))
-			.where(ss.docstatus == 1)
-			.where(ss.employee.isin(list(self.employees.keys())))
-			.where(ss_comps.salary_component.isin(tax_exempted_components))
-			.where(ss.start_date >= self.payroll_period_start_date)
-			.where(ss.end_date <= self.payroll_period_end_date)
-			.groupby(ss.employee, ss_comps.salary_component)
-		).run(as_dict=True)
+		if employees := self.get_employees_without_running_totals():
+			ss = frappe.qb.DocType("Salary Slip")
+			ss_comps = frappe.qb.DocType("Salary Detail")
+
+			records += (
+				frappe.qb.from_(ss)
+				.inner_join(ss_comps)
+				.on(ss.name == ss_comps.parent)
+				.select(ss.name, ss.employee, ss_comps.salary_component, Sum(ss_comps.amount).as_("amount"))
+				.where(ss.docstatus == 1)
+				.where(ss.employee.isin(employees))
+				.where(ss_comps.salary_component.isin(tax_exempted_components))
+				.where(ss.start_date >= self.payroll_period_start_date)
+				.where(ss.end_date <= self.payroll_period_end_date)
+				.groupby(ss.employee, ss_comps.salary_component)
+			).run(as_dict=True)
 
 		existing_ss_exemptions = frappe._dict()
 		for d in records:
@@ -419,11 +399,18 @@ class IncomeTaxComputationReport(object):
 			"round_to_the_nearest_integer",
 		)
 
+		employee_details = {
+			d.name: d
+			for d in frappe.get_all(
+				"Employee", filters={"name": ("in", list(self.employees.keys()))}, fields=["*"]
+			)
+		}
+
 		for emp, emp_details in self.employees.items():
 			tax_slab = emp_details.get("income_tax_slab")
 			if tax_slab:
 				tax_slab = frappe.get_cached_doc("Income Tax Slab", tax_slab)
-				employee_dict = frappe.get_doc("Employee", emp).as_dict()
+				employee_dict = employee_details.get(emp)
 				tax_amount = calculate_tax_by_tax_slab(
 					emp_details["total_taxable_amount"], tax_slab, eval_globals=None, eval_locals=employee_dict
 				)
@@ -437,22 +424,32 @@ class IncomeTaxComputationReport(object):
 	def get_total_deducted_tax(self):
 		self.add_column("Total Tax Deducted")
 
-		ss = frappe.qb.DocType("Salary Slip")
-		ss_ded = frappe.qb.DocType("Salary Detail")
+		records = [
+			frappe._dict(
+				employee=employee,
+				amount=d.get_amount("deductions", variable_based_on_taxable_salary=1),
+			)
+			for employee, d in self.running_totals.items()
+			if any(row.variable_based_on_taxable_salary for row in d.components)
+		]
 
-		records = (
-			frappe.qb.from_(ss)
-			.inner_join(ss_ded)
-			.on(ss.name == ss_ded.parent)
-			.select(ss.employee, Sum(ss_ded.amount).as_("amount"))
-			.where(ss.docstatus == 1)
-			.where(ss.employee.isin(list(self.employees.keys())))
-			.where(ss_ded.parentfield == "deductions")
-			.where(ss_ded.variable_based_on_taxable_salary == 1)
-			.where(ss.start_date >= self.payroll_period_start_date)
-			.where(ss.end_date <= self.payroll_period_end_date)
-			.groupby(ss.employee)
-		).run(as_dict=True)
+		if employees := self.get_employees_without_running_totals():
+			ss = frappe.qb.DocType("Salary Slip")
+			ss_ded = frappe.qb.DocType("Salary Detail")
+
+			records += (
+				frappe.qb.from_(ss)
+				.inner_join(ss_ded)
+				.on(ss.name == ss_ded.parent)
+				.select(ss.employee, Sum(ss_ded.amount).as_("amount"))
+				.where(ss.docstatus == 1)
+				.where(ss.employee.isin(employees))
+				.where(ss_ded.parentfield == "deductions")
+				.where(ss_ded.variable_based_on_taxable_salary == 1)
+				.where(ss.start_date >= self.payroll_period_start_date)
+				.where(ss.end_date <= self.payroll_period_end_date)
+				.groupby(ss.employee)
+			).run(as_dict=True)
 
 		for d in records:
 			self.employees[d.employee].setdefault("total_tax_deducted", d.amount)
@@ -34,6 +34,8 @@ class TestIncomeTaxComputation(unittest.TestCase):
 		frappe.db.sql("delete from `tabEmployee Benefit Claim`")
 		frappe.db.sql("delete from `tabEmployee` where company='_Test Company'")
 		frappe.db.sql("delete from `tabSalary Slip`")
+		frappe.db.sql("delete from `tabPayroll Period Running Total`")
+		frappe.db.sql("delete from `tabPayroll Period Component Total`")
 
 	def create_records(self):
 		self.employee = make_employee(
@@ -114,3 +116,35 @@ class TestIncomeTaxComputation(unittest.TestCase):
 
 		for key, val in expected_data.items():
 			self.assertEqual(result[1][0].get(key), val)
+
+	def test_projection_matches_slips_evaluated_per_period(self):
+		from hrms.payroll.doctype.salary_slip.salary_slip_projection import SalarySlipProjection
+
+		employees = {
+			self.employee: frappe.get_value(
+				"Employee", self.employee, ["date_of_joining", "relieving_date"], as_dict=True
+			)
+		}
+		employees[self.employee].salary_structure = "Monthly Salary Structure Test Income Tax Computation"
+
+		projection = SalarySlipProjection(
+			"_Test Company", self.payroll_period.start_date, self.payroll_period.end_date
+		)
+		projected_slips = projection.project(employees)[self.employee]
+
+		# 3 slips are submitted, the remaining 9 months are projected
+		self.assertEqual(len(projected_slips), 9)
+
+		for projected in projected_slips:
+			evaluated = projection.evaluate(
+				self.employee,
+				projected.salary_structure,
+				projected.payroll_frequency,
+				projected.start_date,
+				projected.end_date,
+			)
+			self.assertEqual(projected.base_gross_pay, evaluated.base_gross_pay)
+			self.assertEqual(
+				[(d.salary_component, d.amount) for d in projected.earnings],
+				[(d.salary_component, d.amount) for d in evaluated.earnings],
+			)
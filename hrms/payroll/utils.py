@@ -1,4 +1,8 @@
-# import frappe
+import ast
+import unicodedata
+from types import CodeType
+
+import frappe
 
 
 def sanitize_expression(string: str | None = None) -> str | None:
@@ -24,3 +28,230 @@ def sanitize_expression(string: str | None = None) -> str | None:
 	string = " ".join(parts)
 
 	return string
+
+
+def compile_expression(string: str | None = None) -> CodeType | None:
+	"""
+	Sanitizes and compiles an expression with the same restrictions `frappe.safe_eval` applies,
+	so that it can be evaluated repeatedly using `safe_eval_compiled` without re-parsing.
+
+	Args:
+	    string (str, None): The string expression to be compiled. Defaults to None.
+
+	Returns:
+	    CodeType or None: The compiled expression or None if the sanitized expression is empty.
+
+	Raises:
+	    SyntaxError: If the expression is invalid or uses a restricted operation.
+	"""
+	from RestrictedPython import compile_restricted
+
+	from frappe.utils.safe_exec import FrappeTransformer
+
+	string = sanitize_expression(string)
+	if not string:
+		return None
+
+	string = unicodedata.normalize("NFKC", string)
+
+	for node in ast.walk(ast.parse(string, mode="eval")):
+		if isinstance(node, ast.NamedExpr):
+			raise SyntaxError(f"Operation not allowed: line {node.lineno} column {node.col_offset}")
+
+	return compile_restricted(string, filename="<safe_eval>", policy=FrappeTransformer, mode="eval")
+
+
+def get_referenced_names(string: str | None = None) -> set[str]:
+	"""
+	Returns the variable names an expression reads, eg: `{"base", "BS"}` for `base * 0.5 if BS else 0`.
+
+	Args:
+	    string (str, None): The string expression to be analysed. Defaults to None.
+
+	Returns:
+	    set: Names loaded by the expression. Empty if the expression is empty.
+
+	Raises:
+	    SyntaxError: If the expression is invalid.
+	"""
+	string = sanitize_expression(string)
+	if not string:
+		return set()
+
+	return {
+		node.id
+		for node in ast.walk(ast.parse(string, mode="eval"))
+		if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+	}
+
+
+# functions whose result depends only on their arguments
+DETERMINISTIC_FUNCTIONS = {
+	"int",
+	"float",
+	"long",
+	"round",
+	"abs",
+	"min",
+	"max",
+	"ceil",
+	"floor",
+	"date",
+	"getdate",
+}
+
+
+def get_expression_inputs(string: str | None = None) -> set[str] | None:
+	"""
+	Returns the names an expression reads if its result depends only on their values,
+	ie: it calls no functions other than `DETERMINISTIC_FUNCTIONS` and accesses no attributes.
+
+	Args:
+	    string (str, None): The string expression to be analysed. Defaults to None.
+
+	Returns:
+	    set or None: Names loaded by the expression, or None if its result may depend on anything else.
+
+	Raises:
+	    SyntaxError: If the expression is invalid.
+	"""
+	string = sanitize_expression(string)
+	if not string:
+		return set()
+
+	names = set()
+	for node in ast.walk(ast.parse(string, mode="eval")):
+		if isinstance(node, (ast.Attribute, ast.Subscript, ast.Lambda, ast.comprehension)):
+			return None
+
+		if isinstance(node, ast.Call) and not (
+			isinstance(node.func, ast.Name) and node.func.id in DETERMINISTIC_FUNCTIONS
+		):
+			return None
+
+		if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+			names.add(node.id)
+
+	return names
+
+
+def safe_eval_compiled(
+	code: CodeType, eval_globals: dict | None = None, eval_locals: dict | None = None
+):
+	"""Evaluates an expression compiled using `compile_expression`, like `frappe.safe_eval` would"""
+	from frappe.utils.safe_exec import WHITELISTED_SAFE_EVAL_GLOBALS
+
+	if eval_globals is None:
+		eval_globals = {}
+
+	eval_globals["__builtins__"] = {}
+	eval_globals.update(WHITELISTED_SAFE_EVAL_GLOBALS)
+
+	return eval(code, eval_globals, eval_locals)  # nosemgrep
+
+
+# {(site, salary structure): {"modified": datetime, "rows": {row name: compiled row},
+# "referenced_names": names read by the structure's conditions and formulas,
+# "dependency_graph": ComponentDependencyGraph}}
+_compiled_formula_cache = {}
+
+
+def get_compiled_condition_and_formula(struct_row, modified=None) -> frappe._dict:
+	"""
+	Returns the compiled condition and formula of a Salary Structure row.
+
+	Compiled rows are cached per Salary Structure and `modified` timestamp,
+	so saving the structure automatically invalidates them.
+	"""
+	if not struct_row.get("name") or not struct_row.get("parent"):
+		return _compile_condition_and_formula(struct_row)
+
+	structure_cache = _get_structure_cache(struct_row.parent, modified)
+	compiled_row = structure_cache["rows"].get(struct_row.name)
+	if not compiled_row:
+		compiled_row = structure_cache["rows"][struct_row.name] = _compile_condition_and_formula(
+			struct_row
+		)
+
+	return compiled_row
+
+
+def get_structure_referenced_names(salary_structure, modified=None) -> set[str] | None:
+	"""
+	Returns the names read by the conditions and formulas of a Salary Structure,
+	or None if any of them can not be parsed.
+
+	Cached per Salary Structure and `modified` timestamp like the compiled rows.
+	"""
+	if not salary_structure.get("name"):
+		return _get_referenced_names_for_rows(salary_structure)
+
+	structure_cache = _get_structure_cache(salary_structure.name, modified)
+	if "referenced_names" not in structure_cache:
+		structure_cache["referenced_names"] = _get_referenced_names_for_rows(salary_structure)
+
+	return structure_cache["referenced_names"]
+
+
+def get_component_dependency_graph(salary_structure, modified=None):
+	"""Returns the dependency graph of the Salary Structure's components, cached like compiled rows"""
+	from hrms.payroll.doctype.salary_structure.component_dependency_graph import (
+		ComponentDependencyGraph,
+	)
+
+	if not salary_structure.get("name"):
+		return ComponentDependencyGraph(salary_structure)
+
+	structure_cache = _get_structure_cache(salary_structure.name, modified)
+	if "dependency_graph" not in structure_cache:
+		structure_cache["dependency_graph"] = ComponentDependencyGraph(salary_structure)
+
+	return structure_cache["dependency_graph"]
+
+
+def _get_referenced_names_for_rows(salary_structure) -> set[str] | None:
+	names = set()
+	try:
+		for row in salary_structure.get("earnings") + salary_structure.get("deductions"):
+			names |= get_referenced_names(row.condition)
+			if row.amount_based_on_formula:
+				names |= get_referenced_names(row.formula)
+	except SyntaxError:
+		return None
+
+	return names
+
+
+def _get_structure_cache(salary_structure: str, modified=None) -> dict:
+	key = (frappe.local.site, salary_structure)
+	structure_cache = _compiled_formula_cache.get(key)
+
+	if not structure_cache or structure_cache["modified"] != modified:
+		structure_cache = _compiled_formula_cache[key] = {"modified": modified, "rows": {}}
+
+	return structure_cache
+
+
+def _compile_condition_and_formula(struct_row) -> frappe._dict:
+	formula = struct_row.formula if struct_row.amount_based_on_formula else None
+
+	return frappe._dict(
+		condition=compile_expression(struct_row.condition),
+		formula=compile_expression(formula),
+		# names read by the condition and formula, None if their result depends on anything else
+		condition_inputs=_get_sorted_inputs(struct_row.condition),
+		formula_inputs=_get_sorted_inputs(formula),
+	)
+
+
+def _get_sorted_inputs(string: str | None) -> tuple[str] | None:
+	inputs = get_expression_inputs(string)
+	return tuple(sorted(inputs)) if inputs is not None else None
+
+
+def clear_compiled_formula_cache(salary_structure: str | None = None) -> None:
+	if not salary_structure:
+		_compiled_formula_cache.clear()
+		return
+
+	_compiled_formula_cache.pop((frappe.local.site, salary_structure), None)
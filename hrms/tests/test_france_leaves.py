@@ -10,6 +10,7 @@ from hrms.regional.france.hr.bank_holidays import get_french_bank_holidays
 from hrms.regional.france.setup import setup
 from hrms.regional.france.hr.utils import daterange, allocate_earned_leaves
 from hrms.hr.doctype.leave_ledger_entry.leave_ledger_entry import process_expired_allocation
+from hrms.hr.doctype.leave_ledger_entry.leave_balance_cache import clear_all_leave_balance_cache
 
 PERIODS = [
 	("2018-06-01", "2019-05-31"),
@@ -105,6 +106,7 @@ class TestFranceLeavesCalculation(FrappeTestCase):
 		frappe.db.delete("Leave Ledger Entry")
 		frappe.db.delete("Leave Allocation")
 		frappe.db.delete("Leave Application")
+		clear_all_leave_balance_cache()
 
 	def test_conges_payes_sur_jours_ouvrables(self):
 		contract = frappe.get_doc({
@@ -0,0 +1,27 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hrms.payroll.benchmark import PHASES, compare_results, run_payroll_benchmark
+
+
+class TestPayrollBenchmark(FrappeTestCase):
+	def test_run_payroll_benchmark_on_tiny_workforce(self):
+		result = run_payroll_benchmark(employees=3, salary_structures=1, measure_memory=False)
+
+		self.assertEqual(result["workforce"]["employees"], 3)
+		self.assertEqual(result["workforce"]["salary_structure_assignments"], 3)
+		self.assertGreater(result["workforce"]["attendance"], 0)
+
+		for phase in PHASES:
+			self.assertTrue(result["phases"][phase], phase)
+			self.assertGreater(result["phases"][phase]["queries"], 0, phase)
+			self.assertIsNone(result["phases"][phase]["peak_memory"])
+
+		submitted = frappe.db.count(
+			"Salary Slip", {"payroll_entry": result["payroll_entry"], "docstatus": 1}
+		)
+		self.assertEqual(submitted, 3)
+
+		comparison = compare_results(result, result)
+		self.assertTrue(comparison)
+		self.assertTrue(all(change in (0, None) for *_, change in comparison))